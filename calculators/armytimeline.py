@@ -0,0 +1,116 @@
+"""
+Army of a dominion for every tick after its last ops, from its last Barracks Spy and Clear Sight.
+
+The army starts with the units at home at the time of the ops; units in training and units returning from battle
+are added in the tick they arrive. Once the queues are empty, the DP is the DP column (MilitaryCalculator.dp),
+which counts those units as home already.
+
+The timelines are built once when ops come in. Per page, the timelines of all dominions are stacked into arrays,
+so the army or DP at any tick is a matter of indexing.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+
+from calculators.military import MilitaryCalculator
+from domain.domainhelper import Queue
+from domain.models import Dominion, BarracksSpy
+from domain.timeutils import current_od_time
+
+TIMELINE_TICKS = 36  # Queues of at most 12 ticks plus projections of up to 24 ticks
+ARMY_ROWS = ('draftees', 'unit1', 'unit2', 'unit3', 'unit4')
+
+
+def _queue_array(queue: Queue, offset: int) -> np.ndarray:
+    """Units arriving per tick after the origin, for a training or returning queue."""
+    arrivals = np.zeros((len(ARMY_ROWS), TIMELINE_TICKS + 1))
+    for row, key in enumerate(ARMY_ROWS):
+        for tick, amount in queue.per_tick(key).items():
+            if offset < tick <= TIMELINE_TICKS:
+                arrivals[row, tick] += amount
+    return arrivals
+
+
+class ArmyTimeline(object):
+    def __init__(self, dom: Dominion):
+        """Starts at the last BS. When a CS is at least as recent, the units at home are the CS ones from the time of
+        the CS on, and only what's still in the queues by then arrives later. BS counts are corrected for the BS
+        uncertainty like Dominion.military does. Draftees are the CS ones, like MilitaryCalculator.raw_dp."""
+        self.code = dom.code
+        cs = dom.last_cs
+        bs = dom.last_barracks
+        units = range(1, 5)
+        self.home = np.zeros((len(ARMY_ROWS), TIMELINE_TICKS + 1))
+        draftees = cs.military_draftees if cs else 0
+        if bs:
+            self.origin = bs.timestamp
+            if cs and cs.timestamp >= bs.timestamp:
+                offset = int((cs.timestamp - bs.timestamp) / timedelta(hours=1))
+                base = np.array([draftees] + [cs.home_unit(i, bs, offset) for i in units])
+                arrivals = _queue_array(bs.training_queue, offset) + _queue_array(bs.returning_queue, offset)
+            else:
+                base = np.array([draftees] + [getattr(bs, f'home_unit{i}') / BarracksSpy.BS_UNCERTAINTY
+                                              for i in units])
+                arrivals = (_queue_array(bs.training_queue, 0)
+                            + _queue_array(bs.returning_queue, 0) * BarracksSpy.BS_UNCERTAINTY)
+            arrivals[0] = 0
+            self.home += base[:, np.newaxis] + np.cumsum(arrivals, axis=1)
+        elif cs:
+            self.origin = cs.timestamp
+            base = np.array([draftees] + [getattr(cs, f'military_unit{i}') for i in units])
+            self.home += base[:, np.newaxis]
+        else:
+            self.origin = None
+
+        mc = MilitaryCalculator(dom)
+        self.defense_bonus = mc.defense_bonus
+        self.dp = np.round(self._raw_dp(mc) * (1 + self.defense_bonus))
+
+    def _raw_dp(self, mc: MilitaryCalculator) -> np.ndarray:
+        """Raw DP per tick, calculated like MilitaryCalculator.dp_of and raw_dp: whole units, pairing perks and
+        draftees."""
+        amounts = np.trunc(self.home)
+        raw_dp = amounts[0].copy()
+        for i in range(1, 5):
+            unit = mc.units[i]
+            raw_dp += amounts[i] * unit.defense
+            if unit.defense_from_pairing:
+                slot, buff, num_required = unit.defense_from_pairing
+                raw_dp += np.minimum(amounts[slot] // num_required, amounts[i]) * buff
+        return raw_dp
+
+    @property
+    def has_army(self) -> bool:
+        return self.origin is not None
+
+
+class ArmyTimelines(object):
+    def __init__(self, timelines: list[ArmyTimeline]):
+        timelines = [timeline for timeline in timelines if timeline.has_army]
+        self.codes = [timeline.code for timeline in timelines]
+        self.row_of = {code: row for row, code in enumerate(self.codes)}
+        self.origins = np.array([timeline.origin for timeline in timelines], dtype='datetime64[s]')
+        self.home = np.array([timeline.home for timeline in timelines]).reshape(-1, len(ARMY_ROWS), TIMELINE_TICKS + 1)
+        self.dp = np.array([timeline.dp for timeline in timelines]).reshape(-1, TIMELINE_TICKS + 1)
+
+    def columns(self, ticks_from_now: int, now=None) -> np.ndarray:
+        """Timeline column per dominion for ticks_from_now, clipped to the timeline."""
+        now = np.datetime64(now or current_od_time(), 's')
+        ages = (now - self.origins) // np.timedelta64(1, 'h')
+        return np.clip(ages + ticks_from_now, 0, TIMELINE_TICKS)
+
+    def army_at(self, ticks_from_now: int, now=None) -> np.ndarray:
+        """Units at home per dominion: (dominions, ARMY_ROWS)."""
+        columns = self.columns(ticks_from_now, now)
+        return self.home[np.arange(len(self.codes)), :, columns]
+
+    def dp_at(self, ticks_from_now: int, now=None) -> np.ndarray:
+        columns = self.columns(ticks_from_now, now)
+        return self.dp[np.arange(len(self.codes)), columns]
+
+    def dp_forecast(self, ticks=(6, 12, 24), now=None) -> dict[int, dict[int, int]]:
+        """DP in a number of ticks per dominion code: {code: {ticks: dp}}."""
+        now = now or current_od_time()
+        per_tick = {tick: self.dp_at(tick, now) for tick in ticks}
+        return {code: {tick: int(per_tick[tick][row]) for tick in ticks} for code, row in self.row_of.items()}
@@ -2,6 +2,8 @@ from domain.models import Dominion
 from config import *
 from math import trunc
 
+from calculators.military import MilitaryCalculator
+
 
 class Economy(object):
     def __init__(self, dom: Dominion):
@@ -12,17 +14,17 @@ class Economy(object):
         bonus = 0
         # Assuming Midas Touch is up
         bonus += 0.10
-        bonus += self.dom.last_castle.science
+        bonus += self.dom.last_castle.science_rating if self.dom.last_castle else 0
         bonus += self.dom.tech.value_for_perk('platinum_production') / 100
         return bonus
 
     @property
     def employed_peasants(self):
-        return min(self.dom.cs['peasants'], self.dom.buildings.jobs)
+        return min(self.dom.last_cs.peasants, self.dom.buildings.jobs)
 
     @property
     def free_jobs(self):
-        return self.dom.buildings.jobs - self.dom.cs['peasants']
+        return self.dom.buildings.jobs - self.dom.last_cs.peasants
 
     @property
     def peasant_income(self):
@@ -30,18 +32,19 @@ class Economy(object):
 
     @property
     def plat_per_home(self):
-        return (PEASANTS_PER_HOME * (1 + self.dom.castle.keep)) * PLAT_PER_PEASANT_PER_TICK
+        keep = self.dom.last_castle.keep_rating if self.dom.last_castle else 0
+        return (PEASANTS_PER_HOME * (1 + keep)) * PLAT_PER_PEASANT_PER_TICK
 
     @property
     def alchemy_income(self):
-        return trunc(self.dom.buildings.alchemies * PLAT_PER_ALCHEMY_PER_TICK)
+        return trunc(self.dom.last_survey.alchemy * PLAT_PER_ALCHEMY_PER_TICK)
 
     @property
     def guard_towers(self):
-        gt_ratio = self.dom.buildings.ratio_of('guard_tower') * 1.75
-        new_ratio = (self.dom.buildings.guard_towers + 1) / self.dom.total_land * 1.75
+        gt_ratio = self.dom.buildings.ratio_of('guard_tower', include_paid=False) * 1.75
+        new_ratio = (self.dom.last_survey.guard_tower + 1) / self.dom.current_land * 1.75
         extra_dp_percentage = new_ratio - gt_ratio
-        extra_dp = self.dom.military.dp * extra_dp_percentage
+        extra_dp = MilitaryCalculator(self.dom).dp * extra_dp_percentage
         return extra_dp
 
     @property
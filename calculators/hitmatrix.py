@@ -0,0 +1,47 @@
+"""
+Who in my realm can hit which enemy dominion, and for how much land.
+
+Sendable OP and land of the realmies against estimated DP and land of the enemies,
+as (realmies, enemies) matrices by numpy broadcasting.
+"""
+
+import numpy as np
+
+from calculators.military import land_gain
+from domain.refdata import IN_RANGE
+
+
+class HitMatrix(object):
+    def __init__(self, attackers: list[dict], targets: list[dict]):
+        """Attackers and targets are military summaries."""
+        self.attackers = attackers
+        self.targets = targets
+        op = np.array([attacker['max_sendable_op'] for attacker in attackers], dtype=float)
+        attacker_land = np.array([attacker['land'] for attacker in attackers], dtype=float)
+        dp = np.array([target['dp'] for target in targets], dtype=float)
+        target_land = np.array([target['land'] for target in targets], dtype=float)
+
+        self.range = target_land[np.newaxis, :] / attacker_land[:, np.newaxis]
+        self.in_range = self.range >= IN_RANGE
+        self.breaks = op[:, np.newaxis] > dp[np.newaxis, :]
+        self.feasible = self.in_range & self.breaks
+        gains = land_gain(attacker_land[:, np.newaxis], target_land[np.newaxis, :])
+        self.land_gain = np.where(self.feasible, gains, 0).reshape(len(attackers), len(targets))
+
+    def report(self) -> dict:
+        """Plain values, so the report can be cached: only targets someone can hit, best land gain first."""
+        best = self.land_gain.max(axis=0) if self.attackers else np.zeros(len(self.targets))
+        order = [col for col in np.argsort(-best, kind='stable') if best[col] > 0]
+        return {
+            'attackers': [{key: attacker[key] for key in ('code', 'name', 'land', 'max_sendable_op')}
+                          for attacker in self.attackers],
+            'targets': [{
+                'code': self.targets[col]['code'],
+                'name': self.targets[col]['name'],
+                'realm': self.targets[col]['realm'],
+                'land': self.targets[col]['land'],
+                'dp': self.targets[col]['dp'],
+                'ops_age': self.targets[col]['ops_age'],
+                'land_gain': [int(gain) for gain in self.land_gain[:, col]],
+            } for col in order]
+        }
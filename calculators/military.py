@@ -2,10 +2,13 @@ import time
 import logging
 from math import trunc
 
+import numpy as np
+
 from domain.models import Dominion
-from domain.refdata import Race
-from domain.refdata import GT_DEFENSE_FACTOR, GN_OFFENSE_BONUS, Unit, Spells
-from domain.refdata import NETWORTH_VALUES, BS_UNCERTAINTY, ARES_BONUS
+from domain.refdata import Race, UnitStats
+from domain.refdata import GT_DEFENSE_FACTOR, GN_OFFENSE_BONUS, Spells
+from domain.refdata import NETWORTH_VALUES, BS_UNCERTAINTY, ARES_BONUS, LAND_GAIN_FACTOR
+from domain.timeutils import hours_since
 
 logger = logging.getLogger('od-info.military')
 
@@ -14,6 +17,7 @@ class MilitaryCalculator(object):
     def __init__(self, dom: Dominion):
         self.dom = dom
         self.race = Race(dom, dom.race)
+        self.units = self.race.stats
         self.army = dom.military
         self.navy = dom.navy
         self.spells = None
@@ -24,8 +28,8 @@ class MilitaryCalculator(object):
         unit_txt = [f"{self.amount(i)} {self.unit_type(i).name} {self.unit_type(i).offense}/{self.unit_type(i).defense}" for i in range(1, 5)]
         return f"Military({'|'.join(unit_txt)}, {self.op}OP, {self.dp}DP)"
 
-    def unit_type(self, unit_nr: int) -> Unit:
-        return self.race.unit(unit_nr)
+    def unit_type(self, unit_nr: int) -> UnitStats:
+        return self.units[unit_nr]
 
     def amount(self, unit_nr: int) -> int:
         if self.army:
@@ -39,26 +43,28 @@ class MilitaryCalculator(object):
 
     def op_of(self, unit_nr: int, with_bonus=False, partial_amount=None):
         assert isinstance(unit_nr, int)
-        amount = partial_amount if partial_amount else self.amount(unit_nr)
-        op = amount * self.unit_type(unit_nr).offense
+        unit = self.units[unit_nr]
+        amount = partial_amount if partial_amount is not None else self.amount(unit_nr)
+        op = amount * unit.offense
 
         # Pairing perk (e.g. kobold)
-        if self.unit_type(unit_nr).has_perk('offense_from_pairing'):
-            slot, op_buff, num_required = self.unit_type(unit_nr).get_perk('offense_from_pairing')
-            pairable_amount = min(self.amount(int(slot)) // int(num_required), amount)
-            op += pairable_amount * int(op_buff)
+        if unit.offense_from_pairing:
+            slot, op_buff, num_required = unit.offense_from_pairing
+            pairable_amount = min(self.amount(slot) // num_required, amount)
+            op += pairable_amount * op_buff
 
         return (op * (1 + self.offense_bonus)) if with_bonus else op
 
     def dp_of(self, unit_nr: int, with_bonus=False, partial_amount=None):
-        amount = partial_amount if partial_amount else self.amount(unit_nr)
-        dp = amount * self.unit_type(unit_nr).defense
+        unit = self.units[unit_nr]
+        amount = partial_amount if partial_amount is not None else self.amount(unit_nr)
+        dp = amount * unit.defense
 
         # Pairing perk (e.g. kobold)
-        if self.unit_type(unit_nr).has_perk('defense_from_pairing'):
-            slot, buff, num_required = self.unit_type(unit_nr).get_perk('defense_from_pairing')
-            pairable_amount = min(self.amount(int(slot)) // int(num_required), amount)
-            dp += pairable_amount * int(buff)
+        if unit.defense_from_pairing:
+            slot, buff, num_required = unit.defense_from_pairing
+            pairable_amount = min(self.amount(slot) // num_required, amount)
+            dp += pairable_amount * buff
 
         return (dp * (1 + self.defense_bonus)) if with_bonus else dp
 
@@ -66,8 +72,8 @@ class MilitaryCalculator(object):
         """Return [boats, docks (protected boats), sendable units, total boat capacity]"""
         if self.navy:
             protected_boats = self.navy['docks'] * (2.25 + current_day * 0.05)
-            units_per_boat = 30 + self.race.get_perk('boat_capacity', 0)
-            total_sendable_units = sum([self.amount(self.race.nr_of_unit(u)) for u in self.race.sendable_units if u.need_boat])
+            units_per_boat = 30 + self.race.spec.boat_capacity
+            total_sendable_units = sum([self.amount(nr) for nr in self.units.sendable if self.units[nr].need_boat])
             return (round(self.navy['boats'], 1),
                     round(protected_boats, 1),
                     trunc(total_sendable_units),
@@ -187,32 +193,32 @@ class MilitaryCalculator(object):
     def safe_op_versus(self, enemy_op: int) -> tuple[int, int]:
         start = time.time()
         # First subtract power of all pure DP units
-        dp_at_home = sum([self.dp_of(self.race.nr_of_unit(u), with_bonus=True) for u in self.race.pure_defense_units])
+        dp_at_home = sum([self.dp_of(nr, with_bonus=True) for nr in self.units.pure_defense])
         dp_at_home += self.army['draftees'] * (1 + self.defense_bonus)
         op_to_defend = enemy_op - dp_at_home
 
         # Pure offense units don't contribute to defense, can always send
-        safe_op = sum([self.op_of(u, with_bonus=True) for u in self.dom.race.pure_offense_units])
+        safe_op = sum([self.op_of(nr, with_bonus=True) for nr in self.units.pure_offense])
 
         # Check the hybrid units
         # Most defensive hybrids first
-        for unit_type in self.dom.race.hybrids_by_dp:
+        for nr in self.units.hybrids_by_dp:
             if op_to_defend <= 0:
                 # Can use all these units to attack
                 units_needed = 0
                 dp_of_units_needed = 0
-                can_send_op = self.op_of(unit_type, with_bonus=True)
+                can_send_op = self.op_of(nr, with_bonus=True)
             else:
-                units_needed = (op_to_defend // (unit_type.defense * (1 + self.defense_bonus))) + 1
-                if units_needed < self.amount(unit_type):
+                units_needed = int(op_to_defend // (self.units[nr].defense * (1 + self.defense_bonus))) + 1
+                if units_needed < self.amount(nr):
                     # Only need part of these hybrid units
-                    dp_of_units_needed = self.dp_of(unit_type, partial_amount=units_needed, with_bonus=True)
+                    dp_of_units_needed = self.dp_of(nr, partial_amount=units_needed, with_bonus=True)
                     # Can attack with the rest
-                    remaining_units = self.amount(unit_type) - units_needed
-                    can_send_op = self.op_of(unit_type, with_bonus=True, partial_amount=remaining_units)
+                    remaining_units = self.amount(nr) - units_needed
+                    can_send_op = self.op_of(nr, with_bonus=True, partial_amount=remaining_units)
                 else:
                     # Need all these units to contribute to DP
-                    dp_of_units_needed = self.dp_of(unit_type, with_bonus=True)
+                    dp_of_units_needed = self.dp_of(nr, with_bonus=True)
                     can_send_op = 0
             op_to_defend -= dp_of_units_needed
             dp_at_home += dp_of_units_needed
@@ -222,20 +228,41 @@ class MilitaryCalculator(object):
         return trunc(safe_op), round(dp_at_home)
 
     @property
-    def flex_unit(self) -> Unit | None:
+    def safe_op_curve(self) -> list[tuple[int, int, int]]:
+        """Safe OP and home DP as a piecewise-linear function of enemy OP, as (enemy OP, safe OP, home DP) breakpoints.
+
+        Same reasoning as safe_op_versus, done in one pass over the hybrids: up to the DP of the pure defense units
+        everything can be sent, after that each hybrid type in turn (most defensive first) is kept home until all of
+        them are. Between breakpoints the values are linear, beyond the first and last breakpoint they're flat."""
+        if not self.army:
+            return []
+        home_dp = sum([self.dp_of(nr, with_bonus=True) for nr in self.units.pure_defense])
+        home_dp += self.army['draftees'] * (1 + self.defense_bonus)
+        safe_op = sum([self.op_of(nr, with_bonus=True) for nr in self.units.pure_offense + self.units.hybrids_by_dp])
+        curve = [(home_dp, safe_op, home_dp)]
+        for nr in self.units.hybrids_by_dp:
+            hybrid_dp = self.dp_of(nr, with_bonus=True)
+            if hybrid_dp > 0:
+                home_dp += hybrid_dp
+                safe_op -= self.op_of(nr, with_bonus=True)
+                curve.append((home_dp, safe_op, home_dp))
+        return [(round(enemy_op), trunc(op), round(dp)) for enemy_op, op, dp in curve]
+
+    @property
+    def flex_unit(self) -> UnitStats | None:
         if not hasattr(self, '_flex_unit'):
             fu = None
-            pure_offense = sum([self.op_of(self.race.nr_of_unit(u)) for u in self.race.pure_offense_units])
+            pure_offense = sum([self.op_of(nr) for nr in self.units.pure_offense])
             sendable_offense = pure_offense
             home_defense = self.dp
             hybrid_units_sendable = dict()
-            for unit_type in self.race.hybrid_units:
-                unit_nr = self.race.nr_of_unit(unit_type)
+            for unit_nr in self.units.hybrids_by_op_over_dp:
+                unit_type = self.units[unit_nr]
                 new_op = sendable_offense + self.op_of(unit_nr, True)
                 new_dp = home_defense - self.dp_of(unit_nr, True)
                 if new_op <= (1.25 * new_dp):
                     # Can send all of these units
-                    hybrid_units_sendable[unit_type] = self.amount(unit_nr)
+                    hybrid_units_sendable[unit_nr] = self.amount(unit_nr)
                     sendable_offense += self.op_of(unit_nr, True)
                     home_defense -= self.dp_of(unit_nr, True)
                 else:
@@ -250,7 +277,7 @@ class MilitaryCalculator(object):
         if not self._five_four_dp:
             logger.debug(f"Starting five_over_four for dom {self.dom.code} {self.dom.race} {self.dom.name}")
             if self.flex_unit:
-                flex_unit_nr = self.race.nr_of_unit(self.flex_unit)
+                flex_unit_nr = self.flex_unit.nr
                 k = 5 / 4 * self.op / self.dp
                 op_eff = self.flex_unit.offense
                 dp_eff = self.flex_unit.defense
@@ -263,19 +290,86 @@ class MilitaryCalculator(object):
             else:
                 self._five_four_op = trunc(self.op)
                 dp = self.dp
-                for unit_type in self.race.hybrid_units:
-                    dp -= self.dp_of(self.race.nr_of_unit(unit_type), True)
+                for unit_nr in self.units.hybrids_by_op_over_dp:
+                    dp -= self.dp_of(unit_nr, True)
                 self._five_four_dp = trunc(dp)
             logger.debug(f"op: {self._five_four_op}, 5/4 dp: {self._five_four_dp * 5 / 4}")
             if self._five_four_op > (round(self._five_four_dp * 5/4, 2)):
                 logger.warning(f"op: {self._five_four_op}, 5/4 dp: {round(self._five_four_dp * 5/4, 2)}")
         return round(self._five_four_op), round(self._five_four_dp)
 
+    def summary(self, current_day: int) -> dict:
+        """Plain values of all calculations the pages show, so they can be cached."""
+        five_four_op, five_four_dp = self.five_over_four
+        boats_amount, boats_prt, boats_sendable, boats_capacity = self.boats(current_day)
+        return {
+            'code': self.dom.code,
+            'name': self.dom.name,
+            'realm': self.dom.realm,
+            'race': self.dom.race,
+            'player': self.dom.player,
+            'has_army': self.army is not None,
+            'ops_age': hours_since(self.dom.last_op),
+            'land': self.dom.current_land,
+            'hittable_75_percent': self.hittable_75_percent,
+            'five_over_four_op': five_four_op,
+            'five_over_four_dp': five_four_dp,
+            'temples': self.temple_bonus,
+            'boats_amount': boats_amount,
+            'boats_prt': boats_prt,
+            'boats_sendable': boats_sendable,
+            'boats_capacity': boats_capacity,
+            'paid_until': self.army.get('paid_until', '?') if self.army else '?',
+            'offense_bonus': self.offense_bonus,
+            'defense_bonus': self.defense_bonus,
+            'raw_op': self.raw_op,
+            'op': self.op,
+            'raw_dp': self.raw_dp,
+            'dp': self.dp,
+            'safe_op': self.safe_op,
+            'safe_dp': self.safe_dp,
+            'safe_op_curve': self.safe_op_curve,
+            'max_sendable_op': self.max_sendable_op,
+            'ares': self.dom.magic.ares,
+            'networth': self.dom.current_networth,
+            'units': [{
+                'name': self.unit_type(i).name,
+                'amount': self.amount(i),
+                'offense': self.unit_type(i).offense,
+                'defense': self.unit_type(i).defense,
+                'op': self.op_of(i),
+                'dp': self.dp_of(i)
+            } for i in range(1, 5)]
+        }
+
+
+def evaluate_safe_op_curve(curve: list, enemy_op: int) -> tuple[int, int]:
+    """(safe OP, home DP) versus enemy_op, interpolated from MilitaryCalculator.safe_op_curve breakpoints."""
+    if not curve:
+        return 0, 0
+    if enemy_op <= curve[0][0]:
+        return curve[0][1], curve[0][2]
+    for (op_0, safe_0, dp_0), (op_1, safe_1, dp_1) in zip(curve, curve[1:]):
+        if enemy_op <= op_1:
+            fraction = (enemy_op - op_0) / (op_1 - op_0)
+            return trunc(safe_0 + fraction * (safe_1 - safe_0)), round(dp_0 + fraction * (dp_1 - dp_0))
+    return curve[-1][1], curve[-1][2]
+
+
+def land_gain(attacker_land, target_land):
+    """Acres conquered by a successful hit, as a function of the land ratio. Works on numbers and numpy arrays."""
+    attacker_land = np.asarray(attacker_land, dtype=float)
+    ratio = np.asarray(target_land, dtype=float) / attacker_land
+    coefficient = np.where(ratio < 0.55, 0.304 * ratio ** 2 - 0.227 * ratio + 0.048,
+                           np.where(ratio < 0.75, 0.154 * ratio - 0.069, 0.129 * ratio - 0.048))
+    return np.trunc(coefficient * attacker_land * LAND_GAIN_FACTOR)
+
 
 class RatioCalculator(object):
     def __init__(self, dom: Dominion):
         self.dom = dom
         self.race = Race(dom, dom.race)
+        self.units = self.race.stats
         self.army = dom.military
 
     @property
@@ -303,8 +397,8 @@ class RatioCalculator(object):
 
         networth -= self.amount(1) * NETWORTH_VALUES['specs']
         networth -= self.amount(2) * NETWORTH_VALUES['specs']
-        networth -= self.amount(3) * self.race.unit(3).networth
-        networth -= self.amount(4) * self.race.unit(4).networth
+        networth -= self.amount(3) * self.units[3].networth
+        networth -= self.amount(4) * self.units[4].networth
         return round(networth, 1)
 
     @property
@@ -339,7 +433,7 @@ class RatioCalculator(object):
     def spy_units_equiv(self) -> int:
         result = 0
         for i in range(1, 5):
-            unit_ratios = self.race.unit(i).ratios
+            unit_ratios = self.units[i].ratios
             spy_per_unit = max(unit_ratios['spy_offense'], unit_ratios['spy_defense'])
             result += trunc(self.amount(i) * spy_per_unit)
         return result
@@ -348,11 +442,32 @@ class RatioCalculator(object):
     def wiz_units_equiv(self) -> int:
         result = 0
         for i in range(1, 5):
-            unit_ratios = self.race.unit(i).ratios
+            unit_ratios = self.units[i].ratios
             wiz_per_unit = max(unit_ratios['wiz_offense'], unit_ratios['wiz_defense'])
             result += trunc(self.amount(i) * wiz_per_unit)
         return result
 
+    def summary(self) -> dict:
+        """Plain values of all ratio estimates, so they can be cached."""
+        return {
+            'code': self.dom.code,
+            'name': self.dom.name,
+            'realm': self.dom.realm,
+            'land': self.dom.current_land,
+            'race': self.dom.race,
+            'networth': self.dom.current_networth,
+            'spy_units_equiv': self.spy_units_equiv,
+            'wiz_units_equiv': self.wiz_units_equiv,
+            'spywiz_networth': self.spywiz_networth,
+            'spywiz_units': self.spywiz_units,
+            'ratio_estimate': self.ratio_estimate,
+            'spy_ratio_estimate': self.spy_ratio_estimate,
+            'max_spy_ratio_estimate': self.max_spy_ratio_estimate,
+            'wiz_ratio_estimate': self.wiz_ratio_estimate,
+            'max_wiz_ratio_estimate': self.max_wiz_ratio_estimate,
+            'ops_age': hours_since(self.dom.last_op)
+        }
+
 
 if __name__ == '__main__':
     from sqlalchemy import create_engine, select
@@ -0,0 +1,137 @@
+"""
+Monte Carlo estimate of the chance that an invasion breaks a target.
+
+Unit counts from ops are only accurate within a band (Clear Sight accuracy, Barracks Spy uncertainty)
+and Ares may or may not be up. Instead of one point estimate, every trial samples the unit counts of
+attacker and target within their bands and whether the target has Ares, for all pairs at once.
+
+The counts are sampled around the raw numbers of the ops, not around Dominion.military, which already
+corrects Barracks Spy counts for the uncertainty. Only units at home count (plus units in training, as
+MilitaryCalculator counts them): units that are returning can't be sent and don't defend. The attacker
+sends no more OP than the 5/4 rule allows with the DP it leaves at home.
+"""
+
+import logging
+from collections import namedtuple
+
+import numpy as np
+
+from calculators.military import MilitaryCalculator
+from domain.models import Dominion, BarracksSpy
+from domain.refdata import ARES_BONUS
+from domain.timeutils import hours_since
+
+logger = logging.getLogger('od-info.montecarlo')
+
+TRIALS = 5000
+ARES_PROBABILITY = 0.5  # Without a recent Revelation we just don't know
+
+FIVE_OVER_FOUR = 5 / 4
+
+ArmyEstimate = namedtuple('ArmyEstimate',
+                          'code amounts training unit_op unit_dp offense_bonus defense_bonus uncertainty ares_probability')
+
+
+def ops_uncertainty(dom: Dominion) -> float:
+    """Relative error of the unit counts: from the CS accuracy, or the BS uncertainty when the BS is newer."""
+    cs = dom.last_cs
+    bs = dom.last_barracks
+    if cs and (not bs or cs.timestamp >= bs.timestamp):
+        return 1 - (cs.clear_sight_accuracy or 1)
+    elif bs:
+        return 1 - BarracksSpy.BS_UNCERTAINTY
+    return 0
+
+
+def ares_probability(dom: Dominion) -> float:
+    ares = dom.magic.ares
+    if ares is not None and ares > 0:
+        return 1.0
+    if dom.last_revelation and hours_since(dom.last_revelation.timestamp) < 1:
+        return 0.0
+    return ARES_PROBABILITY
+
+
+def home_amounts(dom: Dominion) -> tuple[list, list]:
+    """Raw draftees and units 1-4 at home from the newest of CS and BS, and the units in training that are paid for."""
+    cs = dom.last_cs
+    bs = dom.last_barracks
+    if cs and (not bs or cs.timestamp >= bs.timestamp):
+        ticks_after_bs = hours_since(bs.timestamp) if bs else 0
+        home = [cs.military_draftees] + [cs.home_unit(i, bs, ticks_after_bs) for i in range(1, 5)]
+        training = [0] + [bs.aged_amount_training_for_unit(i) if bs else 0 for i in range(1, 5)]
+    elif bs:
+        home = [bs.draftees] + [getattr(bs, f'home_unit{i}') for i in range(1, 5)]
+        training = [0] + [bs.amount_training(i) if bs.paid_until_for_unit(i) > 0 else 0 for i in range(1, 5)]
+    else:
+        home = [0] * 5
+        training = [0] * 5
+    return home, training
+
+
+def army_estimate(dom: Dominion) -> ArmyEstimate:
+    """Draftees and units 1-4 with their OP and DP per unit (including pairing) and bonuses without Ares."""
+    mc = MilitaryCalculator(dom)
+    home, training = home_amounts(dom)
+    unit_op = [0] + [mc.op_of(i) / mc.amount(i) if mc.amount(i) else mc.unit_type(i).offense for i in range(1, 5)]
+    unit_dp = [1] + [mc.dp_of(i) / mc.amount(i) if mc.amount(i) else mc.unit_type(i).defense for i in range(1, 5)]
+    return ArmyEstimate(dom.code, np.array(home, dtype=float), np.array(training, dtype=float),
+                        np.array(unit_op), np.array(unit_dp),
+                        mc.offense_bonus, mc.defense_bonus - ARES_BONUS, ops_uncertainty(dom), ares_probability(dom))
+
+
+class InvasionSimulator(object):
+    def __init__(self, trials: int = TRIALS, seed=None):
+        self.trials = trials
+        self.rng = np.random.default_rng(seed)
+
+    def sample_amounts(self, estimates: list[ArmyEstimate]) -> np.ndarray:
+        """(armies, trials, units) unit counts: the raw counts of the ops uniformly within their uncertainty band,
+        plus the units in training."""
+        amounts = np.array([estimate.amounts for estimate in estimates]).reshape(len(estimates), 1, -1)
+        training = np.array([estimate.training for estimate in estimates]).reshape(len(estimates), 1, -1)
+        bands = np.array([estimate.uncertainty for estimate in estimates]).reshape(-1, 1, 1)
+        factors = self.rng.uniform(1 - bands, 1 + bands, size=(len(estimates), self.trials, amounts.shape[2]))
+        return amounts * factors + training
+
+    def op_samples(self, estimates: list[ArmyEstimate]) -> np.ndarray:
+        """(armies, trials) OP that can be sent under the 5/4 rule. Units are sent in order of OP per DP,
+        the last one partly, until the OP is 5/4 of the DP left at home (without Ares)."""
+        amounts = self.sample_amounts(estimates)
+        unit_op = np.array([estimate.unit_op for estimate in estimates]).reshape(len(estimates), 1, -1)
+        unit_dp = np.array([estimate.unit_dp for estimate in estimates]).reshape(len(estimates), 1, -1)
+        offense_bonus = np.array([estimate.offense_bonus for estimate in estimates]).reshape(-1, 1, 1)
+        defense_bonus = np.array([estimate.defense_bonus for estimate in estimates]).reshape(-1, 1, 1)
+        op = amounts * unit_op * (1 + offense_bonus)
+        dp = amounts * unit_dp * (1 + defense_bonus)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            op_per_dp = np.where(unit_op > 0, unit_op / unit_dp, -1)
+        order = np.argsort(-op_per_dp, axis=2, kind='stable')
+        op = np.take_along_axis(op, np.broadcast_to(order, op.shape), axis=2)
+        dp = np.take_along_axis(dp, np.broadcast_to(order, dp.shape), axis=2)
+        sent = np.zeros(op.shape[:2])
+        home_dp = dp.sum(axis=2)
+        for nr in range(op.shape[2]):
+            room = FIVE_OVER_FOUR * home_dp - sent
+            cost = op[:, :, nr] + FIVE_OVER_FOUR * dp[:, :, nr]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                fraction = np.where(op[:, :, nr] > 0, np.clip(room / cost, 0, 1), 0)
+            sent += fraction * op[:, :, nr]
+            home_dp -= fraction * dp[:, :, nr]
+        return sent
+
+    def dp_samples(self, estimates: list[ArmyEstimate]) -> np.ndarray:
+        """(armies, trials) DP at home, with Ares up in a trial according to its probability."""
+        unit_dp = np.array([estimate.unit_dp for estimate in estimates]).reshape(len(estimates), 1, -1)
+        bonus = np.array([estimate.defense_bonus for estimate in estimates]).reshape(-1, 1)
+        ares_chance = np.array([estimate.ares_probability for estimate in estimates]).reshape(-1, 1)
+        ares = self.rng.random((len(estimates), self.trials)) < ares_chance
+        return (self.sample_amounts(estimates) * unit_dp).sum(axis=2) * (1 + bonus + ares * ARES_BONUS)
+
+    def hit_probability(self, attackers: list[ArmyEstimate], targets: list[ArmyEstimate]) -> np.ndarray:
+        """(attackers, targets) chance that the attacker's OP is more than the target's DP."""
+        if not attackers or not targets:
+            return np.zeros((len(attackers), len(targets)))
+        op = self.op_samples(attackers)[:, np.newaxis, :]
+        dp = self.dp_samples(targets)[np.newaxis, :, :]
+        return (op > dp).mean(axis=2)
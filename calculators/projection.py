@@ -0,0 +1,194 @@
+"""
+Tick by tick projection of the economy of many dominions at once.
+
+Starts from the last Clear Sight and Survey Dominion of each dominion and simulates resource production,
+peasant growth towards the population capacity and buildings under construction finishing.
+All dominions are simulated together in numpy arrays, one row per dominion.
+"""
+
+import time
+import logging
+
+import numpy as np
+
+from config import PLAT_PER_ALCHEMY_PER_TICK, PLAT_PER_PEASANT_PER_TICK
+from config import FOOD_PER_FARM_PER_TICK, FOOD_PER_DOCK_PER_TICK, FOOD_EATEN_PER_POP_PER_TICK, FOOD_DECAY_PER_TICK
+from config import LUMBER_PER_LUMBERYARD_PER_TICK, LUMBER_DECAY_PER_TICK, MANA_PER_TOWER_PER_TICK, MANA_DECAY_PER_TICK
+from config import ORE_PER_ORE_MINE_PER_TICK, GEMS_PER_DIAMOND_MINE_PER_TICK
+from config import PEASANT_GROWTH_PER_TICK, PEASANT_SHRINK_PER_TICK
+from domain.domainhelper import NON_HOME_TYPES, JOB_TYPES, JOBS_PER_BUILDING
+from domain.domainhelper import POP_PER_HOME, POP_PER_NON_HOME, POP_PER_BARREN
+from domain.models import Dominion
+from domain.refdata import tech_tree, BUILD_TICKS
+from domain.timeutils import hours_since
+
+logger = logging.getLogger('od-info.projection')
+
+BUILDING_TYPES = ('home',) + NON_HOME_TYPES
+RESOURCES = ('platinum', 'food', 'lumber', 'mana', 'ore', 'gems')
+MILITARY_FIELDS = ('draftees', 'unit1', 'unit2', 'unit3', 'unit4', 'spies', 'assassins', 'wizards', 'archmages')
+PRODUCTION_PERKS = {
+    'platinum': 'platinum_production',
+    'food': 'food_production',
+    'lumber': 'lumber_production',
+    'mana': 'mana_production',
+    'ore': 'ore_production',
+    'gems': 'gem_production',
+}
+MAX_OPS_AGE = 48  # hours, a projection from older ops is mostly guesswork
+
+
+def can_project(dom: Dominion) -> bool:
+    return (dom.last_cs is not None) and (dom.last_survey is not None)
+
+
+def _building_column(name: str) -> int:
+    return BUILDING_TYPES.index(name)
+
+
+class EconomyProjection(object):
+    def __init__(self, doms, ticks: int = 24, max_ops_age: int = MAX_OPS_AGE):
+        """Project all dominions that have a CS no older than max_ops_age and a Survey, up to ticks from now."""
+        start = time.time()
+        self.doms: list[Dominion] = [dom for dom in doms
+                                     if can_project(dom) and self._ops_age(dom) <= max_ops_age]
+        self.ticks = ticks
+        n = len(self.doms)
+        self.codes = np.array([dom.code for dom in self.doms], dtype=int)
+        self.row_of = {dom.code: row for row, dom in enumerate(self.doms)}
+        self.ops_age = np.array([self._ops_age(dom) for dom in self.doms], dtype=int)
+        self.resources = np.zeros((n, len(RESOURCES)))
+        self.production_bonus = np.zeros((n, len(RESOURCES)))
+        self.peasants = np.zeros(n)
+        self.military = np.zeros(n)
+        self.population_bonus = np.ones(n)
+        self.buildings = np.zeros((n, len(BUILDING_TYPES)))
+        self.barren = np.zeros(n)
+        self.constructing = np.zeros((n, BUILD_TICKS + 1, len(BUILDING_TYPES)))
+        for row, dom in enumerate(self.doms):
+            self._gather(row, dom)
+        self._gather_tech_bonus()
+        self.gather_time = time.time() - start
+        self.history: dict[str, np.ndarray] = dict()
+        self.calculate_time = 0
+
+    @staticmethod
+    def _ops_age(dom: Dominion) -> int:
+        """Resources and peasants come from the CS, so that's where the projection starts."""
+        return hours_since(dom.last_cs.timestamp)
+
+    def _gather(self, row: int, dom: Dominion):
+        cs = dom.last_cs
+        survey = dom.last_survey
+        for col, resource in enumerate(RESOURCES):
+            self.resources[row, col] = getattr(cs, f'resource_{resource}') or 0
+        if dom.last_castle:
+            self.production_bonus[row, RESOURCES.index('platinum')] += dom.last_castle.science_rating
+        self.peasants[row] = cs.peasants
+        self.military[row] = sum(getattr(cs, f'military_{field}') or 0 for field in MILITARY_FIELDS)
+        self.population_bonus[row] = dom.population_bonus
+        for col, name in enumerate(BUILDING_TYPES):
+            self.buildings[row, col] = getattr(survey, name) or 0
+        self.barren[row] = survey.barren_land or 0
+        constructing = survey.constructing_queue
+        for name in constructing.items():
+            if name in BUILDING_TYPES:
+                for tick, amount in constructing.per_tick(name).items():
+                    tick = min(max(tick, 0), BUILD_TICKS)
+                    self.constructing[row, tick, _building_column(name)] += amount
+
+    def _gather_tech_bonus(self):
+        """Production perks of the techs of all dominions in one go."""
+        tree = tech_tree()
+        perks = tree.perk_matrix([dom.tech.bitset for dom in self.doms])
+        for col, resource in enumerate(RESOURCES):
+            perk = PRODUCTION_PERKS[resource]
+            if perk in tree.perk_column:
+                self.production_bonus[:, col] += perks[:, tree.perk_column[perk]] / 100
+
+    @property
+    def steps(self) -> int:
+        """Ticks to simulate: from the oldest ops up to the requested ticks from now."""
+        return (int(self.ops_age.max()) if len(self.doms) else 0) + self.ticks
+
+    def run(self):
+        """Simulate all dominions, keeping the state of every tick in self.history as (dominions, ticks) arrays."""
+        start = time.time()
+        n = len(self.doms)
+        steps = self.steps
+        history = {name: np.zeros((n, steps + 1)) for name in RESOURCES + ('peasants', 'capacity', 'constructing')}
+        resources = self.resources.copy()
+        buildings = self.buildings.copy()
+        constructing = self.constructing.copy()
+        peasants = self.peasants.copy()
+        job_columns = [_building_column(name) for name in JOB_TYPES]
+        col = {name: _building_column(name) for name in BUILDING_TYPES}
+        res = {name: RESOURCES.index(name) for name in RESOURCES}
+
+        for tick in range(steps + 1):
+            if tick > 0:
+                # Buildings that finish this tick
+                constructing = np.concatenate([constructing[:, 1:, :], np.zeros((n, 1, len(BUILDING_TYPES)))], axis=1)
+                buildings += constructing[:, 0, :]
+                constructing[:, 0, :] = 0
+
+                jobs = buildings[:, job_columns].sum(axis=1) * JOBS_PER_BUILDING
+                employed = np.minimum(peasants, jobs)
+                production = np.zeros_like(resources)
+                production[:, res['platinum']] = (np.trunc(employed * PLAT_PER_PEASANT_PER_TICK)
+                                                  + buildings[:, col['alchemy']] * PLAT_PER_ALCHEMY_PER_TICK)
+                production[:, res['food']] = (buildings[:, col['farm']] * FOOD_PER_FARM_PER_TICK
+                                              + buildings[:, col['dock']] * FOOD_PER_DOCK_PER_TICK)
+                production[:, res['lumber']] = buildings[:, col['lumberyard']] * LUMBER_PER_LUMBERYARD_PER_TICK
+                production[:, res['mana']] = buildings[:, col['tower']] * MANA_PER_TOWER_PER_TICK
+                production[:, res['ore']] = buildings[:, col['ore_mine']] * ORE_PER_ORE_MINE_PER_TICK
+                production[:, res['gems']] = buildings[:, col['diamond_mine']] * GEMS_PER_DIAMOND_MINE_PER_TICK
+                production = np.trunc(production * (1 + self.production_bonus))
+
+                decay = np.zeros_like(resources)
+                decay[:, res['food']] = (resources[:, res['food']] * FOOD_DECAY_PER_TICK
+                                         + (peasants + self.military) * FOOD_EATEN_PER_POP_PER_TICK)
+                decay[:, res['lumber']] = resources[:, res['lumber']] * LUMBER_DECAY_PER_TICK
+                decay[:, res['mana']] = resources[:, res['mana']] * MANA_DECAY_PER_TICK
+                resources = np.maximum(resources + production - np.trunc(decay), 0)
+
+                room = capacity - self.military - peasants
+                growth = np.where(room > 0,
+                                  np.minimum(peasants * PEASANT_GROWTH_PER_TICK, room),
+                                  room * PEASANT_SHRINK_PER_TICK)
+                peasants = np.maximum(peasants + growth, 0)
+
+            raw_capacity = (buildings[:, col['home']] * POP_PER_HOME
+                            + buildings[:, 1:].sum(axis=1) * POP_PER_NON_HOME
+                            + constructing.sum(axis=(1, 2)) * POP_PER_NON_HOME
+                            + self.barren * POP_PER_BARREN)
+            capacity = np.trunc(raw_capacity * self.population_bonus)
+
+            for name in RESOURCES:
+                history[name][:, tick] = resources[:, res[name]]
+            history['peasants'][:, tick] = peasants
+            history['capacity'][:, tick] = capacity
+            history['constructing'][:, tick] = constructing.sum(axis=(1, 2))
+
+        self.history = history
+        self.calculate_time = time.time() - start
+        logger.debug(f"Economy projection of {n} dominions over {steps} ticks: "
+                     f"gathering {self.gather_time * 1000:.1f} ms, calculating {self.calculate_time * 1000:.1f} ms")
+        return self
+
+    def projected(self, name: str, ticks_from_now: int = 0) -> np.ndarray:
+        """Value of name (a resource, peasants, capacity or constructing) for all dominions, ticks_from_now ticks from now."""
+        if not self.history:
+            self.run()
+        columns = np.minimum(self.ops_age + ticks_from_now, self.steps)
+        return np.take_along_axis(self.history[name], columns[:, np.newaxis], axis=1)[:, 0]
+
+    def summary(self, dom_code: int, ticks_from_now: int = 0) -> dict | None:
+        """Plain values of the projected economy of a dominion, None if it couldn't be projected."""
+        if dom_code not in self.row_of:
+            return None
+        row = self.row_of[dom_code]
+        result = {'code': dom_code, 'ticks_from_now': ticks_from_now, 'ops_age': int(self.ops_age[row])}
+        for name in RESOURCES + ('peasants', 'capacity', 'constructing'):
+            result[name] = int(self.projected(name, ticks_from_now)[row])
+        return result
@@ -0,0 +1,113 @@
+"""
+Batch version of RatioCalculator: calculates all /ratios columns for many dominions at once with numpy arrays.
+
+Dominions go through three stages, each timed: filtering on ops age and available ops,
+gathering unit counts, land, buildings and unit perks into arrays, and calculating.
+"""
+
+import time
+import logging
+
+import numpy as np
+
+from domain.models import Dominion
+from domain.refdata import Race, NETWORTH_VALUES
+from domain.timeutils import hours_since
+
+logger = logging.getLogger('od-info.ratioengine')
+
+MAX_OPS_AGE = 100
+
+
+def _round(values: np.ndarray, digits: int) -> np.ndarray:
+    """Python's round() per element. np.round() scales before rounding and can differ in the last digit."""
+    return np.frompyfunc(round, 2, 1)(values, digits).astype(float)
+
+
+class RatioEngine(object):
+    def __init__(self, doms, max_ops_age=MAX_OPS_AGE):
+        start = time.time()
+        rows = list()
+        # Filter stage: only dominions with recent enough ops and a known army and buildings
+        for dom in doms:
+            ops_age = hours_since(dom.last_op)
+            if ops_age < max_ops_age:
+                army = dom.military
+                buildings = dom.buildings
+                if (army is not None) and (buildings is not None):
+                    rows.append((dom, army, buildings, ops_age))
+        self.filter_time = time.time() - start
+
+        start = time.time()
+        self.doms: list[Dominion] = [dom for dom, army, buildings, ops_age in rows]
+        n = len(rows)
+        self.amounts = np.zeros((n, 4))
+        self.unit_networth = np.zeros((n, 4))
+        self.spy_per_unit = np.zeros((n, 4))
+        self.wiz_per_unit = np.zeros((n, 4))
+        self.land = np.zeros(n)
+        self.buildings = np.zeros(n)
+        self.networth = np.zeros(n)
+        self.ops_age = np.zeros(n, dtype=int)
+        for row, (dom, army, buildings, ops_age) in enumerate(rows):
+            stats = Race(dom, dom.race).stats
+            for i in range(1, 5):
+                unit = stats[i]
+                self.amounts[row, i - 1] = army.get(f'unit{i}', 0)
+                self.unit_networth[row, i - 1] = unit.networth
+                self.spy_per_unit[row, i - 1] = max(unit.ratios['spy_offense'], unit.ratios['spy_defense'])
+                self.wiz_per_unit[row, i - 1] = max(unit.ratios['wiz_offense'], unit.ratios['wiz_defense'])
+            self.land[row] = dom.current_land
+            self.buildings[row] = buildings.total
+            self.networth[row] = dom.current_networth
+            self.ops_age[row] = ops_age
+        self.gather_time = time.time() - start
+
+    def calculate(self) -> dict[int, dict]:
+        """All ratio estimates, keyed on dominion code. Same results as RatioCalculator.summary()."""
+        start = time.time()
+        # Specs (units 1 and 2) have a fixed networth, elites (units 3 and 4) depend on their OP/DP.
+        # Subtracted in the same order as RatioCalculator.spywiz_networth and rounded before the units are
+        # derived from it, so float errors end up the same.
+        spywiz_networth = (self.networth
+                           - self.land * NETWORTH_VALUES['land']
+                           - self.buildings * NETWORTH_VALUES['buildings']
+                           - self.amounts[:, 0] * NETWORTH_VALUES['specs']
+                           - self.amounts[:, 1] * NETWORTH_VALUES['specs']
+                           - self.amounts[:, 2] * self.unit_networth[:, 2]
+                           - self.amounts[:, 3] * self.unit_networth[:, 3])
+        spywiz_networth = _round(spywiz_networth, 1)
+        spywiz_units = np.rint(spywiz_networth / NETWORTH_VALUES['spywiz'])
+        ratio_estimate = _round(spywiz_units / (2 * self.land), 3)
+        max_ratio_estimate = _round(spywiz_units / self.land, 3)
+        spy_units_equiv = np.trunc(self.amounts * self.spy_per_unit).sum(axis=1)
+        wiz_units_equiv = np.trunc(self.amounts * self.wiz_per_unit).sum(axis=1)
+        spy_ratio_estimate = _round(ratio_estimate + spy_units_equiv / self.land, 3)
+        max_spy_ratio_estimate = _round(max_ratio_estimate + spy_units_equiv / self.land, 3)
+        wiz_ratio_estimate = _round(ratio_estimate + wiz_units_equiv / self.land, 3)
+        max_wiz_ratio_estimate = _round(max_ratio_estimate + wiz_units_equiv / self.land, 3)
+
+        result = dict()
+        for row, dom in enumerate(self.doms):
+            result[dom.code] = {
+                'code': dom.code,
+                'name': dom.name,
+                'realm': dom.realm,
+                'land': int(self.land[row]),
+                'race': dom.race,
+                'networth': int(self.networth[row]),
+                'spy_units_equiv': int(spy_units_equiv[row]),
+                'wiz_units_equiv': int(wiz_units_equiv[row]),
+                'spywiz_networth': float(spywiz_networth[row]),
+                'spywiz_units': int(spywiz_units[row]),
+                'ratio_estimate': float(ratio_estimate[row]),
+                'spy_ratio_estimate': float(spy_ratio_estimate[row]),
+                'max_spy_ratio_estimate': float(max_spy_ratio_estimate[row]),
+                'wiz_ratio_estimate': float(wiz_ratio_estimate[row]),
+                'max_wiz_ratio_estimate': float(max_wiz_ratio_estimate[row]),
+                'ops_age': int(self.ops_age[row])
+            }
+        self.calculate_time = time.time() - start
+        logger.debug(f"Ratio estimates for {len(self.doms)} dominions: filtering {self.filter_time * 1000:.1f} ms, "
+                     f"gathering {self.gather_time * 1000:.1f} ms, calculating {self.calculate_time * 1000:.1f} ms")
+        return result
@@ -0,0 +1,59 @@
+"""
+Ranks dominions by what a single theft op would bring in right now.
+
+Resources of the latest Clear Sight are projected to the current tick with the economy projection,
+then the haul per op follows from the theft rules and the number of spies we can send.
+"""
+
+import logging
+
+import numpy as np
+
+from calculators.projection import EconomyProjection
+from domain.refdata import THEFT_RULES
+
+logger = logging.getLogger('od-info.stealables')
+
+STOLEN_RESOURCES = ('platinum', 'food', 'lumber', 'mana', 'ore', 'gems')
+RANKING = ('platinum', 'food', 'mana', 'gems', 'lumber')
+
+
+def haul_per_op(amounts: np.ndarray, spies: int | None) -> np.ndarray:
+    """Haul per op for a (dominions, STOLEN_RESOURCES) array of amounts. Without known spies there's no limit."""
+    percentages = np.array([THEFT_RULES[resource].percentage for resource in STOLEN_RESOURCES])
+    haul = amounts * percentages
+    if spies:
+        max_per_op = np.array([THEFT_RULES[resource].max_per_spy for resource in STOLEN_RESOURCES]) * spies
+        haul = np.minimum(haul, max_per_op)
+    return np.trunc(haul)
+
+
+def rank_stealables(rows, projection: EconomyProjection, spies: int | None = None) -> list[dict]:
+    """Rows of the latest CS per dominion with projected resources and haul per op, best targets first."""
+    rows = list(rows)
+    amounts = np.zeros((len(rows), len(STOLEN_RESOURCES)))
+    projected = np.zeros(len(rows), dtype=bool)
+    for col, resource in enumerate(STOLEN_RESOURCES):
+        now = projection.projected(resource)
+        for i, row in enumerate(rows):
+            if row.dominion in projection.row_of:
+                amounts[i, col] = now[projection.row_of[row.dominion]]
+                projected[i] = True
+            else:
+                amounts[i, col] = getattr(row, resource) or 0
+    haul = haul_per_op(amounts, spies)
+
+    result = list()
+    for i, row in enumerate(rows):
+        entry = {
+            'dominion': row.dominion,
+            'name': row.name,
+            'land': row.land,
+            'timestamp': row.timestamp,
+            'projected': bool(projected[i]),
+        }
+        for col, resource in enumerate(STOLEN_RESOURCES):
+            entry[resource] = int(amounts[i, col])
+            entry[f'{resource}_per_op'] = int(haul[i, col])
+        result.append(entry)
+    return sorted(result, key=lambda e: tuple(e[f'{resource}_per_op'] for resource in RANKING), reverse=True)
@@ -28,6 +28,7 @@ DATE_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
 INSTANCE_DIR = 'instance'
 OUT_DIR = './out'
 REF_DATA_DIR = './ref-data'
+REF_DATA_BUNDLE = f'{INSTANCE_DIR}/ref-data.marshal'
 OPS_DATA_DIR = 'opsdata'
 SECRET_FILE = f'{INSTANCE_DIR}/secret.txt'
 USERS_FILE = f'{INSTANCE_DIR}/users.json'
@@ -48,6 +49,22 @@ MY_OP_CENTER_URL = f'{OD_BASE}/dominion/advisors/op-center'
 PLAT_PER_ALCHEMY_PER_TICK = 45
 PLAT_PER_PEASANT_PER_TICK = 2.7
 PEASANTS_PER_HOME = 30
+# Raw production, upkeep and decay, before perks and bonuses.
+# From OpenDominion's app/Calculators/Dominion/ProductionCalculator.php.
+FOOD_PER_FARM_PER_TICK = 80
+FOOD_PER_DOCK_PER_TICK = 35
+FOOD_EATEN_PER_POP_PER_TICK = 0.25  # Peasants and military both eat
+FOOD_DECAY_PER_TICK = 0.01  # Fraction of the stockpile
+LUMBER_PER_LUMBERYARD_PER_TICK = 50
+LUMBER_DECAY_PER_TICK = 0.01
+MANA_PER_TOWER_PER_TICK = 25
+MANA_DECAY_PER_TICK = 0.02
+ORE_PER_ORE_MINE_PER_TICK = 60
+GEMS_PER_DIAMOND_MINE_PER_TICK = 15
+# Peasant births and the shrink when the population is over its capacity.
+# From OpenDominion's app/Calculators/Dominion/PopulationCalculator.php.
+PEASANT_GROWTH_PER_TICK = 0.03  # Of the current peasants, limited by the room left
+PEASANT_SHRINK_PER_TICK = 0.05  # Of the peasants over the capacity
 
 # Template of the secrets.txt file that gets saved when it can't be found.
 
@@ -3,9 +3,15 @@ import sys
 from opsdata.db import Database
 from config import DATABASE
 
+# The app caches pages on this version, so it must see that a script changed the data
+BUMP_DATA_VERSION = ("INSERT INTO DataVersion (id, version) VALUES (1, 1) "
+                     "ON CONFLICT (id) DO UPDATE SET version = version + 1")
+
 
 if __name__ == '__main__':
     database = Database()
     database.init(DATABASE)
     database.executescript(sys.argv[1])
+    if database.query("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'DataVersion'", one=True):
+        database.execute(BUMP_DATA_VERSION, ())
     database.close()
@@ -1,11 +1,45 @@
 import logging
+import time
+from threading import Lock
 
-from sqlalchemy import literal_column, func
-from domain.models import Dominion, TownCrier
+from sqlalchemy import literal_column, func, tuple_, or_, delete, update, insert
+from domain.models import Dominion, DominionHistory, TownCrier, DominionAwards, RealmAwards, RealmHistory, DataVersion
+from domain.models import BarracksSpy, SurveyDominion, LandSpy, OpsQueue, OpsQueueTotal
+from domain.domainhelper import Queue
 
 
 logger = logging.getLogger('od-info.dal')
 
+DATA_VERSION_CHECK_INTERVAL = 1  # seconds
+_DATA_VERSION = {'version': None, 'checked': 0.0, 'lock': Lock()}
+YIELD_PER = 50
+
+
+def data_version(db) -> int:
+    """Counter that goes up with every write to the database, so anything derived from the data can be keyed on it.
+    It's stored in the database, so writes by scripts and other processes count as well. Those are seen within
+    DATA_VERSION_CHECK_INTERVAL seconds, writes by this process at once."""
+    now = time.monotonic()
+    if _DATA_VERSION['version'] is None or (now - _DATA_VERSION['checked'] >= DATA_VERSION_CHECK_INTERVAL):
+        _DATA_VERSION['version'] = db.session.scalar(db.select(DataVersion.version).where(DataVersion.id == 1)) or 0
+        _DATA_VERSION['checked'] = now
+    return _DATA_VERSION['version']
+
+
+def bump_data_version(db) -> int:
+    """Count a write: part of the caller's transaction, so call it before the commit of what was written,
+    once per ingest. Returns the new version."""
+    with _DATA_VERSION['lock']:
+        bumped = db.session.execute(update(DataVersion).where(DataVersion.id == 1)
+                                    .values(version=DataVersion.version + 1)).rowcount
+        if not bumped:
+            db.session.execute(insert(DataVersion).values(id=1, version=1))
+        version = db.session.scalar(db.select(DataVersion.version).where(DataVersion.id == 1)) if bumped else 1
+        # Read again on next use, by then the caller committed
+        _DATA_VERSION['checked'] = 0.0
+        logger.debug(f"Data version now {version}")
+        return version
+
 
 def all_doms(db):
     return db.session.execute(db.select(Dominion)).scalars()
@@ -24,14 +58,318 @@ def realmies(db, domid) -> list[Dominion]:
     return db.session.execute(db.select(Dominion).where(Dominion.realm == realm_number)).scalars()
 
 
+def history_version(db, domid) -> tuple:
+    """Number of history rows and the latest timestamp: changes whenever history of the dominion comes in."""
+    qry = db.select(func.count(), func.max(DominionHistory.timestamp)).where(DominionHistory.dominion_id == domid)
+    return tuple(db.session.execute(qry).one())
+
+
+def doms_version(db, codes: list[int] | None = None) -> tuple:
+    """Latest ops and history of the dominions (all of them without codes), and their realms: changes whenever
+    ops or history of one of them come in, or one of them moves realm."""
+    doms = db.select(func.count(), func.max(Dominion.last_op), func.sum(Dominion.realm * Dominion.code))
+    history = db.select(func.count(), func.max(DominionHistory.timestamp))
+    if codes is not None:
+        doms = doms.where(Dominion.code.in_(codes))
+        history = history.where(DominionHistory.dominion_id.in_(codes))
+    return tuple(db.session.execute(doms).one()) + tuple(db.session.execute(history).one())
+
+
+def dom_history(db, domid) -> list:
+    """(timestamp, land, networth) rows of a dominion, oldest first."""
+    qry = (db.select(DominionHistory.timestamp, DominionHistory.land, DominionHistory.networth)
+           .where(DominionHistory.dominion_id == domid)
+           .order_by(DominionHistory.timestamp))
+    return db.session.execute(qry).all()
+
+
+def _latest_history(db):
+    """Current land and networth per dominion: its most recent history row."""
+    recency = func.row_number().over(partition_by=DominionHistory.dominion_id,
+                                     order_by=DominionHistory.timestamp.desc())
+    return db.select(DominionHistory.dominion_id.label('dominion'), DominionHistory.land, DominionHistory.networth,
+                     recency.label('recency')).subquery()
+
+
+def _filter_doms(qry, latest, realm=None, min_land=None, max_land=None, ops_since=None, code=None):
+    qry = qry.join(latest, latest.c.dominion == Dominion.code).where(latest.c.recency == 1)
+    if code is not None:
+        qry = qry.where(Dominion.code == code)
+    if realm is not None:
+        qry = qry.where(Dominion.realm == realm)
+    if min_land is not None:
+        qry = qry.where(latest.c.land >= min_land)
+    if max_land is not None:
+        qry = qry.where(latest.c.land <= max_land)
+    if ops_since is not None:
+        qry = qry.where(Dominion.last_op >= ops_since)
+    return qry
+
+
+def filtered_doms(db, realm=None, min_land=None, max_land=None, ops_since=None, code=None) -> list[Dominion]:
+    latest = _latest_history(db)
+    qry = _filter_doms(db.select(Dominion), latest, realm, min_land, max_land, ops_since, code)
+    return list(db.session.execute(qry).scalars())
+
+
+def doms_by(db, column: str = 'land', limit=None):
+    """Dominions, largest current land or networth first.
+    A one-shot iterator that loads them from the database in batches while it's consumed."""
+    latest = _latest_history(db)
+    qry = _filter_doms(db.select(Dominion), latest).order_by(getattr(latest.c, column).desc(), Dominion.code)
+    if limit:
+        qry = qry.limit(limit)
+    return db.session.execute(qry.execution_options(yield_per=YIELD_PER)).scalars()
+
+
+def query_dominions(db, realm=None, min_land=None, max_land=None, ops_since=None, code=None,
+                    sort='land', descending=True, after=None, limit=None) -> list:
+    """Dominions with their current land and networth, filtered, sorted and paged in SQL.
+    after is the (sort value, code) of the last row of the previous page."""
+    latest = _latest_history(db)
+    columns = {'land': latest.c.land, 'networth': latest.c.networth,
+               'realm': Dominion.realm, 'name': Dominion.name, 'code': Dominion.code}
+    qry = db.select(Dominion.code, Dominion.name, Dominion.realm, Dominion.race, Dominion.player, Dominion.role,
+                    Dominion.last_op, latest.c.land, latest.c.networth)
+    qry = _filter_doms(qry, latest, realm, min_land, max_land, ops_since, code)
+    key = tuple_(columns[sort], Dominion.code)
+    if after:
+        qry = qry.where(key < tuple_(*after) if descending else key > tuple_(*after))
+    if descending:
+        qry = qry.order_by(columns[sort].desc(), Dominion.code.desc())
+    else:
+        qry = qry.order_by(columns[sort], Dominion.code)
+    if limit:
+        qry = qry.limit(limit)
+    return db.session.execute(qry).all()
+
+
+def query_town_crier_page(db, event_type=None, realm=None, dominion=None, since=None, until=None,
+                          descending=True, after=None, limit=None) -> list[TownCrier]:
+    """Town Crier events, filtered and paged in SQL on their key (timestamp, origin, target, event_type).
+    A realm or dominion matches events where it is the origin or the target."""
+    qry = db.select(TownCrier)
+    if event_type:
+        qry = qry.where(TownCrier.event_type == event_type)
+    if realm is not None:
+        codes = db.select(Dominion.code).where(Dominion.realm == realm)
+        qry = qry.where(or_(TownCrier.origin.in_(codes), TownCrier.target.in_(codes)))
+    if dominion is not None:
+        qry = qry.where(or_(TownCrier.origin == dominion, TownCrier.target == dominion))
+    if since is not None:
+        qry = qry.where(TownCrier.timestamp >= since)
+    if until is not None:
+        qry = qry.where(TownCrier.timestamp < until)
+    columns = (TownCrier.timestamp, TownCrier.origin, TownCrier.target, TownCrier.event_type)
+    if after:
+        key = tuple_(*columns)
+        qry = qry.where(key < tuple_(*after) if descending else key > tuple_(*after))
+    qry = qry.order_by(*(column.desc() if descending else column for column in columns))
+    if limit:
+        qry = qry.limit(limit)
+    return list(db.session.execute(qry).scalars())
+
+
 def query_count(db, query):
-    counter = query.with_only_columns(func.count(literal_column("1")))
+    counter = query.with_only_columns(func.count(literal_column("1")), maintain_column_froms=True)
     counter = counter.order_by(None)
     return db.session.execute(counter).scalar()
 
 
-def query_town_crier(db):
-    return db.session.execute(db.select(TownCrier)).scalars()
+def town_crier_event_types(db) -> list[str]:
+    qry = db.select(TownCrier.event_type).distinct().order_by(TownCrier.event_type)
+    return list(db.session.execute(qry).scalars())
+
+
+def town_crier_keys_at(db, timestamp) -> set[tuple]:
+    """Primary keys of the Town Crier events at the timestamp."""
+    qry = db.select(TownCrier.timestamp, TownCrier.origin, TownCrier.event_type, TownCrier.target)
+    return {tuple(row) for row in db.session.execute(qry.where(TownCrier.timestamp == timestamp))}
+
+
+def count_awards(db, events):
+    """Add Town Crier events to the award totals of their dominions and realms. The caller commits.
+    Like the awards always did, every event that moved land is a hit, whatever its event type."""
+    doms = dict()
+    realms = dict()
+
+    def dom_awards(code, name) -> DominionAwards:
+        code = int(code)
+        if code not in doms:
+            doms[code] = db.session.get(DominionAwards, code) or DominionAwards(
+                code=code, hits_done=0, land_done=0, hits_taken=0, land_taken=0, bounces_done=0, bounces_taken=0)
+            db.session.add(doms[code])
+        doms[code].name = name
+        return doms[code]
+
+    def realm_awards(realm, name) -> RealmAwards:
+        realm = int(realm)
+        if realm not in realms:
+            realms[realm] = db.session.get(RealmAwards, realm) or RealmAwards(
+                realm=realm, war_declarations=0, declared_on=0)
+            db.session.add(realms[realm])
+        realms[realm].name = name
+        return realms[realm]
+
+    for event in events:
+        land = int(event.amount) if str(event.amount or '').strip().isdigit() else 0
+        if land > 0:
+            attacker = dom_awards(event.origin, event.origin_name)
+            attacker.hits_done += 1
+            attacker.land_done += land
+            defender = dom_awards(event.target, event.target_name)
+            defender.hits_taken += 1
+            defender.land_taken += land
+        elif event.event_type == 'bounce':
+            dom_awards(event.origin, event.origin_name).bounces_done += 1
+            dom_awards(event.target, event.target_name).bounces_taken += 1
+        elif event.event_type == 'war_declare':
+            realm_awards(event.origin, event.origin_name).war_declarations += 1
+            realm_awards(event.target, event.target_name).declared_on += 1
+        elif event.event_type == 'abandon':
+            dom_awards(event.origin, event.origin_name).abandoned_realm = int(event.target)
+
+
+def awards_missing(db) -> bool:
+    """True when there are Town Crier events, but they were never counted in the award totals."""
+    return (query_count(db, db.select(DominionAwards)) == 0 and query_count(db, db.select(RealmAwards)) == 0
+            and query_count(db, db.select(TownCrier)) > 0)
+
+
+def recount_awards(db):
+    """Count all Town Crier events in the award totals and the land gained and lost by realms again.
+    The caller commits."""
+    logger.info("Counting the award totals of the whole Town Crier")
+    db.session.execute(delete(DominionAwards))
+    db.session.execute(delete(RealmAwards))
+    db.session.execute(update(RealmHistory).values(land_gained=0, land_lost=0))
+    events = db.session.scalars(db.select(TownCrier)).all()
+    count_awards(db, events)
+    count_realm_land(db, events)
+
+
+# ---------------------------------------------------------------------- Ops Queues
+
+def add_ops_queues(db, obj, **queues):
+    """Store the JSON queues of an ops object as typed rows: OpsQueue per item per tick
+    and OpsQueueTotal with the total and last tick per item. The JSON is {item: {"ticks": amount}}."""
+    for queue_name, data in queues.items():
+        queue = Queue.from_json(data)
+        for item in queue.items():
+            for tick, amount in queue.per_tick(item).items():
+                db.session.add(OpsQueue(dominion_id=obj.dominion_id, timestamp=obj.timestamp,
+                                        queue=queue_name, item=item, tick=tick, amount=amount))
+            db.session.add(OpsQueueTotal(dominion_id=obj.dominion_id, timestamp=obj.timestamp, queue=queue_name,
+                                         item=item, total=queue.total(item), last_tick=queue.last_tick(item)))
+
+
+OPS_QUEUES = {
+    BarracksSpy: ('training', 'returning'),
+    SurveyDominion: ('constructing', ),
+    LandSpy: ('incoming', ),
+}
+
+
+def backfill_ops_queues(db) -> int:
+    """Typed queue rows for ops stored before the totals were written at ingest. Returns the number of ops filled.
+    Ops that already have totals are skipped. The caller commits."""
+    filled = 0
+    for model, queues in OPS_QUEUES.items():
+        has_totals = (db.select(OpsQueueTotal.dominion_id)
+                      .where(OpsQueueTotal.dominion_id == model.dominion_id, OpsQueueTotal.timestamp == model.timestamp,
+                             OpsQueueTotal.queue.in_(queues))
+                      .exists())
+        for obj in db.session.scalars(db.select(model).where(~has_totals)).all():
+            data = {queue: getattr(obj, queue) for queue in queues}
+            if any(isinstance(value, dict) and value for value in data.values()):
+                db.session.execute(delete(OpsQueue).where(OpsQueue.dominion_id == obj.dominion_id,
+                                                          OpsQueue.timestamp == obj.timestamp,
+                                                          OpsQueue.queue.in_(queues)))
+                add_ops_queues(db, obj, **data)
+                filled += 1
+    if filled:
+        logger.info(f"Wrote the typed queue rows of {filled} ops")
+    return filled
+
+
+# ---------------------------------------------------------------------- Realm History
+
+def _realm_history_row(db, rows: dict, realm, timestamp) -> RealmHistory:
+    key = (int(realm), timestamp)
+    if key not in rows:
+        rows[key] = db.session.get(RealmHistory, key) or RealmHistory(
+            realm=key[0], timestamp=timestamp, land_gained=0, land_lost=0)
+        db.session.add(rows[key])
+    return rows[key]
+
+
+def realm_snapshot(db, realms=None) -> list:
+    """(realm, dominions, land, networth) rows: the current land and networth of dominions summed per realm."""
+    latest = _latest_history(db)
+    qry = _filter_doms(db.select(Dominion.realm, func.count().label('dominions'), func.sum(latest.c.land).label('land'),
+                                 func.sum(latest.c.networth).label('networth')), latest)
+    if realms is not None:
+        qry = qry.where(Dominion.realm.in_(realms))
+    return list(db.session.execute(qry.group_by(Dominion.realm)))
+
+
+def store_realm_totals(db, timestamp, totals):
+    """Set the snapshot columns of the RealmHistory rows of the tick, from dicts with a realm key. The caller commits."""
+    rows = dict()
+    for total in totals:
+        row = _realm_history_row(db, rows, total['realm'], timestamp)
+        for column, value in total.items():
+            setattr(row, column, value)
+
+
+def count_realm_land(db, events):
+    """Add the land of Town Crier invasions to the land gained and lost by realms, in the tick of the invasion.
+    Dominions we don't know the realm of are left out. The caller commits."""
+    realm_of = dict(db.session.execute(db.select(Dominion.code, Dominion.realm)).all())
+    rows = dict()
+    for event in events:
+        if event.event_type != 'invasion':
+            continue
+        tick = event.timestamp.replace(minute=0, second=0, microsecond=0)
+        land = int(event.amount or 0)
+        if int(event.origin) in realm_of:
+            _realm_history_row(db, rows, realm_of[int(event.origin)], tick).land_gained += land
+        if int(event.target) in realm_of:
+            _realm_history_row(db, rows, realm_of[int(event.target)], tick).land_lost += land
+
+
+def realm_totals(db, since) -> list[dict]:
+    """Latest snapshot of every realm, with the land gained and lost since the given time."""
+    recency = func.row_number().over(partition_by=RealmHistory.realm, order_by=RealmHistory.timestamp.desc())
+    latest = (db.select(RealmHistory, recency.label('recency'))
+              .where(RealmHistory.land.is_not(None))
+              .subquery())
+    snapshot = db.select(latest.c.realm, latest.c.timestamp, latest.c.dominions, latest.c.land, latest.c.networth,
+                         latest.c.armies, latest.c.op, latest.c.dp).where(latest.c.recency == 1)
+    land = (db.select(RealmHistory.realm, func.sum(RealmHistory.land_gained), func.sum(RealmHistory.land_lost))
+            .where(RealmHistory.timestamp >= since)
+            .group_by(RealmHistory.realm))
+    land = {realm: (gained, lost) for realm, gained, lost in db.session.execute(land)}
+    names = dict(db.session.execute(db.select(RealmAwards.realm, RealmAwards.name)).all())
+    result = list()
+    for row in db.session.execute(snapshot):
+        gained, lost = land.get(row.realm, (0, 0))
+        result.append(row._asdict() | {'name': names.get(row.realm), 'land_gained': gained, 'land_lost': lost})
+    return result
+
+
+def realm_history(db, realm) -> list:
+    """RealmHistory rows of a realm, oldest first."""
+    qry = db.select(RealmHistory).where(RealmHistory.realm == realm).order_by(RealmHistory.timestamp)
+    return list(db.session.execute(qry).scalars())
+
+
+def realm_history_version(db, realm) -> tuple:
+    """Changes whenever a tick of the realm is added or its snapshot is refreshed."""
+    qry = (db.select(func.count(), func.max(RealmHistory.timestamp), func.sum(RealmHistory.land),
+                     func.sum(RealmHistory.networth))
+           .where(RealmHistory.realm == realm))
+    return tuple(db.session.execute(qry).one())
 
 
 def is_database_empty(db):
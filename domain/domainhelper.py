@@ -2,7 +2,7 @@ from collections import defaultdict
 from datetime import timedelta
 from math import trunc, exp
 
-from domain.refdata import TechTree, MASONRY_MULTIPLIER, IMP_FACTORS
+from domain.refdata import tech_tree, MASONRY_MULTIPLIER, IMP_FACTORS
 from domain.timeutils import hours_until
 
 NON_HOME_TYPES = (
@@ -31,15 +31,64 @@ POP_PER_NON_HOME = 15
 POP_PER_BARREN = 5
 
 
+class Queue(object):
+    """Amounts per item per tick of a training, returning, constructing or incoming queue.
+    Totals and last ticks are written when the ops come in; they're only summed here for queues without them."""
+    def __init__(self, amounts: dict[str, dict[int, int]],
+                 totals: dict[str, int] | None = None, last_ticks: dict[str, int] | None = None):
+        self._amounts = amounts
+        if totals is None:
+            totals = {item: sum(ticks.values()) for item, ticks in amounts.items()}
+        if last_ticks is None:
+            last_ticks = {item: max(ticks.keys(), default=0) for item, ticks in amounts.items()}
+        self._totals = totals
+        self._last_ticks = last_ticks
+
+    @classmethod
+    def from_rows(cls, rows, totals):
+        """Queue from OpsQueue rows (per item per tick) and OpsQueueTotal rows (per item)."""
+        amounts = defaultdict(dict)
+        for row in rows:
+            amounts[row.item][row.tick] = row.amount
+        return cls(dict(amounts),
+                   {row.item: row.total for row in totals},
+                   {row.item: row.last_tick for row in totals})
+
+    @classmethod
+    def from_json(cls, data):
+        """Queues as they're stored in the JSON ops columns: {item: {"ticks": amount}}."""
+        if not isinstance(data, dict):
+            return cls(dict())
+        return cls({item: {int(tick): amount for tick, amount in ticks.items()}
+                    for item, ticks in data.items() if isinstance(ticks, dict)})
+
+    def __contains__(self, item):
+        return item in self._amounts
+
+    def items(self) -> list[str]:
+        return list(self._amounts.keys())
+
+    def per_tick(self, item: str) -> dict[int, int]:
+        return self._amounts.get(item, dict())
+
+    def total(self, item: str | None = None) -> int:
+        if item is None:
+            return sum(self._totals.values())
+        return self._totals.get(item, 0)
+
+    def last_tick(self, item: str) -> int:
+        return self._last_ticks.get(item, 0)
+
+    def total_after(self, item: str, ticks: int) -> int:
+        """Amount of item that's still in the queue after ticks ticks."""
+        return sum(amount for tick, amount in self.per_tick(item).items() if tick > ticks)
+
+
 class Buildings(object):
     def __init__(self, dom, data):
         self.dom = dom
         self._data = data
-        self._constructing = defaultdict(int)
-        if self._data and self._data.constructing:
-            cons = self._data.constructing
-            for name, ticks in cons.items():
-                self._constructing[name] = sum(ticks.values())
+        self._constructing = self._data.constructing_queue if self._data else Queue(dict())
 
     def __str__(self):
         buildings = [f"{t}:{self._data[t]}" for t in NON_HOME_TYPES]
@@ -56,7 +105,7 @@ class Buildings(object):
 
     @property
     def barren(self) -> int:
-        return self._data.barren
+        return self._data.barren_land
 
     @property
     def jobs(self) -> int:
@@ -71,7 +120,7 @@ class Buildings(object):
         homes = self.homes * POP_PER_HOME
         non_homes = self.non_homes * POP_PER_NON_HOME
         constructing = self.constructing * POP_PER_NON_HOME
-        barren = self.barren * 5
+        barren = self.barren * POP_PER_BARREN
         return homes + non_homes + constructing + barren
 
     @property
@@ -80,14 +129,14 @@ class Buildings(object):
 
     @property
     def constructing(self) -> int:
-        return sum(self._constructing.values())
+        return self._constructing.total()
 
     def ratio_of(self, building_type: str, include_paid=True) -> float:
         if self._data:
             nr_of_buildings = getattr(self._data, building_type)
             amount_of_land = self.dom.current_land
             if include_paid:
-                nr_of_buildings += self._constructing[building_type]
+                nr_of_buildings += self._constructing.total(building_type)
                 if self.dom.land:
                     amount_of_land += self.dom.land.incoming
             return nr_of_buildings / amount_of_land
@@ -127,33 +176,35 @@ class Land(object):
 
     @property
     def incoming(self) -> int:
-        result = 0
-        if self._data and self._data.incoming:
-            incoming = self._data.incoming
-            for landtype in LAND_TYPES:
-                if landtype in incoming:
-                    result += sum(incoming[landtype].values())
-        return result
+        if self._data:
+            incoming = self._data.incoming_queue
+            return sum(incoming.total(landtype) for landtype in LAND_TYPES)
+        return 0
 
 
 class Technology(object):
     def __init__(self, dom):
         self.dom = dom
-        self.tech_tree = TechTree()
+        self.tech_tree = tech_tree()
 
     @property
     def researched(self):
         return self.dom.last_vision.techs if self.dom.last_vision else None
 
+    @property
+    def bitset(self) -> int:
+        return self.dom.last_vision.tech_bitset if self.dom.last_vision else 0
+
+    @property
+    def perks(self) -> dict[str, float]:
+        return self.tech_tree.perk_totals(self.bitset)
+
     @property
     def pop_bonus(self):
         return self.value_for_perk('max_population')
 
     def value_for_perk(self, perk_name):
-        if self.researched:
-            return self.tech_tree.value_for_perk(perk_name, self.researched)
-        else:
-            return 0
+        return self.perks.get(perk_name, 0)
 
 
 class Castle(object):
@@ -1,10 +1,13 @@
-from sqlalchemy import Integer, String, DateTime, ForeignKey, Float, func, JSON
+from functools import cached_property
+
+from sqlalchemy import Integer, String, DateTime, ForeignKey, Float, func, JSON, Index
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from datetime import datetime
 from typing import List, Optional
 
-from domain.domainhelper import Buildings, Land, Technology, Magic
+from domain.domainhelper import Buildings, Land, Technology, Magic, Queue
+from domain.refdata import tech_tree
 from domain.timeutils import hours_since
 
 
@@ -92,6 +95,13 @@ class Dominion(Base):
         else:
             return None
 
+    @property
+    def population_bonus(self) -> float:
+        """Multiplier for the raw population capacity of the buildings: keep, techs and prestige."""
+        keep = self.last_castle.keep_rating if self.last_castle else 0
+        prestige = self.last_cs.prestige if self.last_cs else 0
+        return (1 + keep + self.tech.pop_bonus / 100) * (1 + prestige / 10000)
+
     @property
     def tech(self) -> Technology:
         return Technology(self)
@@ -170,32 +180,37 @@ class BarracksSpy(TimestampedOpsMixin, Base):
     home_unit4: Mapped[int] = mapped_column(Integer, default=0)
     training: Mapped[dict] = mapped_column(JSON, default=JSON.NULL)
     returning: Mapped[dict] = mapped_column('return', JSON, default=JSON.NULL)
+    queue_rows: Mapped[List['OpsQueue']] = relationship(
+        'OpsQueue',
+        primaryjoin='and_(BarracksSpy.dominion_id == foreign(OpsQueue.dominion_id), '
+                    'BarracksSpy.timestamp == foreign(OpsQueue.timestamp))',
+        viewonly=True, lazy='selectin')
+    queue_totals: Mapped[List['OpsQueueTotal']] = relationship(
+        'OpsQueueTotal',
+        primaryjoin='and_(BarracksSpy.dominion_id == foreign(OpsQueueTotal.dominion_id), '
+                    'BarracksSpy.timestamp == foreign(OpsQueueTotal.timestamp))',
+        viewonly=True, lazy='selectin')
+
+    @cached_property
+    def training_queue(self) -> Queue:
+        return ops_queue(self.queue_rows, self.queue_totals, 'training')
+
+    @cached_property
+    def returning_queue(self) -> Queue:
+        return ops_queue(self.queue_rows, self.queue_totals, 'returning')
 
     def amount_training(self, unit_type_nr: int) -> int:
-        if self.training:
-            key = f'unit{unit_type_nr}'
-            return sum(self.training[key].values()) if key in self.training else 0
-        else:
-            return 0
+        return self.training_queue.total(f'unit{unit_type_nr}')
 
     def aged_amount_training_for_unit(self, unit_type_nr: int) -> int:
-        key = f'unit{unit_type_nr}'
-        age = hours_since(self.timestamp)
-        if self.training and key in self.training:
-            return sum([amount for tick, amount in self.training[key].items() if int(tick) - age > 0])
-        else:
-            return 0
+        return self.training_queue.total_after(f'unit{unit_type_nr}', hours_since(self.timestamp))
 
     @property
     def aged_amount_training(self) -> int:
         return sum([self.aged_amount_training_for_unit(i) for i in range(1, 5)])
 
     def amount_returning(self, unit_type_nr: int) -> int:
-        if self.returning:
-            key = f'unit{unit_type_nr}'
-            return sum(self.returning[key].values()) if key in self.returning else 0
-        else:
-            return 0
+        return self.returning_queue.total(f'unit{unit_type_nr}')
 
     @property
     def military(self) -> dict:
@@ -216,12 +231,7 @@ class BarracksSpy(TimestampedOpsMixin, Base):
         }
 
     def paid_until_for_unit(self, nr):
-        age = hours_since(self.timestamp)
-        max_ticks = 0
-        key = f'unit{nr}'
-        if key in self.training:
-            max_ticks = max(max_ticks, max([int(t) for t in self.training[key]]))
-        return max(0, max_ticks - age)
+        return max(0, self.training_queue.last_tick(f'unit{nr}') - hours_since(self.timestamp))
 
     @property
     def paid_until(self) -> int:
@@ -289,6 +299,12 @@ class ClearSight(TimestampedOpsMixin, Base):
             'timestamp': self.timestamp
         }
 
+    def home_unit(self, unit_type_nr: int, bs: Optional['BarracksSpy'], ticks_after_bs: int) -> int:
+        """Units at home. A Clear Sight counts the units that are returning from battle as well: the ones that are
+        still returning ticks_after_bs ticks after the last BS are taken off."""
+        away = bs.returning_queue.total_after(f'unit{unit_type_nr}', ticks_after_bs) if bs else 0
+        return max(0, getattr(self, f'military_unit{unit_type_nr}') - away)
+
     @hybrid_property
     def spywiz(self):
         return self.military_spies, self.military_assassins, self.military_wizards, self.military_archmages
@@ -315,6 +331,20 @@ class LandSpy(TimestampedOpsMixin, Base):
     water: Mapped[int] = mapped_column(Integer)
     water_constructed: Mapped[int] = mapped_column(Integer)
     incoming: Mapped[dict] = mapped_column(JSON, default=JSON.NULL)
+    queue_rows: Mapped[List['OpsQueue']] = relationship(
+        'OpsQueue',
+        primaryjoin='and_(LandSpy.dominion_id == foreign(OpsQueue.dominion_id), '
+                    'LandSpy.timestamp == foreign(OpsQueue.timestamp))',
+        viewonly=True, lazy='selectin')
+    queue_totals: Mapped[List['OpsQueueTotal']] = relationship(
+        'OpsQueueTotal',
+        primaryjoin='and_(LandSpy.dominion_id == foreign(OpsQueueTotal.dominion_id), '
+                    'LandSpy.timestamp == foreign(OpsQueueTotal.timestamp))',
+        viewonly=True, lazy='selectin')
+
+    @cached_property
+    def incoming_queue(self) -> Queue:
+        return ops_queue(self.queue_rows, self.queue_totals, 'incoming')
 
 
 class Revelation(Base):
@@ -351,6 +381,53 @@ class SurveyDominion(TimestampedOpsMixin, Base):
     barren_land: Mapped[int] = mapped_column(Integer, default=0)
     total_land: Mapped[int] = mapped_column(Integer, default=0)
     constructing: Mapped[Optional[dict]] = mapped_column(JSON, default=JSON.NULL)
+    queue_rows: Mapped[List['OpsQueue']] = relationship(
+        'OpsQueue',
+        primaryjoin='and_(SurveyDominion.dominion_id == foreign(OpsQueue.dominion_id), '
+                    'SurveyDominion.timestamp == foreign(OpsQueue.timestamp))',
+        viewonly=True, lazy='selectin')
+    queue_totals: Mapped[List['OpsQueueTotal']] = relationship(
+        'OpsQueueTotal',
+        primaryjoin='and_(SurveyDominion.dominion_id == foreign(OpsQueueTotal.dominion_id), '
+                    'SurveyDominion.timestamp == foreign(OpsQueueTotal.timestamp))',
+        viewonly=True, lazy='selectin')
+
+    @cached_property
+    def constructing_queue(self) -> Queue:
+        return ops_queue(self.queue_rows, self.queue_totals, 'constructing')
+
+
+class OpsQueue(Base):
+    """The JSON queues of ops (training, returning, constructing and incoming) as typed rows,
+    one per item per tick. Written when ops come in. The JSON columns stay for detail views."""
+    __tablename__ = 'OpsQueue'
+    dominion_id = mapped_column('dominion', ForeignKey('Dominions.code'))
+    timestamp: Mapped[datetime] = mapped_column(DateTime)
+    queue: Mapped[str] = mapped_column(String(20))
+    item: Mapped[str] = mapped_column(String(40))
+    tick: Mapped[int] = mapped_column(Integer)
+    amount: Mapped[int] = mapped_column(Integer, default=0)
+    __mapper_args__ = {'primary_key': [dominion_id, timestamp, queue, item, tick]}
+    __table_args__ = (Index('ix_opsqueue_ops', 'dominion', 'timestamp'), )
+
+
+class OpsQueueTotal(Base):
+    """Total amount and last tick per item of an ops queue: constructing per building, incoming per land type,
+    training and returning per unit. Written together with the OpsQueue rows."""
+    __tablename__ = 'OpsQueueTotal'
+    dominion_id = mapped_column('dominion', ForeignKey('Dominions.code'))
+    timestamp: Mapped[datetime] = mapped_column(DateTime)
+    queue: Mapped[str] = mapped_column(String(20))
+    item: Mapped[str] = mapped_column(String(40))
+    total: Mapped[int] = mapped_column(Integer, default=0)
+    last_tick: Mapped[int] = mapped_column(Integer, default=0)
+    __mapper_args__ = {'primary_key': [dominion_id, timestamp, queue, item]}
+
+
+def ops_queue(rows: list[OpsQueue], totals: list['OpsQueueTotal'], queue: str) -> Queue:
+    """Queue from the typed rows. Ops without rows have an empty queue."""
+    return Queue.from_rows([row for row in rows if row.queue == queue],
+                           [row for row in totals if row.queue == queue])
 
 
 class Vision(TimestampedOpsMixin, Base):
@@ -358,6 +435,10 @@ class Vision(TimestampedOpsMixin, Base):
     dom: Mapped['Dominion'] = relationship(back_populates='vision')
     techs: Mapped[Optional[dict]] = mapped_column(JSON, default=JSON.NULL)
 
+    @cached_property
+    def tech_bitset(self) -> int:
+        return tech_tree().bitset(self.techs)
+
 
 class TownCrier(Base):
     __tablename__ = 'TownCrier'
@@ -372,6 +453,80 @@ class TownCrier(Base):
     text: Mapped[str] = mapped_column(String(300))
 
     __mapper_args__ = {'primary_key': [timestamp, origin, event_type, target]}
+    __table_args__ = (Index('ix_towncrier_timestamp', 'timestamp', 'origin', 'target', 'event_type'),
+                      Index('ix_towncrier_origin', 'origin', 'timestamp'),
+                      Index('ix_towncrier_target', 'target', 'timestamp'),
+                      Index('ix_towncrier_event_type', 'event_type', 'timestamp'))
+
+
+class DominionAwards(Base):
+    """Town Crier totals of a dominion, counted while the Town Crier is ingested."""
+    __tablename__ = 'DominionAwards'
+
+    code: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(200))
+    hits_done: Mapped[int] = mapped_column(Integer, default=0)
+    land_done: Mapped[int] = mapped_column(Integer, default=0)
+    hits_taken: Mapped[int] = mapped_column(Integer, default=0)
+    land_taken: Mapped[int] = mapped_column(Integer, default=0)
+    bounces_done: Mapped[int] = mapped_column(Integer, default=0)
+    bounces_taken: Mapped[int] = mapped_column(Integer, default=0)
+    abandoned_realm: Mapped[Optional[int]] = mapped_column(Integer)
+
+
+class RealmAwards(Base):
+    """Town Crier totals of a realm, counted while the Town Crier is ingested."""
+    __tablename__ = 'RealmAwards'
+
+    realm: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(200))
+    war_declarations: Mapped[int] = mapped_column(Integer, default=0)
+    declared_on: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class RealmHistory(Base):
+    """Realm totals per OD tick. The snapshot columns are rolled up from the dominions when their search page
+    or ops come in, and stay empty for ticks without those. Land gained and lost are counted from the Town Crier."""
+    __tablename__ = 'RealmHistory'
+
+    realm: Mapped[int] = mapped_column(Integer, primary_key=True)
+    timestamp: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    dominions: Mapped[Optional[int]] = mapped_column(Integer)
+    land: Mapped[Optional[int]] = mapped_column(Integer)
+    networth: Mapped[Optional[int]] = mapped_column(Integer)
+    armies: Mapped[Optional[int]] = mapped_column(Integer)  # Dominions with ops on their army, counted in OP and DP
+    op: Mapped[Optional[int]] = mapped_column(Integer)
+    dp: Mapped[Optional[int]] = mapped_column(Integer)
+    land_gained: Mapped[int] = mapped_column(Integer, default=0)
+    land_lost: Mapped[int] = mapped_column(Integer, default=0)
+
+    __table_args__ = (Index('ix_realmhistory_timestamp', 'timestamp', 'realm'), )
+
+
+class Job(Base):
+    """Record of a background update job, with its progress."""
+    __tablename__ = 'Jobs'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(40))
+    status: Mapped[str] = mapped_column(String(12), default='queued')
+    total: Mapped[Optional[int]] = mapped_column(Integer)
+    done: Mapped[int] = mapped_column(Integer, default=0)
+    errors: Mapped[int] = mapped_column(Integer, default=0)
+    message: Mapped[Optional[str]] = mapped_column(String(500))
+    created: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    started: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    finished: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+    __table_args__ = (Index('ix_jobs_kind_status', 'kind', 'status'), )
+
+
+class DataVersion(Base):
+    """One row with a counter that goes up with every write to the database, also by scripts (dbupdate.py)."""
+    __tablename__ = 'DataVersion'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0)
 
 
 class SchemaVersion(Base):
@@ -383,5 +538,12 @@ class SchemaVersion(Base):
     __mapper_args__ = {'primary_key': [timestamp]}
 
 
+def create_missing_indexes(engine):
+    """create_all() skips tables that already exist, so indexes added later to a model are created here."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+
 def schema_version(db) -> str:
     return db.session.query(SchemaVersion, func.max(SchemaVersion.timestamp)).scalar().version
@@ -1,12 +1,17 @@
+import os
 import math
+import time
+import marshal
+import hashlib
 import logging
 from operator import attrgetter
 
 import yaml
+import numpy as np
 from math import erf
 from enum import Enum
 from collections import defaultdict, namedtuple
-from config import REF_DATA_DIR
+from config import REF_DATA_DIR, REF_DATA_BUNDLE, executable_path
 from functools import lru_cache
 
 
@@ -20,6 +25,10 @@ GT_DEFENSE_FACTOR = 1.75
 GN_OFFENSE_BONUS = 1.75
 BS_UNCERTAINTY = 1.15
 ARES_BONUS = 0.1
+# Land loss reduction applied to the land conquest formula of calculators.military.land_gain,
+# from the land grab in OpenDominion's app/Services/Dominion/Actions/InvadeActionService.php.
+LAND_GAIN_FACTOR = 0.75
+IN_RANGE = 0.75  # Minimal land of a target relative to the attacker for a full hit
 
 ImpFactor = namedtuple('ImpFactor', 'max factor plus')
 
@@ -39,6 +48,107 @@ NETWORTH_VALUES = {
     'spywiz': 5
 }
 
+TheftRule = namedtuple('TheftRule', 'percentage max_per_spy')
+
+# Per op, a thief takes a percentage of the target's stock, limited by the number of spies sent.
+# The constraints of getTheftAmount() in OpenDominion's app/Services/Dominion/Actions/EspionageActionService.php.
+THEFT_RULES = {
+    'platinum': TheftRule(0.02, 45),
+    'food': TheftRule(0.02, 50),
+    'lumber': TheftRule(0.05, 50),
+    'mana': TheftRule(0.03, 50),
+    'ore': TheftRule(0.05, 50),
+    'gems': TheftRule(0.02, 50)
+}
+
+
+REF_DATA_CHECK_INTERVAL = 5  # seconds
+_REF_DATA_VERSION = {'signature': None, 'version': None, 'checked': 0.0}
+
+
+def ref_data_files() -> list[str]:
+    """All YAML files in the ref-data directory, in a stable order."""
+    filenames = list()
+    for root, dirs, files in os.walk(REF_DATA_DIR):
+        filenames.extend([os.path.join(root, f) for f in files if f.endswith('.yml')])
+    return sorted(filenames)
+
+
+def ref_data_version() -> str:
+    """Content hash of the ref-data files. Only re-hashes when a file was added, removed or changed on disk,
+    and looks at the disk at most once every REF_DATA_CHECK_INTERVAL seconds."""
+    now = time.monotonic()
+    if _REF_DATA_VERSION['version'] and (now - _REF_DATA_VERSION['checked'] < REF_DATA_CHECK_INTERVAL):
+        return _REF_DATA_VERSION['version']
+    _REF_DATA_VERSION['checked'] = now
+    filenames = ref_data_files()
+    signature = tuple((f, os.path.getmtime(f), os.path.getsize(f)) for f in filenames)
+    if signature != _REF_DATA_VERSION['signature']:
+        sha = hashlib.sha1()
+        for filename in filenames:
+            # Relative, so moving the install doesn't invalidate the bundle
+            sha.update(os.path.relpath(filename, REF_DATA_DIR).replace(os.sep, '/').encode('utf-8'))
+            with open(filename, 'rb') as f:
+                sha.update(f.read())
+        _REF_DATA_VERSION['signature'] = signature
+        _REF_DATA_VERSION['version'] = sha.hexdigest()
+        logger.debug(f"Ref-data version is now {_REF_DATA_VERSION['version']}")
+    return _REF_DATA_VERSION['version']
+
+
+_REF_DATA: dict = {'bundle': None}
+
+
+def _parse_ref_data() -> dict:
+    """Parse all ref-data YAML, keyed on the path relative to the ref-data dir without extension (e.g. 'races/orc')."""
+    data = dict()
+    for filename in ref_data_files():
+        key = os.path.relpath(filename, REF_DATA_DIR)[:-len('.yml')].replace(os.sep, '/')
+        with open(filename, 'r') as f:
+            data[key] = yaml.safe_load(f)
+    return data
+
+
+def _read_bundle(filename: str) -> dict | None:
+    try:
+        with open(filename, 'rb') as f:
+            return marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError) as e:
+        logger.debug(f'Could not read ref-data bundle {filename}: {e}')
+        return None
+
+
+def write_ref_data_bundle(filename: str = None) -> dict:
+    """Parse the YAML files and save them as a marshal bundle, stamped with the ref-data content hash."""
+    filename = filename or executable_path(REF_DATA_BUNDLE)
+    bundle = {'version': ref_data_version(), 'data': _parse_ref_data()}
+    try:
+        with open(filename, 'wb') as f:
+            marshal.dump(bundle, f)
+        logger.info(f'Wrote ref-data bundle {filename}')
+    except OSError as e:
+        logger.warning(f'Could not write ref-data bundle {filename}: {e}')
+    return bundle
+
+
+def load_ref_data() -> dict:
+    """All parsed ref-data. Loads the compiled bundle if its content hash matches the YAML files,
+    otherwise falls back to parsing the YAML and rewrites the bundle."""
+    version = ref_data_version()
+    bundle = _REF_DATA['bundle']
+    if bundle and bundle['version'] == version:
+        return bundle['data']
+    bundle = _read_bundle(executable_path(REF_DATA_BUNDLE))
+    if not bundle or bundle.get('version') != version:
+        logger.info('Ref-data bundle is missing or stale, parsing YAML')
+        bundle = write_ref_data_bundle()
+    _REF_DATA['bundle'] = bundle
+    return bundle['data']
+
+
+def ref_data_yaml(key: str) -> dict:
+    return load_ref_data()[key]
+
 
 class SendableType(Enum):
     PURE_DEFENSE = 1
@@ -51,6 +161,10 @@ def infamy_bonus(infamy, maxbonus) -> float:
     return 0.5 * (1 + erf(0.00452 * (infamy - 385))) * maxbonus
 
 
+def unit_networth(op: float, dp: float) -> float:
+    return 1.8 * min(6, max(op, dp)) + (0.45 * min(6, op, dp)) + (0.2 * (max((op - 6), 0) + max((dp - 6), 0)))
+
+
 class Spells(object):
     SPELL_REGISTRY: dict | None = None
 
@@ -65,85 +179,188 @@ class Spells(object):
     @lru_cache(maxsize=None)
     def _load_spells() -> dict:
         if not Spells.SPELL_REGISTRY:
-            with open(f'{REF_DATA_DIR}/spells.yml', 'r') as f:
-                spell_yaml = yaml.safe_load(f)
-                spells = defaultdict(dict)
-                for spell_name, spell in spell_yaml.items():
-                    for perk, value in spell['perks'].items():
-                        for race in spell.get('races', ['all']):
-                            spells[perk][race] = spells[perk].get(race, 0) + value
+            spells = defaultdict(dict)
+            for spell_name, spell in ref_data_yaml('spells').items():
+                for perk, value in spell['perks'].items():
+                    for race in spell.get('races', ['all']):
+                        spells[perk][race] = spells[perk].get(race, 0) + value
             Spells.SPELL_REGISTRY = spells
         return Spells.SPELL_REGISTRY
 
 
 class TechTree(object):
-    TECHS_REGISTRY: dict | None = None
+    """Techs and their perks as a (techs, perks) matrix. Researched techs are encoded as a bitset,
+    with bit i for the i-th tech, so perk totals are a dot product of the bits with the matrix."""
+    def __init__(self, yaml_techs: dict, version: str | None = None):
+        self.version = version
+        self.tech_names = tuple(sorted(yaml_techs.keys()))
+        self.tech_bit = {name: bit for bit, name in enumerate(self.tech_names)}
+        self.perk_names = tuple(sorted({perk for tech in yaml_techs.values() for perk in tech['perks']}))
+        self.perk_column = {perk: col for col, perk in enumerate(self.perk_names)}
+        self.matrix = np.zeros((len(self.tech_names), len(self.perk_names)))
+        for name, tech in yaml_techs.items():
+            for perk, value in tech['perks'].items():
+                self.matrix[self.tech_bit[name], self.perk_column[perk]] = value
+        self._totals: dict[int, dict[str, float]] = dict()
+
+    def bitset(self, techs) -> int:
+        """Bitset of the researched techs. Techs that aren't in the ref-data are ignored."""
+        result = 0
+        for tech in techs or ():
+            if tech in self.tech_bit:
+                result |= 1 << self.tech_bit[tech]
+        return result
+
+    def bits(self, bitsets: list[int]) -> np.ndarray:
+        """(bitsets, techs) array of 0/1."""
+        result = np.zeros((len(bitsets), len(self.tech_names)))
+        for row, bitset in enumerate(bitsets):
+            for bit in range(bitset.bit_length()):
+                if bitset >> bit & 1:
+                    result[row, bit] = 1
+        return result
+
+    def perk_matrix(self, bitsets: list[int]) -> np.ndarray:
+        """(bitsets, perks) array with the perk totals of every bitset."""
+        return self.bits(bitsets) @ self.matrix
+
+    def perk_totals(self, bitset: int) -> dict[str, float]:
+        """All perk totals of one bitset. Remembered, as many dominions research the same techs."""
+        if bitset not in self._totals:
+            totals = self.perk_matrix([bitset])[0]
+            self._totals[bitset] = {perk: float(totals[col]) for col, perk in enumerate(self.perk_names)}
+        return self._totals[bitset]
+
+    def value_for_perk(self, perk_name: str, techs) -> float:
+        return self.perk_totals(self.bitset(techs)).get(perk_name, 0)
+
+
+_TECH_TREE: dict = {'tree': None}
+
+
+def tech_tree() -> TechTree:
+    """The shared tech tree, rebuilt only when the ref-data changed."""
+    version = ref_data_version()
+    tree = _TECH_TREE['tree']
+    if not tree or tree.version != version:
+        logger.debug(f'Compiling tech tree for ref-data version {version}')
+        tree = TechTree(ref_data_yaml('techs'), version)
+        _TECH_TREE['tree'] = tree
+    return tree
+
+
+def _perk_value(perk_value):
+    if isinstance(perk_value, str) and (',' in perk_value):
+        return perk_value.split(',')
+    else:
+        return perk_value
+
+
+def _sendable_type(offense: float, defense: float) -> SendableType:
+    if (offense != 0) and (defense != 0):
+        return SendableType.HYBRID
+    elif offense == 0:
+        return SendableType.PURE_DEFENSE
+    else:
+        return SendableType.PURE_OFFENSE
+
+
+class UnitSpec(object):
+    """Facts about a unit type that don't depend on a dominion, parsed once from the race YAML."""
+    def __init__(self, nr: int, yaml_src: dict):
+        self._data = yaml_src
+        self.nr = nr
+        self.name: str = yaml_src['name']
+        self.cost: dict = yaml_src['cost']
+        self.base_offense: float = yaml_src['power']['offense']
+        self.base_defense: float = yaml_src['power']['defense']
+        self.need_boat: bool = yaml_src.get('need_boat', True)
+        self.perks: dict = {name: _perk_value(value) for name, value in yaml_src.get('perks', dict()).items()}
+        self.offense_from_land = self._land_perk('offense_from_land')
+        self.defense_from_land = self._land_perk('defense_from_land')
+        self.offense_raw_wizard_ratio = None
+        if 'offense_raw_wizard_ratio' in self.perks:
+            per_percent, max_bonus = self.perks['offense_raw_wizard_ratio']
+            self.offense_raw_wizard_ratio = float(per_percent), float(max_bonus)
+        self.offense_from_pairing = self._pairing_perk('offense_from_pairing')
+        self.defense_from_pairing = self._pairing_perk('defense_from_pairing')
+        self.ratios = {
+            'spy_offense': self.perks.get('counts_as_spy_offense', 0),
+            'spy_defense': self.perks.get('counts_as_spy_defense', 0),
+            'wiz_offense': self.perks.get('counts_as_wizard_offense', 0),
+            'wiz_defense': self.perks.get('counts_as_wizard_defense', 0)
+        }
+        self.sendable_type = _sendable_type(self.base_offense, self.base_defense)
 
-    def __init__(self):
-        self.techs = self._load_techs()
+    def _land_perk(self, perk_name: str) -> tuple[str, float, float] | None:
+        """(land type, percent per point, max bonus)"""
+        if perk_name in self.perks:
+            land_type, percent_per_point, max_bonus = self.perks[perk_name]
+            return land_type, float(percent_per_point), float(max_bonus)
+        else:
+            return None
 
-    def value_for_perk(self, perk_name: str, techs: list):
-        perk_techs = self.techs[perk_name]
-        return sum([perk_techs[tech] for tech in techs if tech in perk_techs.keys()])
+    def _pairing_perk(self, perk_name: str) -> tuple[int, int, int] | None:
+        """(slot, buff, number required) of a pairing perk like Kobold has."""
+        if perk_name in self.perks:
+            slot, buff, num_required = self.perks[perk_name]
+            return int(slot), int(buff), int(num_required)
+        else:
+            return None
+
+    @property
+    def has_dynamic_stats(self) -> bool:
+        """True if OP or DP depends on the land or WPA of the dominion."""
+        return bool(self.offense_from_land or self.defense_from_land or self.offense_raw_wizard_ratio)
 
     @staticmethod
-    @lru_cache(maxsize=None)
-    def _load_techs() -> dict:
-        if not TechTree.TECHS_REGISTRY:
-            with open(f'{REF_DATA_DIR}/techs.yml', 'r') as f:
-                tech_yaml = yaml.safe_load(f)
-                techs = defaultdict(dict)
-                for tech_name, tech in tech_yaml.items():
-                    for perk, value in tech['perks'].items():
-                        techs[perk][tech_name] = value
-            TechTree.TECHS_REGISTRY = techs
-        return TechTree.TECHS_REGISTRY
+    def _land_bonus(land_perk, dom) -> float:
+        if land_perk and dom and dom.land:
+            land_type, percent_per_point, max_bonus = land_perk
+            return min(max_bonus, dom.land.ratio_of(land_type) / percent_per_point)
+        else:
+            return 0
+
+    def offense_for(self, dom) -> float:
+        op = self.base_offense
+        op += self._land_bonus(self.offense_from_land, dom)
+        if self.offense_raw_wizard_ratio and dom and dom.last_cs and dom.last_cs.wpa:
+            per_percent, max_bonus = self.offense_raw_wizard_ratio
+            op += min(float(dom.last_cs.wpa) * per_percent, max_bonus)
+        return op
+
+    def defense_for(self, dom) -> float:
+        return self.base_defense + self._land_bonus(self.defense_from_land, dom)
 
 
 class Unit(object):
-    def __init__(self, yaml_src: dict, dom):
-        self._data = yaml_src
+    def __init__(self, spec: UnitSpec, dom):
+        self.spec = spec
         self.dom = dom
 
     def __str__(self):
         return f"Unit({self.name}, {self.offense}OP, {self.defense}DP)"
 
     def land_bonus(self, perk_name: str) -> float:
-        if self.dom.land and self.has_perk(perk_name):
-            land_type, percent_per_point, max_bonus = self.get_perk(perk_name)
-            return min(float(max_bonus), self.dom.land.ratio_of(land_type) / float(percent_per_point))
-        else:
-            return 0
+        return UnitSpec._land_bonus(self.spec._land_perk(perk_name), self.dom)
 
     @property
     def name(self) -> str:
-        return self._data['name']
+        return self.spec.name
 
     def has_perk(self, name) -> bool:
-        return 'perks' in self._data and name in self._data['perks']
+        return name in self.spec.perks
 
     def get_perk(self, name, default=None):
-        if self.has_perk(name):
-            perk_value = self._data['perks'][name]
-            if isinstance(perk_value, str) and (',' in perk_value):
-                return perk_value.split(',')
-            else:
-                return perk_value
-        else:
-            return default
+        return self.spec.perks.get(name, default)
 
     @property
     def need_boat(self):
-        return self._data.get('need_boat', True)
+        return self.spec.need_boat
 
     @property
     def sendable_type(self) -> SendableType:
-        if (self.offense != 0) and (self.defense != 0):
-            return SendableType.HYBRID
-        elif self.offense == 0:
-            return SendableType.PURE_DEFENSE
-        elif self.defense == 0:
-            return SendableType.PURE_OFFENSE
+        return _sendable_type(self.offense, self.defense)
 
     @property
     def op_over_dp(self) -> float:
@@ -156,68 +373,135 @@ class Unit(object):
 
     @property
     def cost(self) -> dict:
-        return self._data['cost']
+        return self.spec.cost
 
     @property
     def offense(self) -> float:
-        op = self._data['power']['offense']
-        op += self.land_bonus('offense_from_land')
-        if self.has_perk('offense_raw_wizard_ratio'):
-            per_percent, max_bonus = self.get_perk('offense_raw_wizard_ratio')
-            if self.dom.last_cs and self.dom.last_cs.wpa:
-                wpa = float(self.dom.last_cs.wpa)
-                wpa_bonus = wpa * float(per_percent)
-                if wpa_bonus > float(max_bonus):
-                    wpa_bonus = float(max_bonus)
-                op += wpa_bonus
-        return op
+        return self.spec.offense_for(self.dom)
 
     @property
     def defense(self) -> float:
-        dp = self._data['power']['defense']
-        dp += self.land_bonus('defense_from_land')
-        return dp
+        return self.spec.defense_for(self.dom)
 
     @property
-    def networth(self) -> int:
-        op = self.offense
-        dp = self.defense
-        return 1.8 * min(6, max(op, dp)) + (0.45 * min(6, op, dp)) + (0.2 * (max((op - 6), 0) + max((dp - 6), 0)))
+    def networth(self) -> float:
+        return unit_networth(self.offense, self.defense)
 
     @property
     def ratios(self) -> dict:
-        return {
-            'spy_offense': self.get_perk('counts_as_spy_offense', 0),
-            'spy_defense': self.get_perk('counts_as_spy_defense', 0),
-            'wiz_offense': self.get_perk('counts_as_wizard_offense', 0),
-            'wiz_defense': self.get_perk('counts_as_wizard_defense', 0)
-        }
+        return self.spec.ratios
 
 
-class Race(object):
-    RACE_REGISTRY: dict = dict()
+UnitStats = namedtuple('UnitStats', 'nr name offense defense networth sendable_type need_boat '
+                                     'offense_from_pairing defense_from_pairing ratios')
+
 
+class UnitStatTable(object):
+    """Effective stats of the four units of one dominion, resolved once per ops snapshot.
+
+    Races without land or WPA dependent units share the table of their RaceSpec."""
+    def __init__(self, race: 'RaceSpec', dom=None):
+        self.stats: dict[int, UnitStats] = dict()
+        for nr, spec in race.units.items():
+            offense = spec.offense_for(dom)
+            defense = spec.defense_for(dom)
+            self.stats[nr] = UnitStats(
+                nr=nr,
+                name=spec.name,
+                offense=offense,
+                defense=defense,
+                networth=unit_networth(offense, defense),
+                sendable_type=_sendable_type(offense, defense),
+                need_boat=spec.need_boat,
+                offense_from_pairing=spec.offense_from_pairing,
+                defense_from_pairing=spec.defense_from_pairing,
+                ratios=spec.ratios)
+
+        hybrids = [u for u in self.stats.values() if u.sendable_type == SendableType.HYBRID]
+        self.hybrids_by_op_over_dp = [u.nr for u in sorted(hybrids, key=lambda u: u.offense / u.defense, reverse=True)]
+        self.hybrids_by_dp = [u.nr for u in sorted(hybrids, key=attrgetter('defense'), reverse=True)]
+        self.pure_offense = [u.nr for u in self.stats.values() if u.sendable_type == SendableType.PURE_OFFENSE]
+        self.pure_defense = [u.nr for u in self.stats.values() if u.sendable_type == SendableType.PURE_DEFENSE]
+        self.sendable = self.pure_offense + self.hybrids_by_dp
+
+    def __getitem__(self, nr: int) -> UnitStats:
+        return self.stats[nr]
+
+    def __iter__(self):
+        return iter(self.stats.values())
+
+
+class RaceSpec(object):
+    """A race from ref-data/races, with its units and their base orderings precomputed."""
+    def __init__(self, yaml_src: dict):
+        self.yaml = yaml_src
+        self.name: str = yaml_src['name']
+        self.perks: dict = yaml_src.get('perks', dict())
+        self.units: dict[int, UnitSpec] = {i: UnitSpec(i, yaml_src['units'][i - 1]) for i in range(1, 5)}
+        self.boat_capacity = self.perks.get('boat_capacity', 0)
+        self.has_dynamic_stats = any(u.has_dynamic_stats for u in self.units.values())
+        self.base_stats = UnitStatTable(self)
+
+    def stats_for(self, dom) -> UnitStatTable:
+        return UnitStatTable(self, dom) if self.has_dynamic_stats else self.base_stats
+
+
+def race_key(name: str) -> str:
+    return name.replace(' ', '').lower()
+
+
+class RaceCatalogue(object):
+    """All races compiled once from the YAML files in ref-data/races."""
+    def __init__(self, race_yamls: dict[str, dict], version: str):
+        self.version = version
+        self.races = {key: RaceSpec(race_yaml) for key, race_yaml in race_yamls.items()}
+        # Also find races by their display name, e.g. "Dark Elf (Legacy)" for legacy-darkelf.yml
+        self._by_name = {race_key(race.name): race for race in self.races.values()}
+
+    def race(self, name: str) -> RaceSpec:
+        key = race_key(name)
+        return self.races[key] if key in self.races else self._by_name[key]
+
+
+def _load_race_yamls() -> dict[str, dict]:
+    return {key[len('races/'):]: race_yaml for key, race_yaml in load_ref_data().items() if key.startswith('races/')}
+
+
+_RACE_CATALOGUE: dict = {'catalogue': None}
+
+
+def race_catalogue() -> RaceCatalogue:
+    """The shared race catalogue, rebuilt only when the ref-data changed."""
+    version = ref_data_version()
+    catalogue = _RACE_CATALOGUE['catalogue']
+    if not catalogue or catalogue.version != version:
+        logger.debug(f'Compiling race catalogue for ref-data version {version}')
+        catalogue = RaceCatalogue(_load_race_yamls(), version)
+        _RACE_CATALOGUE['catalogue'] = catalogue
+    return catalogue
+
+
+class Race(object):
     def __init__(self, dom, name: str):
         assert isinstance(name, str)
-        self.name = name
+        self.spec = race_catalogue().race(name)
+        self.name = self.spec.name
         self.dom = dom
-        self.yaml = self._load_race_data(self.name)
-        self.units = dict()
-        self.reverse_units = dict()
-        for i in range(1, 5):
-            unit = Unit(self.yaml['units'][i - 1], dom)
-            self.units[i] = unit
-            self.reverse_units[unit] = i
+        self.yaml = self.spec.yaml
+        self._units = None
+        self._stats = None
 
-    @staticmethod
-    @lru_cache(maxsize=None)
-    def _load_race_data(name) -> dict:
-        if name not in Race.RACE_REGISTRY:
-            logger.debug(f'Cache miss for race {name}')
-            name = name.replace(' ', '').lower()
-            with open(f'{REF_DATA_DIR}/races/{name}.yml', 'r') as f:
-                Race.RACE_REGISTRY[name] = yaml.safe_load(f)
-        return Race.RACE_REGISTRY[name]
+    @property
+    def units(self) -> dict[int, Unit]:
+        if self._units is None:
+            self._units = {nr: Unit(spec, self.dom) for nr, spec in self.spec.units.items()}
+        return self._units
+
+    @property
+    def stats(self) -> UnitStatTable:
+        if self._stats is None:
+            self._stats = self.spec.stats_for(self.dom)
+        return self._stats
 
     def unit(self, nr: int) -> Unit:
         return self.units[nr]
@@ -225,37 +509,33 @@ class Race(object):
     def nr_of_unit(self, unit) -> int:
         if isinstance(unit, int):
             return unit
-        return self.reverse_units[unit]
+        return unit.spec.nr
 
     def has_perk(self, name) -> bool:
-        return 'perks' in self.yaml and name in self.yaml['perks']
+        return name in self.spec.perks
 
     def get_perk(self, name, default=None):
-        if self.has_perk(name):
-            return self.yaml['perks'][name]
-        else:
-            return default
+        return self.spec.perks.get(name, default)
 
     @property
     def hybrid_units(self) -> list[Unit]:
-        return sorted([u for u in self.units.values() if u.sendable_type == SendableType.HYBRID], key=attrgetter('op_over_dp'), reverse=True)
+        return [self.units[nr] for nr in self.stats.hybrids_by_op_over_dp]
 
     @property
     def hybrids_by_dp(self) -> list[Unit]:
-        assert len(self.hybrid_units) + len(self.pure_offense_units) + len(self.pure_defense_units) == len(self.units)
-        return sorted(self.hybrid_units, key=attrgetter('defense'), reverse=True)
+        return [self.units[nr] for nr in self.stats.hybrids_by_dp]
 
     @property
     def pure_offense_units(self) -> list[Unit]:
-        return [u for u in self.units.values() if u.sendable_type == SendableType.PURE_OFFENSE]
+        return [self.units[nr] for nr in self.stats.pure_offense]
 
     @property
     def sendable_units(self) -> list[Unit]:
-        return self.pure_offense_units + self.hybrids_by_dp
+        return [self.units[nr] for nr in self.stats.sendable]
 
     @property
     def pure_defense_units(self) -> list[Unit]:
-        return [u for u in self.units.values() if u.sendable_type == SendableType.PURE_DEFENSE]
+        return [self.units[nr] for nr in self.stats.pure_defense]
 
 
 if __name__ == '__main__':
@@ -31,6 +31,11 @@ def current_od_time(as_str=False) -> datetime | str:
         return dt
 
 
+def current_od_tick() -> datetime:
+    """OD ticks on the hour: the start of the current tick in OD time."""
+    return current_od_time().replace(minute=0, second=0, microsecond=0)
+
+
 def hours_until(timestamp):
     return hours_since(timestamp, future=True) + 1
 
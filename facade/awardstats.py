@@ -2,6 +2,8 @@ from sqlalchemy import text
 
 
 class AwardStats(object):
+    """The awards, read from the totals in DominionAwards and RealmAwards. The Town Crier ingest keeps those
+    up to date, so there is one row per dominion or realm to read instead of every Town Crier event."""
     def __init__(self, db):
         self.db = db
 
@@ -9,27 +11,24 @@ class AwardStats(object):
     def bouncy_castle_award(self):
         query = text("""
             select 
-                target as code, 
-                target_name as name, 
-                count(1) as amount
-            from TownCrier
-            where event_type = 'bounce'
-            group by target
+                code, 
+                name, 
+                bounces_taken as amount
+            from DominionAwards
+            where bounces_taken > 0
             order by amount desc""")
         return self.db.session.execute(query)
 
     @property
     def bouncy_loser_award(self):
         query = text("""select
-                            origin as code,
-                            origin_name as name, 
-                            count(1) as amount
+                            code,
+                            name, 
+                            bounces_done as amount
                         from
-                            TownCrier
+                            DominionAwards
                         where
-                            event_type = 'bounce'
-                        group by
-                            origin
+                            bounces_done > 0
                         order by
                             amount desc""")
         return self.db.session.execute(query)
@@ -37,14 +36,12 @@ class AwardStats(object):
     @property
     def war_declarations(self):
         query = text("""select
-                            origin,
-                            origin_name,
-                            count(1) as declarations
-                        from TownCrier
+                            realm as origin,
+                            name as origin_name,
+                            war_declarations as declarations
+                        from RealmAwards
                         where
-                            event_type like 'war_declare'
-                        group by
-                            origin
+                            war_declarations > 0
                         order by
                             declarations desc;""")
         return self.db.session.execute(query)
@@ -52,14 +49,12 @@ class AwardStats(object):
     @property
     def declared_on(self):
         query = text("""select
-                            target,
-                            target_name,
-                            count(1) as declared_on
-                        from TownCrier
+                            realm as target,
+                            name as target_name,
+                            declared_on
+                        from RealmAwards
                         where
-                            event_type like 'war_declare'
-                        group by
-                            target
+                            declared_on > 0
                         order by
                             declared_on desc;""")
         return self.db.session.execute(query)
@@ -67,16 +62,14 @@ class AwardStats(object):
     @property
     def hits_taken(self):
         query = text("""select
-                            target as code,
-                            target_name as name,
-                            sum(amount) as total_land,
-                            count(1) as total_hits
+                            code,
+                            name,
+                            land_taken as total_land,
+                            hits_taken as total_hits
                         from
-                            TownCrier
-                        group by
-                            target
-                        having
-                            total_land > 0
+                            DominionAwards
+                        where
+                            land_taken > 0
                         order by
                             total_land desc;""")
         return self.db.session.execute(query)
@@ -84,16 +77,14 @@ class AwardStats(object):
     @property
     def hits_done(self):
         query = text("""select
-                            origin as code,
-                            origin_name as name,
-                            sum(amount) as total_land,
-                            count(1) as total_hits
+                            code,
+                            name,
+                            land_done as total_land,
+                            hits_done as total_hits
                         from
-                            TownCrier
-                        group by
-                            origin
-                        having
-                            total_land > 0
+                            DominionAwards
+                        where
+                            land_done > 0
                         order by
                             total_land desc;""")
         return self.db.session.execute(query)
@@ -101,13 +92,13 @@ class AwardStats(object):
     @property
     def abandons(self):
         query = text("""select
-                            origin as code,
-                            origin_name as name,
-                            target as realm
+                            code,
+                            name,
+                            abandoned_realm as realm
                         from
-                            TownCrier
+                            DominionAwards
                         where
-                            event_type like 'abandon'
-                        group by
+                            abandoned_realm is not null
+                        order by
                             realm;""")
         return self.db.session.execute(query)
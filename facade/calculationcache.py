@@ -0,0 +1,76 @@
+"""
+Cache for the results of the expensive military and ratio calculations.
+
+Entries are keyed on everything that changes the outcome: the dominion, its latest ops, its
+latest history row and realm, the ref-data version and the OD tick. New ops, a new search page
+or a new tick give a new key, so old entries are never served and just age out of the LRU.
+"""
+
+import logging
+from collections import OrderedDict
+from threading import Lock
+
+logger = logging.getLogger('od-info.cache')
+
+MAX_ENTRIES = 2000
+
+
+class CalculationCache(object):
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                logger.debug(f"Evicted {evicted} from calculation cache")
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, calling compute() and storing its result on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def evict_dominion(self, dom_code: int):
+        """Drop all entries of a dominion. Keys are (kind, dom_code, ...) tuples."""
+        with self._lock:
+            for key in [k for k in self._entries if k[1] == int(dom_code)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+calculation_cache = CalculationCache()
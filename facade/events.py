@@ -0,0 +1,68 @@
+"""
+Server-sent events to tell open pages that new data came in.
+
+Ingestion publishes small messages ("dominion X got new ops", "the Town Crier has N new events"),
+every open /events stream gets a copy. Pages then fetch only the changed rows from the JSON API.
+"""
+
+import json
+import logging
+from queue import Queue, Full, Empty
+from threading import Lock
+
+logger = logging.getLogger('od-info.events')
+
+MAX_QUEUED = 100  # Per subscriber, a stream that doesn't keep up misses messages
+KEEPALIVE_SECONDS = 15
+RETRY_MILLISECONDS = 5000
+
+
+def format_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class EventBroker(object):
+    def __init__(self, max_queued: int = MAX_QUEUED):
+        self.max_queued = max_queued
+        self._subscribers: set[Queue] = set()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def subscribe(self) -> Queue:
+        queue = Queue(maxsize=self.max_queued)
+        with self._lock:
+            self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: Queue):
+        with self._lock:
+            self._subscribers.discard(queue)
+
+    def publish(self, event: str, data: dict):
+        message = format_event(event, data)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        logger.debug(f"Publishing {event} {data} to {len(subscribers)} subscribers")
+        for queue in subscribers:
+            try:
+                queue.put_nowait(message)
+            except Full:
+                logger.warning(f"Event stream is {self.max_queued} messages behind, dropped {event}")
+
+    def stream(self, keepalive: float = KEEPALIVE_SECONDS):
+        """The text/event-stream body for one client. Unsubscribes when the client goes away."""
+        queue = self.subscribe()
+        try:
+            yield f"retry: {RETRY_MILLISECONDS}\n\n"
+            while True:
+                try:
+                    yield queue.get(timeout=keepalive)
+                except Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            self.unsubscribe(queue)
+
+
+event_broker = EventBroker()
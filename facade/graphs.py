@@ -1,32 +1,68 @@
-from matplotlib.figure import Figure
-import base64
+"""
+History graphs of a dominion as PNG images.
+
+The series are downsampled with Largest Triangle Three Buckets to GRAPH_POINTS points, which keeps
+the peaks and dips that a plain stride would drop. The PNGs are rendered in the request and cached per
+dominion and history version, so a graph is only rendered again after new history came in. Every graph is
+its own Figure, without pyplot's global state, so requests can render at the same time.
+"""
+
 from io import BytesIO
-from datetime import datetime
 
+import numpy as np
+from matplotlib.figure import Figure
+
+from facade.calculationcache import CalculationCache
 
-def land_history_graph(dom_history):
-    return dom_history_graph(dom_history, 'land')
+GRAPH_POINTS = 250
+GRAPH_CACHE_ENTRIES = 200
+HISTORY_GRAPHS = ('networth', 'land')
 
+graph_cache = CalculationCache(max_entries=GRAPH_CACHE_ENTRIES)
 
-def nw_history_graph(dom_history):
-    return dom_history_graph(dom_history, 'networth')
 
+def lttb_indices(x, y, threshold: int) -> np.ndarray:
+    """Indices of the points Largest Triangle Three Buckets keeps. First and last point are always kept."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    bucket_size = (n - 2) / (threshold - 2)
+    selected = np.zeros(threshold, dtype=int)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
 
-def dom_history_graph(dom_history, yaxis: str):
-    # def conv_ts(ts):
-    #     # return datetime.fromisoformat(ts).strftime('%Y-%m-%d %H:%M')
-    #     return datetime.fromisoformat(ts)
-    converted = {h.timestamp: getattr(h, yaxis) for h in dom_history}
-    x = list(converted.keys())
-    x.sort()
-    y = [converted[e] for e in x]
+
+def downsample(timestamps: list, values: list, threshold: int = GRAPH_POINTS) -> tuple[list, list]:
+    seconds = np.array(timestamps, dtype='datetime64[s]').astype(float)
+    keep = lttb_indices(seconds, values, threshold)
+    return [timestamps[i] for i in keep], [values[i] for i in keep]
+
+
+def render_history_png(timestamps: list, values: list, yaxis: str) -> bytes:
     fig = Figure()
     plt = fig.subplots()
     fig.autofmt_xdate()
-    plt.plot(x, y)
+    plt.plot(timestamps, values)
     fig.suptitle(f"{yaxis.capitalize()} over Time")
     buf = BytesIO()
     fig.savefig(buf, format="png")
-    # Embed the result in the html output.
-    data = base64.b64encode(buf.getbuffer()).decode("ascii")
-    return f"<img src='data:image/png;base64,{data}'/>"
+    return buf.getvalue()
+
+
+def history_graph(history: list, yaxis: str) -> bytes:
+    """PNG of the land or networth of (timestamp, land, networth) rows, downsampled to GRAPH_POINTS points."""
+    column = 1 if yaxis == 'land' else 2
+    timestamps, values = downsample([row[0] for row in history], [row[column] for row in history])
+    return render_history_png(timestamps, values, yaxis)
@@ -0,0 +1,117 @@
+"""
+Background jobs for the long updates from OpenDominion.net.
+
+Jobs run one at a time on a worker thread, so a request that starts an update returns right away
+with the job id. Every job is recorded in the Jobs table with its progress. Starting a job of a kind
+that is already queued or running doesn't start another one: the id of the existing job is returned.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+from threading import Lock
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from domain.models import Job
+
+logger = logging.getLogger('od-info.jobs')
+
+ACTIVE = ('queued', 'running')
+
+
+class JobProgress(object):
+    """Passed to the work of a job to report progress. Every step is written to the job record."""
+    def __init__(self, queue: 'JobQueue', job_id: int):
+        self._queue = queue
+        self.job_id = job_id
+
+    def start(self, total: int):
+        self._queue.update_job(self.job_id, total=total, done=0)
+
+    def advance(self, error: str | None = None):
+        if error:
+            logger.warning(f"Job {self.job_id}: {error}")
+            self._queue.update_job(self.job_id, done=Job.done + 1, errors=Job.errors + 1, message=error[:500])
+        else:
+            self._queue.update_job(self.job_id, done=Job.done + 1)
+
+
+def job_status(job: Job, now: datetime | None = None) -> dict:
+    """Plain values of a job, with the estimated seconds to go while it runs."""
+    eta = None
+    if job.status == 'running' and job.total and job.done:
+        elapsed = ((now or datetime.now()) - job.started).total_seconds()
+        eta = round(elapsed / job.done * (job.total - job.done))
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'total': job.total,
+        'done': job.done,
+        'errors': job.errors,
+        'message': job.message,
+        'eta_seconds': eta,
+        'created': job.created.isoformat() if job.created else None,
+        'started': job.started.isoformat() if job.started else None,
+        'finished': job.finished.isoformat() if job.finished else None,
+    }
+
+
+class JobQueue(object):
+    def __init__(self, workers: int = 1):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='od-info-jobs')
+        self._lock = Lock()
+        self._engine = None
+        self._context = nullcontext
+
+    def init(self, engine, context=nullcontext):
+        """Jobs run inside context(), like the Flask app context.
+        Jobs still queued or running when the app stopped never finish, so they are marked as failed."""
+        self._engine = engine
+        self._context = context
+        with Session(engine) as session:
+            session.execute(update(Job).where(Job.status.in_(ACTIVE))
+                            .values(status='failed', message='Interrupted by a restart', finished=datetime.now()))
+            session.commit()
+
+    def update_job(self, job_id: int, **values):
+        with Session(self._engine) as session:
+            session.execute(update(Job).where(Job.id == job_id).values(**values))
+            session.commit()
+
+    def submit(self, kind: str, work) -> int:
+        """Queue work(progress) to run on the worker thread, unless a job of this kind is already queued or running."""
+        with self._lock:
+            with Session(self._engine) as session:
+                active = session.scalar(select(Job.id).where(Job.kind == kind, Job.status.in_(ACTIVE)))
+                if active:
+                    logger.debug(f"Job {active} of kind {kind} is still active")
+                    return active
+                job = Job(kind=kind, status='queued', created=datetime.now())
+                session.add(job)
+                session.commit()
+                job_id = job.id
+            self._executor.submit(self._run, job_id, work)
+        logger.debug(f"Queued job {job_id} of kind {kind}")
+        return job_id
+
+    def _run(self, job_id: int, work):
+        self.update_job(job_id, status='running', started=datetime.now())
+        try:
+            with self._context():
+                work(JobProgress(self, job_id))
+            self.update_job(job_id, status='done', finished=datetime.now())
+        except Exception as e:
+            logger.exception(f"Job {job_id} failed")
+            self.update_job(job_id, status='failed', message=str(e)[:500], finished=datetime.now())
+
+    def status(self, job_id: int) -> dict | None:
+        with Session(self._engine) as session:
+            job = session.get(Job, job_id)
+            return job_status(job) if job else None
+
+
+job_queue = JobQueue()
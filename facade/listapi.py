@@ -0,0 +1,133 @@
+"""
+Filtering, sorting and keyset paging for the JSON list API.
+
+A page ends with a cursor: the sort value and the key of its last row. The next page continues after
+that row, so paging stays cheap and stable while rows are added. Lists that come straight from the database
+are paged in SQL, lists of calculated rows are filtered in SQL first and then paged here.
+"""
+
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+ListQuery = namedtuple('ListQuery',
+                       'realm min_land max_land max_ops_age max_age since until event_type dominion '
+                       'sort descending after limit')
+
+# Fields each list can be sorted on, the first is the default (descending)
+DOMINION_SORTS = ('land', 'networth', 'realm', 'name', 'code')
+MILITARY_SORTS = ('networth', 'land', 'dp', 'op', 'five_over_four_op', 'max_sendable_op', 'ops_age', 'realm', 'code')
+RATIO_SORTS = ('ratio_estimate', 'land', 'networth', 'spywiz_networth', 'ops_age', 'realm', 'code')
+STEALABLE_SORTS = ('platinum_per_op', 'food_per_op', 'mana_per_op', 'gems_per_op', 'lumber_per_op', 'ore_per_op',
+                   'land', 'dominion')
+TOWN_CRIER_SORTS = ('timestamp', )
+REALM_SORTS = ('land', 'networth', 'op', 'dp', 'land_gained', 'land_lost', 'dominions', 'realm')
+
+
+class ApiError(ValueError):
+    """Bad parameters in an API request."""
+
+
+def encode_cursor(values: list) -> str:
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise ApiError(f"Invalid cursor: {cursor}")
+    if not isinstance(values, list):
+        raise ApiError(f"Invalid cursor: {cursor}")
+    return values
+
+
+def _int_arg(args, name: str) -> int | None:
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ApiError(f"{name} should be a number, not {value}")
+
+
+def _datetime_arg(args, name: str) -> datetime | None:
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ApiError(f"{name} should be a date and time like 2023-08-10T14:00, not {value}")
+
+
+def list_query(args, sortable: tuple[str, ...]) -> ListQuery:
+    """Parse request arguments. The first sortable field is the default, sort=-field sorts descending."""
+    sort = args.get('sort') or f'-{sortable[0]}'
+    descending = sort.startswith('-')
+    sort = sort.lstrip('-')
+    if sort not in sortable:
+        raise ApiError(f"Can't sort on {sort}, only on {', '.join(sortable)}")
+    limit = _int_arg(args, 'limit') or PAGE_SIZE
+    if not 0 < limit <= MAX_PAGE_SIZE:
+        raise ApiError(f"limit should be between 1 and {MAX_PAGE_SIZE}")
+    cursor = args.get('cursor')
+    return ListQuery(realm=_int_arg(args, 'realm'),
+                     min_land=_int_arg(args, 'min_land'),
+                     max_land=_int_arg(args, 'max_land'),
+                     max_ops_age=_int_arg(args, 'max_ops_age'),
+                     max_age=_int_arg(args, 'max_age'),
+                     since=_datetime_arg(args, 'since'),
+                     until=_datetime_arg(args, 'until'),
+                     event_type=args.get('event_type'),
+                     dominion=_int_arg(args, 'dominion'),
+                     sort=sort,
+                     descending=descending,
+                     after=decode_cursor(cursor) if cursor else None,
+                     limit=limit)
+
+
+def json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, 'item'):  # numpy scalars
+        return value.item()
+    return value
+
+
+def json_row(row: dict) -> dict:
+    return {key: json_value(value) for key, value in row.items()}
+
+
+def json_page(page: dict) -> dict:
+    return {'data': [json_row(row) for row in page['data']], 'next': page['next']}
+
+
+def page_result(rows: list[dict], query: ListQuery, cursor_keys: tuple[str, ...]) -> dict:
+    """Rows of a page that was fetched with one row extra, to know whether there is a next page."""
+    has_next = len(rows) > query.limit
+    rows = rows[:query.limit]
+    next_cursor = encode_cursor([rows[-1][key] for key in cursor_keys]) if has_next else None
+    return {'data': rows, 'next': next_cursor}
+
+
+def keyset_page(rows: list[dict], query: ListQuery, id_key: str = 'code') -> dict:
+    """Sort and page calculated rows on (sort field, id). Rows without a value for the sort field are left out."""
+    def sort_key(row):
+        return row[query.sort], row[id_key]
+
+    rows = [row for row in rows if row[query.sort] is not None]
+    rows.sort(key=sort_key, reverse=query.descending)
+    if query.after:
+        after = tuple(query.after)
+        try:
+            rows = [row for row in rows if (sort_key(row) < after if query.descending else sort_key(row) > after)]
+        except TypeError:
+            raise ApiError(f"Cursor doesn't match sorting on {query.sort}")
+    return page_result(rows[:query.limit + 1], query, (query.sort, id_key))
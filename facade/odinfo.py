@@ -6,18 +6,42 @@ so that any ugliness is contained in this class.
 """
 
 import logging
+import time
+from datetime import datetime, timedelta
 from operator import itemgetter
+from threading import Lock
 
+from calculators.armytimeline import ArmyTimeline, ArmyTimelines
 from calculators.economy import Economy
-from calculators.military import MilitaryCalculator, RatioCalculator
+from calculators.hitmatrix import HitMatrix
+from calculators.military import MilitaryCalculator, RatioCalculator, evaluate_safe_op_curve
+from calculators.montecarlo import InvasionSimulator, army_estimate
 from calculators.networthcalculator import get_networth_deltas
+from calculators.projection import EconomyProjection
+from calculators.ratioengine import RatioEngine, MAX_OPS_AGE
+from calculators.stealables import rank_stealables
 from config import SEARCH_PAGE
+from config import discord_webhook
 from config import current_player_id
-from domain.dataaccesslayer import all_doms, dom_by_id, is_database_empty, realmies, query_town_crier, realm_of_dom
+from domain.dataaccesslayer import all_doms, dom_by_id, is_database_empty, realmies, realm_of_dom
+from domain.dataaccesslayer import bump_data_version, history_version, dom_history, awards_missing, recount_awards
+from domain.dataaccesslayer import doms_version, backfill_ops_queues
+from domain.dataaccesslayer import realm_snapshot, store_realm_totals, realm_totals, realm_history, realm_history_version
+from domain.dataaccesslayer import doms_by, filtered_doms, query_dominions, query_town_crier_page, town_crier_event_types
 from domain.models import Dominion
-from domain.timeutils import hours_since, add_duration, current_od_time
+from domain.refdata import ref_data_version
+from domain.timeutils import hours_since, add_duration, current_od_time, current_od_tick
 from facade.awardstats import AwardStats
+from facade.calculationcache import calculation_cache
 from facade.discord import send_to_webhook
+from facade.events import event_broker
+from facade.graphs import graph_cache, history_graph
+from facade.jobs import job_queue
+from facade.listapi import ListQuery, ApiError, keyset_page, page_result, json_page
+from facade.pagecache import page_etag
+from facade.threatmonitor import threat_monitor, threat_message, Threat
+from facade.targetfinder import target_index, TargetIndex, TargetEntry
+from facade.tickclock import TickClock
 from opsdata.ops import grab_ops, grab_my_ops, get_last_scans
 from opsdata.scrapetools import login, read_tick_time, get_soup_page
 from opsdata.updater import update_ops, update_town_crier, update_dom_index, query_stealables
@@ -25,36 +49,99 @@ from sqlalchemy import text
 
 logger = logging.getLogger('od-info.facade')
 
+MISSING = object()
+SCRAPE_SESSION_SECONDS = 3600
+DP_FORECAST_TICKS = (6, 12, 24)
+RATIO_BATCH = 200  # Dominions per RatioEngine run, which holds arrays of the ops of all of its dominions
+UPDATE_JOBS = {  # Job kind: facade method that takes a progress argument
+    'dom_index': 'update_dom_index',
+    'update_all': 'update_all',
+    'realmies': 'update_realmies',
+    'town_crier': 'update_town_crier',
+}
+REALM_TREND_HOURS = 24
+REALM_HISTORY_COLUMNS = ('timestamp', 'dominions', 'land', 'networth', 'armies', 'op', 'dp', 'land_gained', 'land_lost')
+TC_COLUMNS = ('timestamp', 'event_type', 'origin', 'origin_name', 'target', 'target_name', 'amount', 'text')
+
 
 class ODInfoFacade(object):
+    """One facade per app process, shared by all requests and background jobs.
+    Database access goes through db.session, which Flask-SQLAlchemy scopes to the request (or job) app context.
+    The scrape session and tick clock are shared, the calculation caches are process-wide singletons."""
     def __init__(self, db):
-        self._session = None
         self._db = db
+        self._session = None
+        self._session_started = None
+        self._session_lock = Lock()
+        self.tick_clock = TickClock(lambda: read_tick_time(get_soup_page(self.session, SEARCH_PAGE)))
+
+    def initialize(self) -> int | None:
+        """Once at startup: fill an empty database from the search page, in the background. Returns the job id.
+        A database from before the award totals existed gets them counted from its Town Crier,
+        ops from before the typed queue rows get them from their JSON queues.
+        The threat monitor is loaded, so the first ops that come in already send their threats to Discord."""
+        if awards_missing(self._db):
+            recount_awards(self._db)
+            self._db.session.commit()
+        if backfill_ops_queues(self._db):
+            self._db.session.commit()
         if is_database_empty(self._db):
-            update_dom_index(self.session, self._db)
+            return self.start_update('dom_index')
+        self.load_threats()
+        return None
 
     @property
     def session(self):
-        if not self._session:
-            self._session = login(current_player_id)
-        return self._session
+        """Logged in scrape session, logged in again when it's older than SCRAPE_SESSION_SECONDS."""
+        with self._session_lock:
+            if self._session and (time.monotonic() - self._session_started > SCRAPE_SESSION_SECONDS):
+                self._session.close()
+                self._session = None
+            if not self._session:
+                self._session = login(current_player_id)
+                self._session_started = time.monotonic()
+            return self._session
 
     def teardown(self):
-        self.session.close()
+        with self._session_lock:
+            if self._session:
+                self._session.close()
+                self._session = None
 
-    def update_all(self):
+    def update_all(self, progress=None):
+        """Ops of all dominions with newer scans than we have, and of all realmies."""
         last_scans = get_last_scans(self.session)
-        for dom in all_doms(self._db):
-            domcode = dom.code
-            if (domcode in last_scans) and (
-                    (dom.last_op is None) or
-                    (dom.last_op < last_scans[domcode])):
-                self.update_ops(domcode)
+        outdated = [dom.code for dom in all_doms(self._db)
+                    if (dom.code in last_scans) and ((dom.last_op is None) or (dom.last_op < last_scans[dom.code]))]
+        realmie_codes = [code for code in self.realmie_codes() if code not in outdated]
+        self._update_ops_of(outdated + realmie_codes, progress)
+
+    def _update_ops_of(self, dom_codes: list[int], progress=None):
+        """With progress, a failing dominion is counted as an error and the others are still updated."""
+        if progress:
+            progress.start(len(dom_codes))
+        for dom_code in dom_codes:
+            if not progress:
+                self.update_ops(dom_code)
+                continue
+            try:
+                self.update_ops(dom_code)
+                progress.advance()
+            except Exception as e:
+                self._db.session.rollback()
+                progress.advance(error=f"Dominion {dom_code}: {e}")
 
     # ---------------------------------------- COMMANDS - Update from OpenDominion.net
 
-    def update_dom_index(self):
-        update_dom_index(self.session, self._db)
+    def update_dom_index(self, progress=None):
+        update_dom_index(self.session, self._db, progress)
+        target_index.invalidate()
+        threat_monitor.invalidate()
+        self.load_threats()
+        # The realms are rolled up from all of the new history, after the dominions were committed one by one
+        self.refresh_realms()
+        bump_data_version(self._db)
+        self._db.session.commit()
 
     def update_ops(self, dom_code):
         logger.debug("Updating ops for dominion %s", dom_code)
@@ -64,16 +151,37 @@ class ODInfoFacade(object):
             ops = grab_ops(self.session, dom_code)
         if ops:
             update_ops(ops, self._db, dom_code)
-            # TODO Calculate the expensive stuff like military calcs and cache them.
+            calculation_cache.evict_dominion(dom_code)
+            dom = self.dominion(dom_code)
+            self.warm_calculation_cache(dom)
+            self.refresh_realms([dom.realm])
+            bump_data_version(self._db)
+            self._db.session.commit()
+            self.refresh_target(dom)
+            self.refresh_threats(dom)
+            self.publish_update(dom)
         else:
             logger.warning(f"Can't get ops for dominion {dom_code}")
 
-    def update_town_crier(self):
-        update_town_crier(self.session, self._db)
+    def update_town_crier(self, progress=None):
+        new_events = update_town_crier(self.session, self._db, progress)
+        if new_events:
+            event_broker.publish('towncrier', {'new_events': new_events})
 
-    def update_realmies(self):
-        for dom_code in self.realmie_codes():
-            self.update_ops(dom_code)
+    def update_realmies(self, progress=None):
+        self._update_ops_of(self.realmie_codes(), progress)
+
+    def start_update(self, kind: str) -> int:
+        """Run one of the UPDATE_JOBS in the background. Returns the job id."""
+        return job_queue.submit(kind, lambda progress: getattr(self, UPDATE_JOBS[kind])(progress=progress))
+
+    def job_status(self, job_id: int) -> dict | None:
+        return job_queue.status(job_id)
+
+    def publish_update(self, dom: Dominion):
+        """Tell open pages that this dominion has new ops, so they can fetch its rows again."""
+        event_broker.publish('dominion', {'code': dom.code, 'name': dom.name, 'realm': dom.realm,
+                                          'last_op': dom.last_op.isoformat() if dom.last_op else None})
 
     # ---------------------------------------- COMMANDS - Change directly
 
@@ -81,12 +189,14 @@ class ODInfoFacade(object):
         logger.debug("Updating dominion %s role to %s", dom_code, role)
         qry = text(f'UPDATE Dominions SET role = :role WHERE code = :code')
         self._db.session.execute(qry, {'role': role, 'code': dom_code})
+        bump_data_version(self._db)
         self._db.session.commit()
 
     def update_player(self, dom_code, player_name):
         logger.debug("Updating dominion player of dominion %s to %s", dom_code, player_name)
         qry = text(f'UPDATE Dominions SET player = :name WHERE code = :code')
         self._db.session.execute(qry, {'name': player_name, 'code': dom_code})
+        bump_data_version(self._db)
         self._db.session.commit()
 
     # ---------------------------------------- COMMANDS - Send out information
@@ -115,17 +225,120 @@ class ODInfoFacade(object):
 
         return webhook_response
 
+    # ---------------------------------------- CACHE - Expensive calculations
+
+    @staticmethod
+    def _last_history(dom: Dominion):
+        """Land and networth come from the latest history row, which the search page adds without new ops."""
+        return dom.history[0].timestamp if dom.history else None
+
+    def _cache_key(self, kind: str, dom: Dominion) -> tuple:
+        return (kind, dom.code, dom.last_op, self._last_history(dom), dom.realm,
+                ref_data_version(), current_od_tick())
+
+    def _list_cache_key(self, kind: str, codes: list[int] | None, *args) -> tuple:
+        """Key for calculations over many dominions, or all of them without codes: these change with any new ops,
+        history or realm moves. Taken from SQL aggregates, so the dominions don't have to be loaded for it."""
+        return (kind, None) + args + (doms_version(self._db, codes), ref_data_version(), current_od_tick())
+
+    def warm_calculation_cache(self, dom: Dominion):
+        """Calculate the expensive stuff for a dominion right after ingesting its ops."""
+        self.military_summary(dom)
+        self.ratio_summary(dom)
+        self.army_timeline(dom)
+
+    def military_summary(self, dom: Dominion) -> dict:
+        return calculation_cache.get_or_compute(self._cache_key('military', dom),
+                                                lambda: MilitaryCalculator(dom).summary(self.current_tick.day))
+
+    def army_timeline(self, dom: Dominion) -> ArmyTimeline:
+        """Doesn't depend on the current tick, so it's only built again after new ops."""
+        key = ('timeline', dom.code, dom.last_op, ref_data_version())
+        return calculation_cache.get_or_compute(key, lambda: ArmyTimeline(dom))
+
+    def ratio_summary(self, dom: Dominion) -> dict | None:
+        """None if the dominion doesn't have enough ops to estimate ratios."""
+        def compute():
+            rc = RatioCalculator(dom)
+            return rc.summary() if rc.can_calculate else None
+
+        return calculation_cache.get_or_compute(self._cache_key('ratios', dom), compute)
+
+    # ---------------------------------------- TARGETS - Index on land and DP
+
+    def _target_entry(self, dom: Dominion) -> TargetEntry | None:
+        """None for dominions without ops on their army: their DP is unknown."""
+        summary = self.military_summary(dom)
+        if not summary['has_army']:
+            return None
+        return TargetEntry(dom.current_land, dom.code, dom.name, dom.realm, summary['dp'], summary['ops_age'])
+
+    def targets_by_land(self) -> TargetIndex:
+        """The index is fully rebuilt once per tick, in between entries are refreshed when ops come in."""
+        tick = current_od_tick()
+        if target_index.tick != tick:
+            entries = [self._target_entry(dom) for dom in all_doms(self._db)]
+            target_index.rebuild([entry for entry in entries if entry], tick)
+        return target_index
+
+    def refresh_target(self, dom: Dominion):
+        if target_index.tick is not None:
+            entry = self._target_entry(dom)
+            if entry:
+                target_index.update(entry)
+            else:
+                target_index.remove(dom.code)
+
+    def find_targets(self, my_op: int | None = None, my_land: int | None = None) -> tuple[list[dict], int, int]:
+        """Targets in range that my OP breaks, with the OP and land used. Defaults to my max sendable OP and land.
+        No targets when there's no OP or land: not given, and no ops on my own dominion to take them from."""
+        me = self.dominion(current_player_id)
+        if not my_op and me and me.military:
+            my_op = self.military_summary(me)['max_sendable_op']
+        if not my_land and me:
+            my_land = me.current_land
+        if not my_op or not my_land:
+            return [], my_op or 0, my_land or 0
+        return self.targets_by_land().targets(my_land, my_op, me.realm if me else None), my_op, my_land
+
+    # ---------------------------------------- THREATS - Who can hit my realmies
+
+    def load_threats(self):
+        """Evaluate all dominions against the other side, without sending anything to Discord."""
+        summaries = [self.military_summary(dom) for dom in all_doms(self._db)]
+        threat_monitor.load(summaries, realm_of_dom(self._db, current_player_id))
+
+    def threats(self) -> list[Threat]:
+        """Standing table of enemies that break a realmie in range."""
+        if not threat_monitor.loaded:
+            self.load_threats()
+        return threat_monitor.threats()
+
+    def refresh_threats(self, dom: Dominion):
+        """Evaluate only this dominion against the other side, and send changes to Discord.
+        The monitor is loaded at startup and after a dom index update; should that not have worked, it is loaded
+        here, and only the changes of the dominions after this one are sent."""
+        if not threat_monitor.loaded:
+            self.load_threats()
+            return
+        changed, gone = threat_monitor.update(self.military_summary(dom))
+        if (changed or gone) and discord_webhook:
+            message = threat_message(changed, gone)
+            logger.debug("Sending to Discord webhook: %s", message)
+            webhook_response = send_to_webhook(message)
+            logger.debug("Webhook response: %s", webhook_response)
+
     # ---------------------------------------- QUERIES - Single Dominion
 
     def dominion(self, dom_code):
         return dom_by_id(self._db, dom_code)
         # return Dominion(self._db, dom_code)
 
-    def military(self, dom: Dominion):
-        return MilitaryCalculator(dom)
+    def military(self, dom: Dominion) -> dict:
+        return self.military_summary(dom)
 
-    def ratios(self, dom: Dominion):
-        return RatioCalculator(dom)
+    def ratios(self, dom: Dominion) -> dict | None:
+        return self.ratio_summary(dom)
 
     def ops_age(self, dom: Dominion):
         return hours_since(dom.last_op)
@@ -144,96 +357,146 @@ class ODInfoFacade(object):
         return dom_by_id(self._db, dom_code).history
         # return query_dom_history(self._db, dom_code)
 
+    def history_graph(self, dom_code, yaxis: str) -> tuple[bytes, str]:
+        """PNG of the networth or land history and its ETag. Only rendered again when new history came in."""
+        key = ('graph', int(dom_code), yaxis, history_version(self._db, dom_code))
+        png = graph_cache.get_or_compute(key, lambda: history_graph(dom_history(self._db, dom_code), yaxis))
+        return png, page_etag(key)
+
+    # ---------------------------------------- REALMS - Rollups per tick
+
+    def refresh_realms(self, realms: list[int] | None = None):
+        """Roll the current land, networth and armies of the given realms, or of all realms, up into this tick.
+        Derived from an ingest, so it's part of its transaction: the caller bumps the data version and commits."""
+        totals = {row.realm: {'realm': row.realm, 'dominions': row.dominions, 'land': row.land,
+                              'networth': row.networth, 'armies': 0, 'op': 0, 'dp': 0}
+                  for row in realm_snapshot(self._db, realms)}
+        doms = all_doms(self._db) if realms is None else [dom for realm in realms
+                                                          for dom in filtered_doms(self._db, realm=realm)]
+        for dom in doms:
+            summary = self.military_summary(dom)
+            if summary['has_army'] and dom.realm in totals:
+                totals[dom.realm]['armies'] += 1
+                totals[dom.realm]['op'] += round(summary['op'])
+                totals[dom.realm]['dp'] += round(summary['dp'])
+        store_realm_totals(self._db, current_od_tick(), totals.values())
+
+    def realm_totals(self) -> list[dict]:
+        """Every realm's latest totals, with its land gained and lost in the last REALM_TREND_HOURS."""
+        rows = realm_totals(self._db, self._since(REALM_TREND_HOURS))
+        return sorted(rows, key=itemgetter('land'), reverse=True)
+
+    def realm_history(self, realm: int) -> list[dict]:
+        return [{column: getattr(row, column) for column in REALM_HISTORY_COLUMNS}
+                for row in realm_history(self._db, realm)]
+
+    def realm_graph(self, realm: int, yaxis: str) -> tuple[bytes, str]:
+        """PNG of the land or networth of the realm over its ticks, and its ETag."""
+        key = ('realm_graph', None, int(realm), yaxis, realm_history_version(self._db, realm))
+        def render():
+            history = [(row.timestamp, row.land, row.networth) for row in realm_history(self._db, realm) if row.land]
+            return history_graph(history, yaxis)
+
+        return graph_cache.get_or_compute(key, render), page_etag(key)
+
     # ---------------------------------------- QUERIES - Lists
 
     def dom_list(self, since='-12 hours'):
-        """Get overview information of all dominions."""
+        """All dominions, largest first, sorted by the database and loaded while they are iterated."""
         logger.debug("Getting dom list since %s", since)
-        doms = all_doms(self._db)
-        return sorted(doms, key=lambda x: x.current_land, reverse=True)
+        return doms_by(self._db, 'land')
 
     def nw_deltas(self):
         """Get overview information of all dominions."""
         logger.debug("Getting NW deltas")
         return get_networth_deltas(self._db)
 
-    def get_town_crier(self):
+    def town_crier(self, query: ListQuery) -> dict:
+        """A page of Town Crier events with the cursor of the next page. Filtered and paged in SQL."""
         logger.debug("Getting Town Crier")
-        return query_town_crier(self._db)
-
-    def ratio_list(self):
-        """Overview of the ratios of all dominions."""
-        rc_list = [RatioCalculator(dom) for dom in all_doms(self._db)]
-        rc_list = [rc for rc in rc_list if rc.can_calculate and (hours_since(rc.dom.last_op) < 100)]
-        result = list()
-        for rc in rc_list:
-            result.append({
-                'code': rc.dom.code,
-                'name': rc.dom.name,
-                'realm': rc.dom.realm,
-                'land': rc.dom.current_land,
-                'race': rc.dom.race,
-                'networth': rc.dom.current_networth,
-                'spy_units_equiv': rc.spy_units_equiv,
-                'wiz_units_equiv': rc.wiz_units_equiv,
-                'spywiz_networth': rc.spywiz_networth,
-                'spywiz_units': rc.spywiz_units,
-                'ratio_estimate': rc.ratio_estimate,
-                'spy_ratio_estimate': rc.spy_ratio_estimate,
-                'max_spy_ratio_estimate': rc.max_spy_ratio_estimate,
-                'wiz_ratio_estimate': rc.wiz_ratio_estimate,
-                'max_wiz_ratio_estimate': rc.max_wiz_ratio_estimate,
-                'ops_age': hours_since(rc.dom.last_op)
-            })
-        return sorted(result, key=lambda d: d['ratio_estimate'], reverse=True)
+        after = None
+        if query.after:
+            try:
+                timestamp, origin, target, event_type = query.after
+                after = (datetime.fromisoformat(timestamp), origin, target, event_type)
+            except (TypeError, ValueError):
+                raise ApiError("Invalid cursor for the Town Crier")
+        since = query.since or self._since(query.max_age)
+        events = query_town_crier_page(self._db, query.event_type, query.realm, query.dominion, since, query.until,
+                                       query.descending, after, query.limit + 1)
+        rows = [{column: getattr(event, column) for column in TC_COLUMNS} for event in events]
+        return page_result(rows, query, ('timestamp', 'origin', 'target', 'event_type'))
+
+    def town_crier_event_types(self) -> list[str]:
+        return town_crier_event_types(self._db)
+
+    def ratio_list(self, doms: list[Dominion] | None = None):
+        """Overview of the ratios of all dominions, or of the given ones, highest ratio estimate first.
+        A generator: ratios that aren't cached are calculated in batches of RATIO_BATCH dominions, and only the
+        codes are ranked up front. The rows are taken from the calculation cache while they're rendered."""
+        doms = [dom for dom in (all_doms(self._db) if doms is None else doms) if hours_since(dom.last_op) < MAX_OPS_AGE]
+        keys = {dom.code: self._cache_key('ratios', dom) for dom in doms}
+        cached = {dom.code: calculation_cache.get(keys[dom.code], MISSING) for dom in doms}
+        missing = [dom for dom in doms if cached[dom.code] is MISSING]
+        for start in range(0, len(missing), RATIO_BATCH):
+            batch = missing[start:start + RATIO_BATCH]
+            calculated = RatioEngine(batch).calculate()
+            for dom in batch:
+                cached[dom.code] = calculated.get(dom.code)
+                calculation_cache.put(keys[dom.code], cached[dom.code])
+        ranked = sorted((code for code, row in cached.items() if row),
+                        key=lambda code: cached[code]['ratio_estimate'], reverse=True)
+        for code in ranked:
+            yield cached[code]
 
     def all_doms_ops_age(self):
         return {dom.code: hours_since(dom.last_op) for dom in all_doms(self._db)}
 
-    def doms_as_mil_calcs(self, dom_list: list) -> list:
-        mil_calcs = [MilitaryCalculator(dom) for dom in dom_list]
-        return sorted(mil_calcs, key=lambda d: d.dom.current_networth, reverse=True)
+    def doms_as_mil_calcs(self, dom_list: list) -> list[dict]:
+        mil_calcs = [self.military_summary(dom) for dom in dom_list]
+        return sorted(mil_calcs, key=lambda d: d['networth'], reverse=True)
 
     def military_list(self, versus_op=0, top=20):
-        mc_list = [d for d in self.doms_as_mil_calcs(all_doms(self._db).all()[:top]) if d.army]
-        result_list = list()
-        current_day = self.current_tick.day
-        for mc in mc_list:
-            five_four_op, five_four_dp = mc.five_over_four
-            boat_stuff = mc.boats(current_day)
-            dom_result = {
-                'code': mc.dom.code,
-                'name': mc.dom.name,
-                'realm': mc.dom.realm,
-                'race': mc.dom.race,
-                'ops_age': hours_since(mc.dom.last_op),
-                'land': mc.dom.current_land,
-                'hittable_75_percent': mc.hittable_75_percent,
-                'five_over_four_op': five_four_op,
-                'five_over_four_dp': five_four_dp,
-                'temples': mc.temple_bonus,
-                'boats_amount': boat_stuff[0],
-                'boats_prt': boat_stuff[1],
-                'boats_sendable': boat_stuff[2],
-                'boats_capacity': boat_stuff[3],
-                'paid_until': mc.army.get('paid_until', '?'),
-                'raw_op': mc.raw_op,
-                'op': mc.op,
-                'raw_dp': mc.raw_dp,
-                'dp': mc.dp,
-                'safe_op': mc.safe_op if versus_op == 0 else mc.safe_op_versus(versus_op),
-                'safe_dp': mc.safe_dp if versus_op == 0 else mc.safe_dp_versus(versus_op),
-                'networth': mc.dom.current_networth
-            }
-            result_list.append(dom_result)
-        return result_list
-
-    def top_op(self, mil_calc_result: list):
-        topop = mil_calc_result[0]
-        for mc in mil_calc_result[1:]:
-            if mc['five_over_four_op'] > topop['five_over_four_op']:
-                topop = mc
-        return topop
+        """Rows of the top dominions on networth, with their army. A generator: rows are made while they're rendered.
+        Only the DP forecast and hit chances are calculated up front, as they are calculated for all rows at once."""
+        doms = list(doms_by(self._db, 'networth', limit=top))
+        dp_forecast = ArmyTimelines([self.army_timeline(dom) for dom in doms]).dp_forecast(DP_FORECAST_TICKS)
+        hit_chances = self.hit_chances(doms)
+        for dom in doms:
+            row = self.military_summary(dom)
+            if not row['has_army']:
+                continue
+            row = dict(row)
+            if int(versus_op) != 0:
+                row['safe_op'], row['safe_dp'] = evaluate_safe_op_curve(row['safe_op_curve'], int(versus_op))
+            row['dp_forecast'] = dp_forecast.get(row['code'], dict())
+            row['hit_chance'] = hit_chances.get(row['code'])
+            yield row
+
+    def hit_chances(self, doms: list[Dominion]) -> dict[int, float]:
+        """Chance that my army breaks each of the dominions, simulated once per tick and set of ops."""
+        me = self.dominion(current_player_id)
+        if not me or not me.military:
+            return dict()
+        codes = tuple(dom.code for dom in doms)
+        key = self._list_cache_key('hit_chances', list(codes) + [me.code], codes)
+
+        def compute():
+            targets = [army_estimate(dom) for dom in doms if dom.military]
+            chances = InvasionSimulator().hit_probability([army_estimate(me)], targets)[0]
+            return {target.code: float(chance) for target, chance in zip(targets, chances)}
+
+        return calculation_cache.get_or_compute(key, compute)
+
+    def safe_op_curves(self, top=20) -> dict:
+        """Safe OP curve breakpoints per dominion, so a page can evaluate them for any enemy OP."""
+        summaries = [self.military_summary(dom) for dom in doms_by(self._db, 'networth', limit=top)]
+        return {row['code']: row['safe_op_curve'] for row in summaries if row['has_army']}
+
+    def top_op(self, top=20) -> dict | None:
+        """Military summary with the highest 5/4 OP among the top dominions on networth."""
+        summaries = [self.military_summary(dom) for dom in doms_by(self._db, 'networth', limit=top)]
+        return max((row for row in summaries if row['has_army']), key=itemgetter('five_over_four_op'), default=None)
 
     def realmie_codes(self) -> list[int]:
         logger.debug("Getting Realmies")
@@ -243,11 +506,70 @@ class ODInfoFacade(object):
         logger.debug("Getting Realmies")
         return realmies(self._db, current_player_id)
 
-    def stealables(self) -> list:
+    def hit_matrix(self) -> dict:
+        """Land gain for every realmie versus every enemy they can break.
+        Calculated once per tick and set of ops and history, as the report has ops ages and land in it."""
+        key = self._list_cache_key('hitmatrix', None)
+
+        def compute():
+            doms = list(all_doms(self._db))
+            my_realm = realm_of_dom(self._db, current_player_id)
+            members = [dom for dom in doms if dom.realm == my_realm]
+            enemies = [dom for dom in doms if dom.realm != my_realm]
+            attackers = [row for row in (self.military_summary(dom) for dom in members) if row['has_army']]
+            targets = [row for row in (self.military_summary(dom) for dom in enemies) if row['has_army']]
+            return HitMatrix(attackers, targets).report()
+
+        return calculation_cache.get_or_compute(key, compute)
+
+    def stealables(self) -> list[dict]:
+        """Latest CS of the last 12 hours per dominion, ranked on projected haul per op. Calculated once per tick."""
         logger.debug("Listing stealables")
-        since = add_duration(current_od_time(as_str=True), -12, True)
-        result = query_stealables(self._db, since, realm_of_dom(self._db, current_player_id))
-        return result
+        key = self._list_cache_key('stealables', None)
+
+        def compute():
+            since = add_duration(current_od_time(as_str=True), -12, True)
+            rows = query_stealables(self._db, since, realm_of_dom(self._db, current_player_id))
+            me = self.dominion(current_player_id)
+            spies = me.last_cs.military_spies if me and me.last_cs else None
+            return rank_stealables(rows, self.economy_projection(), spies)
+
+        return calculation_cache.get_or_compute(key, compute)
+
+    # ---------------------------------------- QUERIES - JSON API
+
+    def _since(self, hours: int | None) -> datetime | None:
+        return current_od_time() - timedelta(hours=hours) if hours is not None else None
+
+    def _api_doms(self, query: ListQuery) -> list[Dominion]:
+        return filtered_doms(self._db, query.realm, query.min_land, query.max_land, self._since(query.max_ops_age),
+                             query.dominion)
+
+    def api_dominions(self, query: ListQuery) -> dict:
+        rows = query_dominions(self._db, query.realm, query.min_land, query.max_land, self._since(query.max_ops_age),
+                               query.dominion, query.sort, query.descending, query.after, query.limit + 1)
+        return json_page(page_result([row._asdict() for row in rows], query, (query.sort, 'code')))
+
+    def api_military(self, query: ListQuery) -> dict:
+        rows = [row for row in (self.military_summary(dom) for dom in self._api_doms(query)) if row['has_army']]
+        return json_page(keyset_page(rows, query))
+
+    def api_ratios(self, query: ListQuery) -> dict:
+        return json_page(keyset_page(self.ratio_list(self._api_doms(query)), query))
+
+    def api_stealables(self, query: ListQuery) -> dict:
+        codes = {dom.code for dom in self._api_doms(query)}
+        return json_page(keyset_page([row for row in self.stealables() if row['dominion'] in codes], query, 'dominion'))
+
+    def api_town_crier(self, query: ListQuery) -> dict:
+        return json_page(self.town_crier(query))
+
+    def api_realms(self, query: ListQuery) -> dict:
+        rows = [row for row in self.realm_totals() if query.realm is None or row['realm'] == query.realm]
+        return json_page(keyset_page(rows, query, 'realm'))
+
+    def api_realm_history(self, realm: int) -> dict:
+        return json_page({'data': self.realm_history(realm), 'next': None})
 
     # ---------------------------------------- QUERIES - Utility
 
@@ -258,8 +580,8 @@ class ODInfoFacade(object):
 
     @property
     def current_tick(self):
-        soup = get_soup_page(self.session, SEARCH_PAGE)
-        return read_tick_time(soup)
+        """Scrapes the OD tick time, at most once per tick for the whole app."""
+        return self.tick_clock.current_tick
 
     # ---------------------------------------- QUERIES - Reports
 
@@ -304,10 +626,19 @@ class ODInfoFacade(object):
             result = [dom for dom in result if dom['nwdelta'] != 0]
         return sorted(result, key=itemgetter('nwdelta'), reverse=top)
 
-    def economy(self):
-        self.update_ops(current_player_id)
+    def economy(self, update=False):
+        if update:
+            self.update_ops(current_player_id)
         return Economy(self.dominion(current_player_id))
 
+    def economy_projection(self, ticks=24) -> EconomyProjection:
+        """Projection of the economy of all dominions, calculated once per tick and set of ops."""
+        key = self._list_cache_key('projection', None, ticks)
+        return calculation_cache.get_or_compute(key, lambda: EconomyProjection(list(all_doms(self._db)), ticks).run())
+
+    def economy_forecast(self, dom_code: int, ticks=(0, 6, 12, 24)) -> list[dict]:
+        projection = self.economy_projection(max(ticks))
+        return [row for row in [projection.summary(dom_code, tick) for tick in ticks] if row]
+
     def award_stats(self):
-        # self.update_town_crier()
         return AwardStats(self._db)
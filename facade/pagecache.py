@@ -0,0 +1,55 @@
+"""
+Cache for rendered pages.
+
+Pages are keyed on the route, its arguments, the user, the data version and the OD tick (ops ages and
+deltas shift every tick). Any write to the database bumps the data version, also the writes of scripts,
+so a page is rendered again only after something was ingested. The ETag is derived from the key alone,
+so a browser that already has the current page gets a 304 without anything being rendered.
+
+Streamed pages are sent while they're rendered and are not stored: keeping them would hold the whole page
+in memory after all. They still get an ETag, so an unchanged page is a 304.
+"""
+
+import hashlib
+import uuid
+
+from domain.timeutils import current_od_tick
+from facade.calculationcache import CalculationCache
+
+PAGE_CACHE_ENTRIES = 200
+STREAM_CHUNK_SIZE = 8192  # Template output comes in tiny pieces, send it in bigger ones
+BYPASS_ARGS = {'update', 'update_all', 'send'}
+INSTANCE = uuid.uuid4().hex  # A restart can come with other templates, old ETags must not match
+
+
+def page_key(path: str, args: list[tuple], user_id, version: int) -> tuple:
+    """Key of a page for the given data version."""
+    return ('page', None, path, tuple(sorted(args)), user_id, INSTANCE, version, current_od_tick())
+
+
+def page_etag(key: tuple) -> str:
+    return hashlib.sha1(repr(key).encode()).hexdigest()
+
+
+def bypasses_cache(method: str, args: list[tuple], view_args: dict) -> bool:
+    """Requests that change data are never served from, or stored in, the cache."""
+    requested = {name for name, value in args if value} | {name for name, value in view_args.items() if value}
+    return method != 'GET' or bool(requested & BYPASS_ARGS)
+
+
+def buffered(chunks, size: int = STREAM_CHUNK_SIZE):
+    """Join the chunks of a stream into pieces of at least size characters."""
+    buffer = list()
+    length = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer.clear()
+            length = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+page_cache = CalculationCache(max_entries=PAGE_CACHE_ENTRIES)
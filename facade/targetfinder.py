@@ -0,0 +1,83 @@
+"""
+Index of all dominions sorted on land, with their estimated DP, to find targets in range.
+
+Dominions in 75%+ range are a contiguous slice of the land-sorted index, found with bisect.
+Entries are replaced one at a time when new ops come in.
+"""
+
+import logging
+from bisect import bisect_left, insort
+from collections import namedtuple
+from math import ceil
+from threading import Lock
+
+from calculators.military import land_gain
+from domain.refdata import IN_RANGE
+
+logger = logging.getLogger('od-info.targetfinder')
+
+TargetEntry = namedtuple('TargetEntry', 'land code name realm dp ops_age')
+
+
+class TargetIndex(object):
+    def __init__(self):
+        self._entries: list[TargetEntry] = list()  # Sorted on (land, code)
+        self._by_code: dict[int, TargetEntry] = dict()
+        self._lock = Lock()
+        self.tick = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, code):
+        return code in self._by_code
+
+    def _remove(self, code: int):
+        entry = self._by_code.pop(code, None)
+        if entry:
+            del self._entries[bisect_left(self._entries, entry)]
+
+    def update(self, entry: TargetEntry):
+        with self._lock:
+            self._remove(entry.code)
+            insort(self._entries, entry)
+            self._by_code[entry.code] = entry
+
+    def remove(self, code: int):
+        with self._lock:
+            self._remove(code)
+
+    def invalidate(self):
+        """Land of all dominions changed: rebuild on next use."""
+        self.tick = None
+
+    def rebuild(self, entries: list[TargetEntry], tick=None):
+        with self._lock:
+            self._entries = sorted(entries)
+            self._by_code = {entry.code: entry for entry in self._entries}
+            self.tick = tick
+
+    def in_range(self, my_land: int) -> list[TargetEntry]:
+        """All dominions with at least 75% of my land."""
+        start = bisect_left(self._entries, (ceil(my_land * IN_RANGE), ))
+        return self._entries[start:]
+
+    def targets(self, my_land: int, my_op: int, my_realm: int | None = None) -> list[dict]:
+        """Dominions in range with an estimated DP below my OP, most land gained first."""
+        candidates = [entry for entry in self.in_range(my_land)
+                      if entry.dp < my_op and entry.realm != my_realm]
+        gains = land_gain(my_land, [entry.land for entry in candidates]) if candidates else []
+        result = [{
+            'code': entry.code,
+            'name': entry.name,
+            'realm': entry.realm,
+            'land': entry.land,
+            'range': round(entry.land / my_land * 100, 1),
+            'dp': entry.dp,
+            'ops_age': entry.ops_age,
+            'land_gain': int(gain)
+        } for entry, gain in zip(candidates, gains)]
+        return sorted(result, key=lambda row: row['land_gain'], reverse=True)
+
+
+target_index = TargetIndex()
@@ -0,0 +1,106 @@
+"""
+Standing table of enemies that can break one of my realmies.
+
+Attackers are all dominions outside my realm with their 5/4 OP, defenders are my realmies with their DP.
+When ops of a dominion come in, only its row (as attacker) or column (as defender) is evaluated again,
+and the threats that appeared or went away are returned so they can be pushed out.
+"""
+
+import logging
+from collections import namedtuple
+from threading import Lock
+
+from calculators.military import land_gain
+from domain.refdata import IN_RANGE
+
+logger = logging.getLogger('od-info.threats')
+
+Threat = namedtuple('Threat', 'attacker attacker_name attacker_realm defender defender_name op dp land_gain')
+
+
+def evaluate_threat(attacker: dict, defender: dict) -> Threat | None:
+    """Attacker and defender are military summaries. A threat when the defender is in range and broken."""
+    in_range = defender['land'] >= attacker['land'] * IN_RANGE
+    if in_range and attacker['five_over_four_op'] > defender['dp']:
+        return Threat(attacker['code'], attacker['name'], attacker['realm'],
+                      defender['code'], defender['name'],
+                      attacker['five_over_four_op'], defender['dp'],
+                      int(land_gain(attacker['land'], defender['land'])))
+    return None
+
+
+class ThreatMonitor(object):
+    def __init__(self):
+        self.my_realm = None
+        self._attackers: dict[int, dict] = dict()
+        self._defenders: dict[int, dict] = dict()
+        self._threats: dict[tuple[int, int], Threat] = dict()
+        self._lock = Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.my_realm is not None
+
+    def invalidate(self):
+        """Land or realms changed for everyone: load again on next use."""
+        self.my_realm = None
+
+    def load(self, summaries: list[dict], my_realm: int):
+        with self._lock:
+            self.my_realm = my_realm
+            self._attackers = dict()
+            self._defenders = dict()
+            self._threats = dict()
+            for summary in summaries:
+                self._set(summary)
+            for attacker in self._attackers.values():
+                for defender in self._defenders.values():
+                    threat = evaluate_threat(attacker, defender)
+                    if threat:
+                        self._threats[(attacker['code'], defender['code'])] = threat
+
+    def _set(self, summary: dict):
+        code = summary['code']
+        self._attackers.pop(code, None)
+        self._defenders.pop(code, None)
+        if summary['has_army']:
+            if summary['realm'] == self.my_realm:
+                self._defenders[code] = summary
+            else:
+                self._attackers[code] = summary
+
+    def update(self, summary: dict) -> tuple[list[Threat], list[Threat]]:
+        """New ops for one dominion. Returns the threats that are new or changed, and the ones that are gone."""
+        with self._lock:
+            code = summary['code']
+            before = {key: threat for key, threat in self._threats.items() if code in key}
+            for key in before:
+                del self._threats[key]
+            self._set(summary)
+            after = dict()
+            if code in self._attackers:
+                for defender in self._defenders.values():
+                    after[(code, defender['code'])] = evaluate_threat(summary, defender)
+            elif code in self._defenders:
+                for attacker in self._attackers.values():
+                    after[(attacker['code'], code)] = evaluate_threat(attacker, summary)
+            after = {key: threat for key, threat in after.items() if threat}
+            self._threats.update(after)
+
+        changed = [threat for key, threat in after.items() if before.get(key) != threat]
+        gone = [threat for key, threat in before.items() if key not in after]
+        return changed, gone
+
+    def threats(self) -> list[Threat]:
+        return sorted(self._threats.values(), key=lambda threat: threat.land_gain, reverse=True)
+
+
+def threat_message(changed: list[Threat], gone: list[Threat]) -> str:
+    lines = [f"{threat.attacker_name} (#{threat.attacker_realm}) can hit {threat.defender_name}: "
+             f"{threat.op} OP versus {threat.dp} DP, {threat.land_gain} acres" for threat in changed]
+    lines += [f"{threat.attacker_name} (#{threat.attacker_realm}) can no longer hit {threat.defender_name}"
+              for threat in gone]
+    return '**Threats**\n' + '\n'.join(lines)
+
+
+threat_monitor = ThreatMonitor()
@@ -0,0 +1,36 @@
+"""
+The OD tick time, shared by all requests of the app.
+
+The tick time is scraped from OpenDominion.net at most once per tick. Requests that come in
+while it's being scraped wait for it instead of scraping it again.
+"""
+
+import logging
+from threading import Lock
+
+from domain.timeutils import current_od_tick
+
+logger = logging.getLogger('od-info.tickclock')
+
+
+class TickClock(object):
+    def __init__(self, read_tick_time):
+        """read_tick_time() scrapes the current ODTickTime."""
+        self._read_tick_time = read_tick_time
+        self._lock = Lock()
+        self._tick = None
+        self._tick_hour = None
+
+    def invalidate(self):
+        with self._lock:
+            self._tick_hour = None
+
+    @property
+    def current_tick(self):
+        tick_hour = current_od_tick()
+        with self._lock:
+            if self._tick_hour != tick_hour:
+                self._tick = self._read_tick_time()
+                self._tick_hour = tick_hour
+                logger.debug(f"OD tick is now {self._tick}")
+            return self._tick
@@ -9,19 +9,29 @@ Main entrypoint for the application.
 
 import os
 import sys
+import atexit
+import time
 import logging
+from functools import wraps
 import flask
-from flask import Flask, g, request, render_template, session
-from flask_login import LoginManager, login_user, login_required
+from flask import Flask, request, render_template, session, make_response
+from flask_login import LoginManager, login_user, login_required, current_user
 from flask_sqlalchemy import SQLAlchemy
 from forms import LoginForm
 
 from facade.user import load_user_by_id, load_user_by_name, User
 from domain.models import *  # Ensure all models are loaded to be able to create the db.
 
-from config import feature_toggles, OP_CENTER_URL, load_secrets, check_dirs_and_configs
+from config import feature_toggles, OP_CENTER_URL, load_secrets, check_dirs_and_configs, current_player_id
+from domain.refdata import load_ref_data
+from domain.dataaccesslayer import data_version
 from facade.odinfo import ODInfoFacade
-from facade.graphs import nw_history_graph, land_history_graph
+from facade.graphs import HISTORY_GRAPHS
+from facade.jobs import job_queue
+from facade.events import event_broker
+from facade.pagecache import page_cache, page_key, page_etag, bypasses_cache, buffered
+from facade.listapi import ApiError, list_query
+from facade.listapi import DOMINION_SORTS, MILITARY_SORTS, RATIO_SORTS, STEALABLE_SORTS, TOWN_CRIER_SORTS, REALM_SORTS
 
 # ---------------------------------------------------------------------- Flask
 
@@ -32,6 +42,12 @@ if problems:
 else:
     print("Config files OK")
 
+# ---------------------------------------------------------------------- Reference data
+
+start = time.time()
+load_ref_data()
+print(f"Reference data loaded in {(time.time() - start) * 1000:.1f} ms")
+
 # ---------------------------------------------------------------------- Flask
 
 if getattr(sys, 'frozen', False):
@@ -61,6 +77,8 @@ app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_recycle' : 280}
 db.init_app(app)
 with app.app_context():
     db.create_all()
+    create_missing_indexes(db.engine)
+    job_queue.init(db.engine, app.app_context)
 
 # ---------------------------------------------------------------------- flask_login
 
@@ -82,26 +100,62 @@ def load_user(user_id):
         return None
 
 
-# ---------------------------------------------------------------------- Facade Singleton
+# ---------------------------------------------------------------------- Facade
+
+_facade = ODInfoFacade(db)
+with app.app_context():
+    _facade.initialize()
+atexit.register(_facade.teardown)
+
 
 def facade() -> ODInfoFacade:
-    _facade = getattr(g, '_facade', None)
-    if not _facade:
-        _facade = g._facade = ODInfoFacade(db)
+    """The facade of this app process. Its database sessions are scoped to the request."""
     return _facade
 
 
+# ---------------------------------------------------------------------- Page Cache
+
+def cached_page(view):
+    """Serve the rendered page from the page cache, or a 304 when the browser already has it.
+    Streamed pages are not stored, only their ETag is checked."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if bypasses_cache(request.method, request.args.items(multi=True), kwargs):
+            return view(*args, **kwargs)
+        key = page_key(request.path, request.args.items(multi=True), current_user.get_id(), data_version(db))
+        etag = page_etag(key)
+        cached = page_cache.get(key)
+        if etag in request.if_none_match:
+            response = make_response('', 304)
+        elif cached is not None:
+            response = make_response(cached)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if not response.is_streamed:
+                page_cache.put(key, response.get_data(as_text=True))
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapper
+
+
+def stream_page(template: str, **context):
+    """Render the template while it's sent, rows and all, instead of rendering it in memory first."""
+    return app.response_class(buffered(flask.stream_template(template, **context)), mimetype='text/html')
+
+
 # ---------------------------------------------------------------------- Flask Routes
 
 @app.route('/', methods=['GET', 'POST'])
 @app.route('/dominfo/', methods=['GET', 'POST'])
 @login_required
+@cached_page
 def overview():
+    job = None
     if request.args.get('update'):
-        facade().update_dom_index()
+        job = facade().start_update('dom_index')
     elif request.args.get('update_all'):
-        facade().update_all()
-        facade().update_realmies()
+        job = facade().start_update('update_all')
     if request.method == 'POST':
         for k, v in request.form.items():
             if k.startswith('role.'):
@@ -112,9 +166,11 @@ def overview():
                 prefix, dom, old_name = k.split('.')
                 if old_name != v:
                     facade().update_player(dom, v)
-    return render_template(
+    return stream_page(
         'overview.html',
         feature_toggles=feature_toggles,
+        job=job,
+        live_updates=True,
         doms=facade().dom_list(),
         nw_deltas=facade().nw_deltas(),
         ages=facade().all_doms_ops_age())
@@ -126,7 +182,6 @@ def overview():
 def dominfo(domcode: int, update=None):
     if update == 'update':
         facade().update_ops(domcode)
-    nw_history = facade().nw_history(domcode)
     dominion = facade().dominion(domcode)
     return render_template(
         'dominfo.html',
@@ -135,34 +190,71 @@ def dominfo(domcode: int, update=None):
         military=facade().military(dominion),
         ratios=facade().ratios(dominion),
         ops_age=facade().ops_age(dominion),
-        nw_history_graph=nw_history_graph(nw_history),
-        land_history_graph=land_history_graph(nw_history),
+        history_graphs=HISTORY_GRAPHS,
         op_center_url=OP_CENTER_URL)
 
 
+@app.route('/dominfo/<domcode>/graph/<yaxis>')
+@login_required
+def history_graph(domcode: int, yaxis: str):
+    if yaxis not in HISTORY_GRAPHS:
+        flask.abort(404)
+    png, etag = facade().history_graph(domcode, yaxis)
+    response = make_response(png)
+    response.content_type = 'image/png'
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+
+@app.route('/events')
+@login_required
+def events():
+    response = flask.Response(event_broker.stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Don't let a proxy buffer the stream
+    return response
+
+
+@app.route('/jobs/<int:job_id>')
+@login_required
+def job_status(job_id: int):
+    status = facade().job_status(job_id)
+    if not status:
+        flask.abort(404)
+    return flask.jsonify(status)
+
+
 @app.route('/towncrier')
 @login_required
 def towncrier():
-    if request.args.get('update'):
-        facade().update_town_crier()
-    return render_template('towncrier.html',
-                           feature_toggles=feature_toggles,
-                           towncrier=facade().get_town_crier())
+    job = facade().start_update('town_crier') if request.args.get('update') else None
+    page = facade().town_crier(list_query(request.args, TOWN_CRIER_SORTS))
+    filters = {name: value for name, value in request.args.items() if value and name not in ('cursor', 'update')}
+    return stream_page('towncrier.html',
+                       feature_toggles=feature_toggles,
+                       job=job,
+                       towncrier=page['data'],
+                       next_page=page['next'],
+                       filters=filters,
+                       event_types=facade().town_crier_event_types())
 
 
 @app.route('/stats')
 @login_required
+@cached_page
 def stats():
-    if request.args.get('update'):
-        facade().update_town_crier()
+    job = facade().start_update('town_crier') if request.args.get('update') else None
     return render_template('stats.html',
                            feature_toggles=feature_toggles,
+                           job=job,
                            stats=facade().award_stats())
 
 
 @app.route('/nwtracker/<send>')
 @app.route('/nwtracker')
 @login_required
+@cached_page
 def nw_tracker(send=None):
     result_of_send = ''
     if send == 'send':
@@ -178,43 +270,77 @@ def nw_tracker(send=None):
 @app.route('/economy')
 @login_required
 def economy():
+    economy = facade().economy(update=request.args.get('update'))
     return render_template('economy.html',
                            feature_toggles=feature_toggles,
-                           economy=facade().economy())
+                           economy=economy,
+                           forecast=facade().economy_forecast(current_player_id))
 
 
 @app.route('/ratios')
 @login_required
+@cached_page
 def ratios():
-    return render_template('ratios.html',
-                           feature_toggles=feature_toggles,
-                           doms=facade().ratio_list())
+    return stream_page('ratios.html',
+                       feature_toggles=feature_toggles,
+                       doms=facade().ratio_list())
 
 
 @app.route('/military', defaults={'versus_op': 0})
 @app.route('/military/<versus_op>')
 @login_required
+@cached_page
 def military(versus_op: int = 0):
-    dom_list = facade().military_list(versus_op=versus_op, top=100)
-    return render_template('military.html',
+    return stream_page('military.html',
+                       feature_toggles=feature_toggles,
+                       live_updates=True,
+                       doms=facade().military_list(versus_op=versus_op, top=100),
+                       ages=facade().all_doms_ops_age(),
+                       top_op=facade().top_op(top=100),
+                       versus_op=int(versus_op),
+                       current_day=facade().current_tick.day)
+
+
+@app.route('/military/curves')
+@login_required
+def military_curves():
+    return flask.jsonify(facade().safe_op_curves(top=100))
+
+
+@app.route('/targets')
+@login_required
+def targets():
+    my_op = request.args.get('op', type=int)
+    my_land = request.args.get('land', type=int)
+    target_list, my_op, my_land = facade().find_targets(my_op, my_land)
+    return render_template('targets.html',
+                           feature_toggles=feature_toggles,
+                           targets=target_list,
+                           my_op=my_op,
+                           my_land=my_land)
+
+
+@app.route('/hitmatrix')
+@login_required
+def hit_matrix():
+    return render_template('hitmatrix.html',
                            feature_toggles=feature_toggles,
-                           doms=dom_list,
-                           ages=facade().all_doms_ops_age(),
-                           top_op=facade().top_op(dom_list),
-                           versus_op=int(versus_op),
-                           current_day=facade().current_tick.day)
+                           matrix=facade().hit_matrix())
 
 
 @app.route('/realmies')
 @login_required
+@cached_page
 def realmies():
     return render_template('realmies.html',
                            feature_toggles=feature_toggles,
-                           realmies=facade().doms_as_mil_calcs(facade().realmies()))
+                           realmies=facade().doms_as_mil_calcs(facade().realmies()),
+                           threats=facade().threats())
 
 
 @app.route('/stealables')
 @login_required
+@cached_page
 def stealables():
     return render_template('stealables.html',
                            feature_toggles=feature_toggles,
@@ -222,6 +348,91 @@ def stealables():
                            ages=facade().all_doms_ops_age())
 
 
+@app.route('/realms')
+@login_required
+@cached_page
+def realms():
+    return render_template('realms.html',
+                           feature_toggles=feature_toggles,
+                           realms=facade().realm_totals())
+
+
+@app.route('/realms/<int:realm>')
+@login_required
+@cached_page
+def realm(realm: int):
+    return render_template('realm.html',
+                           feature_toggles=feature_toggles,
+                           realm=realm,
+                           history=facade().realm_history(realm)[-48:],
+                           history_graphs=HISTORY_GRAPHS)
+
+
+@app.route('/realms/<int:realm>/graph/<yaxis>')
+@login_required
+def realm_graph(realm: int, yaxis: str):
+    if yaxis not in HISTORY_GRAPHS:
+        flask.abort(404)
+    png, etag = facade().realm_graph(realm, yaxis)
+    response = make_response(png)
+    response.content_type = 'image/png'
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+
+# ---------------------------------------------------------------------- JSON API
+# Lists with filters realm, dominion, min_land, max_land and max_ops_age (hours), sort=field or sort=-field,
+# limit and cursor (the "next" of the previous page). The Town Crier filters on event_type, realm, dominion
+# and max_age (hours) instead. Realms only filter on realm.
+
+@app.errorhandler(ApiError)
+def api_error(error):
+    return flask.jsonify({'error': str(error)}), 400
+
+
+@app.route('/api/v1/dominions')
+@login_required
+def api_dominions():
+    return flask.jsonify(facade().api_dominions(list_query(request.args, DOMINION_SORTS)))
+
+
+@app.route('/api/v1/military')
+@login_required
+def api_military():
+    return flask.jsonify(facade().api_military(list_query(request.args, MILITARY_SORTS)))
+
+
+@app.route('/api/v1/ratios')
+@login_required
+def api_ratios():
+    return flask.jsonify(facade().api_ratios(list_query(request.args, RATIO_SORTS)))
+
+
+@app.route('/api/v1/stealables')
+@login_required
+def api_stealables():
+    return flask.jsonify(facade().api_stealables(list_query(request.args, STEALABLE_SORTS)))
+
+
+@app.route('/api/v1/towncrier')
+@login_required
+def api_town_crier():
+    return flask.jsonify(facade().api_town_crier(list_query(request.args, TOWN_CRIER_SORTS)))
+
+
+@app.route('/api/v1/realms')
+@login_required
+def api_realms():
+    return flask.jsonify(facade().api_realms(list_query(request.args, REALM_SORTS)))
+
+
+@app.route('/api/v1/realms/<int:realm>/history')
+@login_required
+def api_realm_history(realm: int):
+    return flask.jsonify(facade().api_realm_history(realm))
+
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     form = LoginForm(request.form)
@@ -251,13 +462,6 @@ def login():
     return flask.render_template('login.html', form=form)
 
 
-@app.teardown_appcontext
-def teardown_app(exception):
-    facade = getattr(g, '_facade', None)
-    if facade:
-        facade.teardown()
-
-
 if __name__ == '__main__':
     print("Starting Server...")
     app.run()
@@ -6,21 +6,24 @@ import logging
 
 from opsdata.ops import grab_search
 from domain.timeutils import cleanup_timestamp
-from domain.dataaccesslayer import all_doms, dom_by_id
+from domain.dataaccesslayer import all_doms, dom_by_id, bump_data_version, add_ops_queues
+from domain.dataaccesslayer import town_crier_keys_at, count_awards, awards_missing, recount_awards, count_realm_land
 from domain.models import Dominion, DominionHistory, TownCrier
 from facade.towncrier import get_number_of_tc_pages, get_tc_page
-from domain.models import (ClearSight, CastleSpy, BarracksSpy,
-                           SurveyDominion, LandSpy, Vision, Revelation)
-from sqlalchemy import text
+from domain.models import ClearSight, CastleSpy, BarracksSpy, SurveyDominion, LandSpy, Vision, Revelation
+from sqlalchemy import text, func
 
 logger = logging.getLogger('od-info.updater')
 
 # ---------------------------------------------------------------------- Updaters Ops => DB
 
 
-def update_dom_index(session, db):
+def update_dom_index(session, db, progress=None):
     doms = {d.code: d for d in all_doms(db)}
-    for code, line in grab_search(session).items():
+    search = grab_search(session)
+    if progress:
+        progress.start(len(search))
+    for code, line in search.items():
         timestamp = cleanup_timestamp(line['timestamp'])
         if code not in doms:
             dom = Dominion(code=int(line['code']),
@@ -36,7 +39,10 @@ def update_dom_index(session, db):
                              land=int(line['land']),
                              networth=int(line['networth']))
         dom.history.append(dh)
+        bump_data_version(db)
         db.session.commit()
+        if progress:
+            progress.advance()
 
 
 def update_dominion(ops, db):
@@ -50,6 +56,7 @@ def update_dominion(ops, db):
     dh = DominionHistory(dominion_id=dom.code, timestamp=timestamp, land=ops.land, networth=ops.networth)
     dom.history.append(dh)
 
+    bump_data_version(db)
     session.commit()
 
 
@@ -72,6 +79,7 @@ def update_obj(ops, obj, mapping):
 
 
 def update_ops(ops, db, dom_code):
+    """Stores the new ops and flushes them. The caller commits, after what it derives from them."""
     logger.debug("Updating ops for dominion %s", dom_code)
     timestamp = ops.timestamp
     dom = dom_by_id(db, dom_code)
@@ -96,6 +104,7 @@ def update_ops(ops, db, dom_code):
             obj = BarracksSpy(dominion_id=dom_code, timestamp=timestamp)
             update_obj(ops, obj, BARRACKS_SPY_MAPPING)
             db.session.add(obj)
+            add_ops_queues(db, obj, training=obj.training, returning=obj.returning)
             dom.add_last_op(timestamp)
         else:
             logger.debug(f"Already had Barracks Spy for {dom_code} at {timestamp}")
@@ -104,6 +113,7 @@ def update_ops(ops, db, dom_code):
             obj = SurveyDominion(dominion_id=dom_code, timestamp=timestamp)
             update_obj(ops, obj, SURVEY_DOMINION_MAPPING)
             db.session.add(obj)
+            add_ops_queues(db, obj, constructing=obj.constructing)
             dom.add_last_op(timestamp)
         else:
             logger.debug(f"Already had SurveyDominion for {dom_code} at {timestamp}")
@@ -112,6 +122,7 @@ def update_ops(ops, db, dom_code):
             obj = LandSpy(dominion_id=dom_code, timestamp=timestamp)
             update_obj(ops, obj, LAND_SPY_MAPPING)
             db.session.add(obj)
+            add_ops_queues(db, obj, incoming=obj.incoming)
             dom.add_last_op(timestamp)
         else:
             logger.debug(f"Already had LandSpy for {dom_code} at {timestamp}")
@@ -125,27 +136,56 @@ def update_ops(ops, db, dom_code):
             logger.debug(f"Already had Vision for {dom_code} at {timestamp}")
     if ops.has_revelation:
         update_revelation(db, ops, dom)
-    db.session.commit()
-
-
-def update_town_crier(session, db):
-    logger.debug("Updating all TC records.")
-    db.session.query(TownCrier).delete()
-    db.session.commit()
-
-    for page_nr in range(1, get_number_of_tc_pages(session) + 1):
-        events = get_tc_page(session, page_nr)
-        for event in events:
+    db.session.flush()
+    # The ops relationships of the dominion are loaded again, with the new ops
+    db.session.expire_all()
+
+
+def update_town_crier(session, db, progress=None) -> int:
+    """Adds the Town Crier events that are newer than the ones we have, and counts them in the award totals
+    and the land gained and lost by realms.
+    The Town Crier pages go from new to old, so it stops at the first page with an event we already have.
+    Returns the number of new events."""
+    logger.debug("Updating TC records.")
+    latest = db.session.scalar(db.select(func.max(TownCrier.timestamp)))
+    known = town_crier_keys_at(db, latest) if latest else set()
+    if awards_missing(db):
+        recount_awards(db)
+
+    number_of_pages = get_number_of_tc_pages(session)
+    if progress:
+        progress.start(number_of_pages)
+    new_events = dict()
+    for page_nr in range(1, number_of_pages + 1):
+        reached_known = False
+        for event in get_tc_page(session, page_nr):
             tc_event = TownCrier(timestamp=cleanup_timestamp(event[0]),
-                              origin=event[2],
-                              origin_name=event[3],
-                              target=event[4],
-                              target_name=event[5],
-                              event_type=event[1],
-                              amount=event[6],
-                              text=event[7])
-            db.session.add(tc_event)
-        db.session.commit()
+                                 origin=event[2],
+                                 origin_name=event[3],
+                                 target=event[4],
+                                 target_name=event[5],
+                                 event_type=event[1],
+                                 amount=event[6],
+                                 text=event[7])
+            origin = int(event[2]) if event[2].strip().isdigit() else event[2]
+            target = int(event[4]) if event[4].strip().isdigit() else event[4]
+            key = (tc_event.timestamp, origin, tc_event.event_type, target)
+            if latest and (tc_event.timestamp < latest or key in known):
+                reached_known = True
+            else:
+                # Events shift to the next page while we're reading, the same event can show up twice
+                new_events.setdefault(key, tc_event)
+        if progress:
+            progress.advance()
+        if reached_known:
+            break
+    db.session.add_all(new_events.values())
+    count_awards(db, new_events.values())
+    count_realm_land(db, new_events.values())
+    bump_data_version(db)
+    db.session.commit()
+    logger.debug(f"Added {len(new_events)} TC records.")
+    return len(new_events)
 
 
 """
@@ -204,24 +244,29 @@ CLEARSIGHT_MAPPING = {
 
 qry_stealables = """
 select
-    max(c.timestamp),
+    c.timestamp,
     c.dominion,
     d.name,
     c.land,
     c.resource_platinum as platinum,
     c.resource_food as food,
-    c.resource_gems as gems,
+    c.resource_lumber as lumber,
     c.resource_mana as mana,
-    c.resource_lumber as lumber
+    c.resource_ore as ore,
+    c.resource_gems as gems
 from
-    ClearSight c,
+    (select
+        *,
+        row_number() over (partition by dominion order by timestamp desc) as recency
+    from
+        ClearSight
+    where
+        (timestamp > :timestamp)) c,
     Dominions d
 where
     (c.dominion = d.code)
+    and (c.recency = 1)
     and (d.realm != :realm)
-    and (c.timestamp > :timestamp)
-group by
-    c.dominion
 order by
     c.resource_platinum desc,
     c.resource_food desc,
@@ -269,7 +314,7 @@ BARRACKS_SPY_MAPPING = {
     'home_unit3': 'barracks.units.home.unit3',
     'home_unit4': 'barracks.units.home.unit4',
     'training':   'barracks.units.training|optional',
-    'return':     'barracks.units.returning|optional',
+    'returning':  'barracks.units.returning|optional',
 }
 
 # ------------------------------------------------------------ LandSpy
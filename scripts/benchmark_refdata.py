@@ -0,0 +1,39 @@
+"""
+Compares cold start time of parsing the ref-data YAML with loading the compiled bundle.
+
+Run from the root of the project:
+
+    python -m scripts.benchmark_refdata
+"""
+
+import os
+import tempfile
+import timeit
+
+from domain.refdata import _parse_ref_data, _read_bundle, write_ref_data_bundle, ref_data_version, _REF_DATA_VERSION
+
+REPEAT = 5
+
+
+def uncached_ref_data_version():
+    _REF_DATA_VERSION.update(signature=None, checked=0.0)
+    return ref_data_version()
+
+
+def benchmark():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bundle_file = os.path.join(tmp_dir, 'ref-data.marshal')
+        write_ref_data_bundle(bundle_file)
+
+        yaml_time = min(timeit.repeat(_parse_ref_data, number=1, repeat=REPEAT))
+        hash_time = min(timeit.repeat(uncached_ref_data_version, number=1, repeat=REPEAT))
+        bundle_time = min(timeit.repeat(lambda: _read_bundle(bundle_file), number=1, repeat=REPEAT))
+
+    print(f"Parse YAML:        {yaml_time * 1000:8.1f} ms")
+    print(f"Content hash:      {hash_time * 1000:8.1f} ms")
+    print(f"Load bundle:       {bundle_time * 1000:8.1f} ms")
+    print(f"Speedup:           {yaml_time / (bundle_time + hash_time):8.1f}x")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -1,7 +1,7 @@
-import yaml
 import os
-from config import REF_DATA_DIR, OUT_DIR
+from config import OUT_DIR
 from dataclasses import dataclass, astuple
+from domain.refdata import load_ref_data
 
 
 @dataclass
@@ -20,11 +20,8 @@ class Unit(object):
 
 
 units = list()
-race_dir = os.path.join(REF_DATA_DIR, 'races')
-for filename in os.listdir(race_dir):
-    with open(os.path.join(race_dir, filename)) as f:
-        race = yaml.safe_load(f)
-
+races = [ref for key, ref in load_ref_data().items() if key.startswith('races/')]
+for race in races:
     for u in race['units']:
         cost = u['cost']
         perks = ''
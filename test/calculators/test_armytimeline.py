@@ -0,0 +1,62 @@
+import unittest
+from datetime import timedelta
+
+from calculators.armytimeline import ArmyTimeline, ArmyTimelines
+from calculators.military import MilitaryCalculator
+from domain.domainhelper import Queue
+from domain.models import Dominion, BarracksSpy
+from domain.timeutils import current_od_time
+from test.fixtures import create_db_session, init_db
+
+
+class ArmyTimelineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.session = create_db_session()
+        init_db(self.session)
+        self.dom = self.session.get(Dominion, 1)
+        # Ops of an hour ago: unit 3 training of 100 in 4 ticks and 99 in 6 ticks is still pending, on top of 10 home
+        self.origin = current_od_time().replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+        self.dom.last_barracks.timestamp = self.origin
+        self.dom.last_cs.timestamp = self.origin
+
+    def forecast(self, ticks=(0, 6, 12)):
+        return ArmyTimelines([ArmyTimeline(self.dom)]).dp_forecast(ticks)[self.dom.code]
+
+    def test_dp_rises_when_training_arrives(self):
+        forecast = self.forecast((0, 3, 5, 12))
+        self.assertLess(forecast[0], forecast[3])
+        self.assertLess(forecast[3], forecast[5])
+        self.assertEqual(forecast[5], forecast[12])
+
+    def test_dp_after_queues_is_military_dp(self):
+        self.assertEqual(MilitaryCalculator(self.dom).dp, self.forecast()[12])
+
+    def test_dp_after_queues_is_military_dp_from_bs(self):
+        self.dom.last_cs.timestamp = self.origin - timedelta(hours=2)
+        self.assertEqual(MilitaryCalculator(self.dom).dp, self.forecast()[12])
+
+    def test_dp_after_queues_is_military_dp_with_pairing(self):
+        self.dom.race = 'Kobold'
+        self.assertEqual(MilitaryCalculator(self.dom).dp, self.forecast()[12])
+
+    def test_training_arrives(self):
+        timelines = ArmyTimelines([ArmyTimeline(self.dom)])
+        self.assertEqual(10, timelines.army_at(3, self.origin)[0, 3])
+        self.assertEqual(110, timelines.army_at(4, self.origin)[0, 3])
+        self.assertEqual(209, timelines.army_at(6, self.origin)[0, 3])
+
+    def test_cs_counts_returning_units(self):
+        self.dom.last_cs.military_unit4 = 100
+        self.dom.last_barracks.returning_queue = Queue.from_json({'unit4': {'3': 50}})
+        timelines = ArmyTimelines([ArmyTimeline(self.dom)])
+        self.assertEqual(50, timelines.army_at(2, self.origin)[0, 4])
+        self.assertEqual(100, timelines.army_at(3, self.origin)[0, 4])
+        self.assertEqual(MilitaryCalculator(self.dom).dp, self.forecast()[12])
+
+    def test_returning_after_bs_arrives(self):
+        self.dom.last_cs.timestamp = self.origin - timedelta(hours=2)
+        self.dom.last_barracks.returning_queue = Queue.from_json({'unit4': {'3': 100}})
+        timelines = ArmyTimelines([ArmyTimeline(self.dom)])
+        home = 10 / BarracksSpy.BS_UNCERTAINTY
+        self.assertAlmostEqual(home, timelines.army_at(2, self.origin)[0, 4])
+        self.assertAlmostEqual(home + 100 * BarracksSpy.BS_UNCERTAINTY, timelines.army_at(3, self.origin)[0, 4])
@@ -0,0 +1,25 @@
+import unittest
+
+from calculators.hitmatrix import HitMatrix
+
+
+def summary(code, land, op=0, dp=0):
+    return {'code': code, 'name': f'Dom {code}', 'realm': code % 10, 'land': land,
+            'max_sendable_op': op, 'dp': dp, 'ops_age': 0}
+
+
+class HitMatrixTestCase(unittest.TestCase):
+    def setUp(self):
+        attackers = [summary(1, 1000, op=50000), summary(2, 2000, op=80000)]
+        targets = [summary(11, 1000, dp=40000), summary(12, 1600, dp=60000), summary(13, 3000, dp=100000)]
+        self.matrix = HitMatrix(attackers, targets)
+
+    def test_feasibility(self):
+        self.assertEqual([[True, False, False], [False, True, False]], self.matrix.feasible.tolist())
+        self.assertEqual([[True, True, True], [False, True, True]], self.matrix.in_range.tolist())
+
+    def test_report(self):
+        report = self.matrix.report()
+        self.assertEqual([12, 11], [target['code'] for target in report['targets']])
+        self.assertEqual([0, 82], report['targets'][0]['land_gain'])
+        self.assertEqual([60, 0], report['targets'][1]['land_gain'])
@@ -1,6 +1,6 @@
 import unittest
 
-from calculators.military import MilitaryCalculator
+from calculators.military import MilitaryCalculator, evaluate_safe_op_curve
 from domain.models import Dominion
 from test.fixtures import create_db_session, init_db
 
@@ -37,6 +37,35 @@ class MilitaryCalculatorTestCase(unittest.TestCase):
         self.assertEqual(116, mc.dp)
         self.assertEqual(mc.five_over_four, (122, 98))
 
+    def test_unit_stat_table(self):
+        mc = MilitaryCalculator(self.dom)
+        self.assertEqual([1], mc.units.pure_offense)
+        self.assertEqual([2], mc.units.pure_defense)
+        self.assertEqual([3, 4], mc.units.hybrids_by_dp)
+        self.assertEqual([4, 3], mc.units.hybrids_by_op_over_dp)
+        self.assertEqual('Cleric', mc.unit_type(3).name)
+
+    def test_partial_amount(self):
+        mc = MilitaryCalculator(self.dom)
+        for nr in (3, 4):
+            self.assertEqual(0, mc.op_of(nr, partial_amount=0))
+            self.assertEqual(0, mc.dp_of(nr, with_bonus=True, partial_amount=0))
+            self.assertEqual(mc.op_of(nr), mc.op_of(nr, partial_amount=mc.amount(nr)))
+            self.assertEqual(mc.dp_of(nr), mc.dp_of(nr, partial_amount=mc.amount(nr)))
+
+    def test_safe_op_versus(self):
+        mc = MilitaryCalculator(self.dom)
+        self.assertEqual((144, 44), mc.safe_op_versus(0))
+        self.assertEqual((30, 116), mc.safe_op_versus(1000))
+
+    def test_safe_op_curve(self):
+        mc = MilitaryCalculator(self.dom)
+        curve = mc.safe_op_curve
+        self.assertEqual([(44, 144, 44), (94, 103, 94), (116, 30, 116)], curve)
+        self.assertEqual(mc.safe_op_versus(0), evaluate_safe_op_curve(curve, 0))
+        self.assertEqual(mc.safe_op_versus(1000), evaluate_safe_op_curve(curve, 1000))
+        self.assertEqual((114, 80), evaluate_safe_op_curve(curve, 80))
+
 
 if __name__ == '__main__':
     unittest.main()
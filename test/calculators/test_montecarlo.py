@@ -0,0 +1,67 @@
+import unittest
+from datetime import timedelta
+
+import numpy as np
+
+from calculators.montecarlo import InvasionSimulator, ArmyEstimate, army_estimate
+from domain.models import Dominion
+from domain.timeutils import current_od_time
+from test.fixtures import create_db_session, init_db
+
+
+def estimate(code, op, dp, uncertainty=0.0, ares_probability=0.0, draftees=0):
+    """Army of 100 units with the given OP and DP per unit and no bonuses."""
+    return ArmyEstimate(code, np.array([draftees, 100, 0, 0, 0], dtype=float), np.zeros(5),
+                        np.array([0, op, 0, 0, 0]), np.array([1, dp, 0, 0, 0]),
+                        0, 0, uncertainty, ares_probability)
+
+
+class InvasionSimulatorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.simulator = InvasionSimulator(trials=4000, seed=42)
+
+    def test_certain_outcomes(self):
+        attacker = estimate(1, 5, 0, draftees=1000)
+        chances = self.simulator.hit_probability([attacker], [estimate(2, 0, 4), estimate(3, 0, 6)])
+        self.assertEqual([[1.0, 0.0]], chances.tolist())
+
+    def test_ares_decides(self):
+        # 500 OP against 480 DP, or 528 DP with Ares up half of the time
+        chance = self.simulator.hit_probability([estimate(1, 5, 0, draftees=1000)],
+                                                [estimate(2, 0, 4.8, ares_probability=0.5)])
+        self.assertAlmostEqual(0.5, chance[0, 0], delta=0.05)
+
+    def test_uncertainty_spreads_outcomes(self):
+        chance = self.simulator.hit_probability([estimate(1, 5, 0, uncertainty=0.15, draftees=1000)],
+                                                [estimate(2, 0, 5, uncertainty=0.15)])
+        self.assertAlmostEqual(0.5, chance[0, 0], delta=0.05)
+
+    def test_estimate_from_ops(self):
+        session = create_db_session()
+        init_db(session)
+        dom = session.get(Dominion, 1)
+        army = army_estimate(dom)
+        self.assertEqual(1.0, army.ares_probability)
+        self.assertAlmostEqual(0.15, army.uncertainty)
+        self.assertEqual(10, army.amounts[0])
+
+    def test_op_capped_at_five_over_four(self):
+        # 500 OP with 200 DP at home: only 250 OP can be sent
+        op = self.simulator.op_samples([estimate(1, 5, 0, draftees=200)])
+        self.assertTrue(np.allclose(250, op))
+
+    def test_hybrids_sent_in_part(self):
+        # 100 units of 5/3: sending x of them leaves 300 - 3x DP at home, 5x = 5/4 * (300 - 3x) at x = 42.86
+        op = self.simulator.op_samples([estimate(1, 5, 3)])
+        self.assertTrue(np.allclose(5 * 375 / 8.75, op))
+
+    def test_estimate_from_raw_bs_counts(self):
+        session = create_db_session()
+        init_db(session)
+        dom = session.get(Dominion, 1)
+        dom.last_barracks.timestamp = current_od_time() - timedelta(hours=1)
+        dom.last_cs.timestamp = current_od_time() - timedelta(hours=2)
+        army = army_estimate(dom)
+        self.assertEqual([10, 10, 10, 10, 10], army.amounts.tolist())
+        self.assertEqual(199, army.training[3])
+        self.assertAlmostEqual(0.15, army.uncertainty)
@@ -0,0 +1,33 @@
+import unittest
+
+from calculators.projection import EconomyProjection
+from domain.models import Dominion
+from test.fixtures import create_db_session, init_db
+
+
+class EconomyProjectionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.session = create_db_session()
+        init_db(self.session)
+        self.dom = self.session.get(Dominion, 1)
+        self.projection = EconomyProjection([self.dom], ticks=24, max_ops_age=1000).run()
+
+    def test_start_from_ops(self):
+        self.assertEqual(10, self.projection.ops_age[0])
+        at_ops = self.projection.summary(self.dom.code, -10)
+        self.assertEqual(1100, at_ops['platinum'])
+        self.assertEqual(20, at_ops['peasants'])
+        self.assertEqual(self.dom.buildings.total_capacity, at_ops['capacity'])
+
+    def test_construction_finishes(self):
+        self.assertEqual(20, self.projection.summary(self.dom.code, -5)['constructing'])
+        self.assertEqual(0, self.projection.summary(self.dom.code, -4)['constructing'])
+
+    def test_platinum_production(self):
+        # (20 employed peasants * 2.7 + 50 alchemies * 45) * 110% for science
+        first_tick = self.projection.summary(self.dom.code, -9)
+        self.assertEqual(1100 + 2534, first_tick['platinum'])
+
+    def test_old_ops_not_projected(self):
+        projection = EconomyProjection([self.dom], ticks=24, max_ops_age=5).run()
+        self.assertIsNone(projection.summary(self.dom.code))
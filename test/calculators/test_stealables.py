@@ -0,0 +1,44 @@
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from calculators.projection import EconomyProjection
+from calculators.stealables import rank_stealables, haul_per_op
+from config import DATE_TIME_FORMAT
+from domain.models import Dominion, ClearSight
+from opsdata.updater import query_stealables
+from test.fixtures import create_db_session, init_db, FakeDB
+
+
+class StealablesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.session = create_db_session()
+        init_db(self.session)
+        self.dom = self.session.get(Dominion, 1)
+        older_cs = ClearSight(land=100, peasants=20, networth=10001, prestige=300, resource_platinum=999999,
+                              timestamp=self.dom.last_cs.timestamp - timedelta(hours=1))
+        self.dom.clear_sight.append(older_cs)
+        self.session.commit()
+        self.since = (datetime.now() - timedelta(hours=12)).strftime(DATE_TIME_FORMAT)
+
+    def test_query_selects_latest_cs(self):
+        rows = list(query_stealables(FakeDB(self.session), self.since, 99))
+        self.assertEqual(1, len(rows))
+        self.assertEqual(1100, rows[0].platinum)
+
+    def test_query_skips_own_realm(self):
+        self.assertEqual([], list(query_stealables(FakeDB(self.session), self.since, 10)))
+
+    def test_haul_per_op(self):
+        amounts = np.array([[100000, 0, 0, 0, 0, 0]])
+        self.assertEqual(2000, haul_per_op(amounts, None)[0, 0])
+        self.assertEqual(450, haul_per_op(amounts, 10)[0, 0])
+
+    def test_rank_projected(self):
+        projection = EconomyProjection([self.dom], ticks=0, max_ops_age=1000).run()
+        rows = list(query_stealables(FakeDB(self.session), self.since, 99))
+        result = rank_stealables(rows, projection)
+        self.assertTrue(result[0]['projected'])
+        self.assertEqual(int(projection.projected('platinum')[0]), result[0]['platinum'])
+        self.assertEqual(int(result[0]['platinum'] * 0.02), result[0]['platinum_per_op'])
@@ -0,0 +1,174 @@
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from domain.dataaccesslayer import doms_by, query_dominions, filtered_doms, query_town_crier_page, town_crier_event_types
+from domain.dataaccesslayer import count_awards, awards_missing, recount_awards, data_version, bump_data_version
+from domain.dataaccesslayer import realm_snapshot, store_realm_totals, count_realm_land, realm_totals, realm_history
+from domain.models import Dominion, DominionHistory, TownCrier, DominionAwards, RealmAwards, RealmHistory, DataVersion
+from facade.listapi import list_query, keyset_page, page_result, decode_cursor, DOMINION_SORTS, ApiError
+from domain import dataaccesslayer
+from test.fixtures import create_db_session, FakeDB
+
+
+class ListQueriesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.session = create_db_session()
+        self.now = datetime(2023, 8, 10, 12)
+        for code, realm, land in [(1, 1, 500), (2, 1, 800), (3, 2, 800), (4, 2, 1200), (5, 3, 300)]:
+            dom = Dominion(code=code, name=f'Dom {code}', realm=realm, race='Human', last_op=self.now)
+            dom.history.append(DominionHistory(timestamp=self.now - timedelta(days=1), land=100, networth=1000))
+            dom.history.append(DominionHistory(timestamp=self.now, land=land, networth=land * 40))
+            self.session.add(dom)
+        for hour in range(5):
+            self.session.add(TownCrier(timestamp=self.now - timedelta(hours=hour), origin=3, origin_name='Dom 3',
+                                       target=hour % 2 + 1, target_name='', event_type='invasion', amount=10, text=''))
+        self.session.add(TownCrier(timestamp=self.now, origin=5, origin_name='Dom 5', target=4, target_name='',
+                                   event_type='war_declared', amount=0, text=''))
+        self.session.commit()
+        self.db = FakeDB(self.session)
+
+    def test_filters_on_current_land(self):
+        self.assertEqual({2, 3}, {dom.code for dom in filtered_doms(self.db, min_land=600, max_land=1000)})
+        self.assertEqual({1, 2}, {dom.code for dom in filtered_doms(self.db, realm=1)})
+
+    def test_doms_by(self):
+        self.assertEqual([4, 2, 3, 1, 5], [dom.code for dom in doms_by(self.db, 'land')])
+        self.assertEqual([4, 2], [dom.code for dom in doms_by(self.db, 'networth', limit=2)])
+
+    def test_realm_rollups(self):
+        self.assertEqual([(1, 2, 1300, 52000), (2, 2, 2000, 80000)],
+                         [tuple(row) for row in realm_snapshot(self.db, [1, 2])])
+        tick = self.now.replace(minute=0)
+        store_realm_totals(self.db, tick, [row._asdict() for row in realm_snapshot(self.db)])
+        count_realm_land(self.db, self.session.scalars(select(TownCrier)).all())
+        self.session.commit()
+        totals = {row['realm']: row for row in realm_totals(self.db, self.now - timedelta(hours=3))}
+        self.assertEqual((1300, 0, 40), (totals[1]['land'], totals[1]['land_gained'], totals[1]['land_lost']))
+        self.assertEqual((2000, 40, 0), (totals[2]['land'], totals[2]['land_gained'], totals[2]['land_lost']))
+        self.assertEqual([None, None, 2000], [row.land for row in realm_history(self.db, 2)][-3:])
+
+    def test_keyset_pages(self):
+        query = list_query({'limit': '2'}, DOMINION_SORTS)
+        codes = list()
+        while True:
+            rows = query_dominions(self.db, sort=query.sort, descending=query.descending, after=query.after,
+                                   limit=query.limit + 1)
+            page = page_result([row._asdict() for row in rows], query, (query.sort, 'code'))
+            codes += [row['code'] for row in page['data']]
+            if not page['next']:
+                break
+            query = query._replace(after=decode_cursor(page['next']))
+        self.assertEqual([4, 3, 2, 1, 5], codes)
+
+    def test_keyset_page_of_calculated_rows(self):
+        rows = [{'code': code, 'land': land} for code, land in [(1, 500), (2, 800), (3, 800), (4, None)]]
+        query = list_query({'sort': 'land', 'limit': '2'}, DOMINION_SORTS)
+        page = keyset_page(rows, query)
+        self.assertEqual([1, 2], [row['code'] for row in page['data']])
+        page = keyset_page(rows, query._replace(after=decode_cursor(page['next'])))
+        self.assertEqual([3], [row['code'] for row in page['data']])
+        self.assertIsNone(page['next'])
+
+    def test_town_crier_page(self):
+        events = query_town_crier_page(self.db, event_type='invasion', dominion=2, limit=5)
+        self.assertEqual([self.now - timedelta(hours=1), self.now - timedelta(hours=3)],
+                         [event.timestamp for event in events])
+        events = query_town_crier_page(self.db, realm=3)
+        self.assertEqual(['war_declared'], [event.event_type for event in events])
+        first = query_town_crier_page(self.db, event_type='invasion', limit=2)
+        key = (first[-1].timestamp, first[-1].origin, first[-1].target, first[-1].event_type)
+        rest = query_town_crier_page(self.db, event_type='invasion', after=key)
+        self.assertEqual(3, len(rest))
+        self.assertTrue(all(event.timestamp < first[-1].timestamp for event in rest))
+
+    def test_town_crier_time_range(self):
+        events = query_town_crier_page(self.db, since=self.now - timedelta(hours=3), until=self.now)
+        self.assertEqual(3, len(events))
+        self.assertEqual(['invasion', 'war_declared'], town_crier_event_types(self.db))
+
+    def test_bad_arguments(self):
+        self.assertRaises(ApiError, list_query, {'sort': 'race'}, DOMINION_SORTS)
+        self.assertRaises(ApiError, list_query, {'limit': 'all'}, DOMINION_SORTS)
+        self.assertRaises(ApiError, list_query, {'cursor': '!!'}, DOMINION_SORTS)
+
+
+class AwardTotalsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.session = create_db_session()
+        self.db = FakeDB(self.session)
+        self.now = datetime(2023, 8, 10, 12)
+
+    def event(self, minutes, event_type, origin, target, amount=''):
+        return TownCrier(timestamp=self.now + timedelta(minutes=minutes), origin=str(origin),
+                         origin_name=f'Dom {origin}', target=str(target), target_name=f'Dom {target}',
+                         event_type=event_type, amount=amount, text='')
+
+    def test_counted_incrementally(self):
+        self.assertFalse(awards_missing(self.db))
+        events = [self.event(0, 'invasion', 1, 2, '50'), self.event(1, 'bounce', 2, 1),
+                  self.event(2, 'war_declare', 7, 8), self.event(3, 'abandon', 3, 7)]
+        self.session.add_all(events)
+        self.assertTrue(awards_missing(self.db))
+        count_awards(self.db, events)
+        self.session.commit()
+        more = [self.event(4, 'invasion', 1, 2, '30')]
+        count_awards(self.db, more)
+        self.session.commit()
+        attacker, defender = self.session.get(DominionAwards, 1), self.session.get(DominionAwards, 2)
+        self.assertEqual((2, 80, 0, 1), (attacker.hits_done, attacker.land_done, attacker.bounces_done,
+                                         attacker.bounces_taken))
+        self.assertEqual((2, 80, 1), (defender.hits_taken, defender.land_taken, defender.bounces_done))
+        self.assertEqual(7, self.session.get(DominionAwards, 3).abandoned_realm)
+        self.assertEqual(1, self.session.get(RealmAwards, 7).war_declarations)
+        self.assertEqual(1, self.session.get(RealmAwards, 8).declared_on)
+
+    def test_hits_move_land(self):
+        events = [self.event(0, 'invasion', 1, 2, '40'), self.event(1, 'invasion', 1, 2, ''),
+                  self.event(2, 'bounce', 1, 2), self.event(3, 'war_declare', 1, 2)]
+        count_awards(self.db, events)
+        self.session.commit()
+        self.assertEqual((1, 40), (self.session.get(DominionAwards, 1).hits_done,
+                                   self.session.get(DominionAwards, 1).land_done))
+        self.assertEqual((1, 40), (self.session.get(DominionAwards, 2).hits_taken,
+                                   self.session.get(DominionAwards, 2).land_taken))
+
+    def test_recount(self):
+        events = [self.event(minute, 'invasion', 1, 2, '10') for minute in range(3)]
+        self.session.add_all(events)
+        count_awards(self.db, events[:1])
+        self.session.commit()
+        recount_awards(self.db)
+        self.session.commit()
+        self.assertEqual(30, self.session.get(DominionAwards, 1).land_done)
+
+
+class DataVersionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeDB(create_db_session())
+        dataaccesslayer._DATA_VERSION.update(version=None, checked=0.0)
+
+    def tearDown(self):
+        dataaccesslayer._DATA_VERSION.update(version=None, checked=0.0)
+
+    def test_bumped_in_the_callers_transaction(self):
+        self.assertEqual(0, data_version(self.db))
+        self.assertEqual(1, bump_data_version(self.db))
+        self.db.session.rollback()
+        self.assertEqual(0, data_version(self.db))
+        bump_data_version(self.db)
+        self.assertEqual(2, bump_data_version(self.db))
+        self.db.session.commit()
+        self.assertEqual(2, data_version(self.db))
+        self.assertEqual(2, self.db.session.scalar(select(DataVersion.version)))
+
+    def test_external_writes_seen_after_interval(self):
+        bump_data_version(self.db)
+        self.db.session.commit()
+        self.assertEqual(1, data_version(self.db))
+        self.db.session.execute(update(DataVersion).values(version=10))
+        self.db.session.commit()
+        self.assertEqual(1, data_version(self.db))
+        dataaccesslayer._DATA_VERSION['checked'] -= dataaccesslayer.DATA_VERSION_CHECK_INTERVAL
+        self.assertEqual(10, data_version(self.db))
@@ -0,0 +1,59 @@
+import unittest
+
+from sqlalchemy import delete
+
+from domain.models import Dominion, OpsQueue, OpsQueueTotal
+from domain.dataaccesslayer import add_ops_queues, backfill_ops_queues
+from test.fixtures import create_db_session, init_db, FakeDB
+
+
+class OpsQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.session = create_db_session()
+        init_db(self.session)
+        self.dom = self.session.get(Dominion, 1)
+
+    def test_typed_rows(self):
+        bs = self.dom.last_barracks
+        self.assertEqual(3, len([row for row in bs.queue_rows if row.queue == 'training']))
+        self.assertEqual(2, len([row for row in bs.queue_totals if row.queue == 'training']))
+        self.assertEqual(199, bs.amount_training(3))
+        self.assertEqual(10, bs.training_queue.total('spies'))
+        self.assertEqual(6, bs.training_queue.last_tick('unit3'))
+        self.assertEqual(0, bs.amount_returning(3))
+        self.assertEqual(20, self.dom.buildings.constructing)
+        self.assertEqual(20, self.dom.land.incoming)
+
+    def test_empty_queue_does_not_fall_back_to_json(self):
+        self.session.execute(delete(OpsQueue))
+        self.session.execute(delete(OpsQueueTotal))
+        self.session.commit()
+        self.session.expire_all()
+        bs = self.dom.last_barracks
+        self.assertEqual({"4": 100, "6": 99}, bs.training['unit3'])
+        self.assertEqual(0, bs.amount_training(3))
+        self.assertEqual(0, self.dom.buildings.constructing)
+
+    def test_backfill(self):
+        self.session.execute(delete(OpsQueueTotal))
+        self.session.commit()
+        db = FakeDB(self.session)
+        self.assertEqual(3, backfill_ops_queues(db))
+        self.session.commit()
+        self.assertEqual(0, backfill_ops_queues(db))
+        self.assertEqual(7, self.session.query(OpsQueue).count())
+        self.assertEqual(5, self.session.query(OpsQueueTotal).count())
+        self.session.expire_all()
+        bs = self.dom.last_barracks
+        self.assertEqual(199, bs.amount_training(3))
+        self.assertEqual(20, self.dom.land.incoming)
+
+    def test_returning_rows(self):
+        bs = self.dom.last_barracks
+        add_ops_queues(FakeDB(self.session), bs, returning={'unit1': {'3': 7, '5': 2}})
+        self.session.commit()
+        self.session.expire_all()
+        bs = self.dom.last_barracks
+        self.assertEqual(9, bs.amount_returning(1))
+        self.assertEqual(5, bs.returning_queue.last_tick('unit1'))
+        self.assertEqual({3: 7, 5: 2}, bs.returning_queue.per_tick('unit1'))
@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import domain.refdata as refdata
+from domain.refdata import race_catalogue, Race, tech_tree, TechTree, ref_data_yaml
+
+
+class RaceCatalogueTestCase(unittest.TestCase):
+    def test_lookup_by_file_and_display_name(self):
+        catalogue = race_catalogue()
+        self.assertEqual('Wood Elf', catalogue.race('Wood Elf').name)
+        self.assertEqual('Dark Elf (Legacy)', catalogue.race('Dark Elf (Legacy)').name)
+
+    def test_static_races_share_unit_stats(self):
+        dwarf = race_catalogue().race('Dwarf')
+        self.assertFalse(dwarf.has_dynamic_stats)
+        self.assertIs(Race(None, 'Dwarf').stats, Race(None, 'Dwarf').stats)
+
+    def test_catalogue_is_compiled_once(self):
+        self.assertIs(race_catalogue(), race_catalogue())
+
+
+class TechTreeTestCase(unittest.TestCase):
+    YAML = {
+        'tech_a': {'perks': {'offense': 2.5}},
+        'tech_b': {'perks': {'offense': 5, 'defense': 1}},
+        'tech_c': {'perks': {'defense': 2}},
+    }
+
+    def test_perk_totals(self):
+        tree = TechTree(self.YAML)
+        bitset = tree.bitset(['tech_a', 'tech_b', 'unknown_tech'])
+        self.assertEqual(0b011, bitset)
+        self.assertEqual({'defense': 1, 'offense': 7.5}, tree.perk_totals(bitset))
+        self.assertEqual(0, tree.value_for_perk('defense', []))
+
+    def test_perk_matrix_for_many_bitsets(self):
+        tree = TechTree(self.YAML)
+        matrix = tree.perk_matrix([tree.bitset(['tech_c']), tree.bitset(['tech_a', 'tech_b', 'tech_c'])])
+        self.assertEqual([[2, 0], [3, 7.5]], matrix.tolist())
+
+    def test_same_as_summing_ref_data(self):
+        yaml_techs = ref_data_yaml('techs')
+        techs = sorted(yaml_techs.keys())[:10]
+        for perk in tech_tree().perk_names:
+            expected = sum(yaml_techs[tech]['perks'].get(perk, 0) for tech in techs)
+            self.assertAlmostEqual(expected, tech_tree().value_for_perk(perk, techs))
+
+
+class RefDataBundleTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.bundle = os.path.join(self.tmpdir, 'ref-data.bundle')
+        self.cached = dict(refdata._REF_DATA)
+        self.version = dict(refdata._REF_DATA_VERSION)
+        refdata._REF_DATA['bundle'] = None
+        patcher = mock.patch.object(refdata, 'executable_path', lambda filename: self.bundle)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        refdata._REF_DATA.update(self.cached)
+        refdata._REF_DATA_VERSION.update(self.version)
+        shutil.rmtree(self.tmpdir)
+
+    def test_loads_same_data_as_yaml(self):
+        self.assertEqual(refdata._parse_ref_data(), refdata.load_ref_data())
+        refdata._REF_DATA['bundle'] = None
+        self.assertEqual(refdata._parse_ref_data(), refdata.load_ref_data())
+
+    def test_stale_bundle_is_rewritten(self):
+        refdata.write_ref_data_bundle(self.bundle)
+        with open(self.bundle, 'wb') as f:
+            refdata.marshal.dump({'version': 'stale', 'data': {}}, f)
+        self.assertEqual(refdata._parse_ref_data(), refdata.load_ref_data())
+        self.assertEqual(refdata.ref_data_version(), refdata._read_bundle(self.bundle)['version'])
+
+    def test_corrupt_bundle_falls_back_to_yaml(self):
+        with open(self.bundle, 'wb') as f:
+            f.write(b'not a marshal bundle')
+        self.assertEqual(refdata._parse_ref_data(), refdata.load_ref_data())
+        self.assertEqual(refdata.ref_data_version(), refdata._read_bundle(self.bundle)['version'])
+
+    def test_unreadable_bundle_falls_back_to_yaml(self):
+        self.bundle = os.path.join(self.tmpdir, 'missing', 'ref-data.bundle')
+        self.assertEqual(refdata._parse_ref_data(), refdata.load_ref_data())
+
+    def test_version_does_not_depend_on_install_path(self):
+        version = refdata.ref_data_version()
+        moved = os.path.join(self.tmpdir, 'ref-data')
+        shutil.copytree(refdata.REF_DATA_DIR, moved)
+        refdata._REF_DATA_VERSION.update({'signature': None, 'version': None, 'checked': 0.0})
+        with mock.patch.object(refdata, 'REF_DATA_DIR', moved):
+            self.assertEqual(version, refdata.ref_data_version())
+        refdata._REF_DATA_VERSION.update({'signature': None, 'version': None, 'checked': 0.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from domain.models import Dominion, DominionHistory
+from facade.calculationcache import CalculationCache
+from facade.odinfo import ODInfoFacade
+from test.fixtures import create_db_session, init_db, FakeDB
+
+
+class CalculationCacheTestCase(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = CalculationCache(max_entries=2)
+        cache.put(('military', 1), 'a')
+        cache.put(('military', 2), 'b')
+        cache.get(('military', 1))
+        cache.put(('military', 3), 'c')
+        self.assertIn(('military', 1), cache)
+        self.assertNotIn(('military', 2), cache)
+        self.assertEqual(2, len(cache))
+
+    def test_get_or_compute_caches_none(self):
+        cache = CalculationCache()
+        calls = []
+        compute = lambda: calls.append(1)
+        cache.get_or_compute(('ratios', 1), compute)
+        cache.get_or_compute(('ratios', 1), compute)
+        self.assertEqual(1, len(calls))
+
+    def test_evict_dominion(self):
+        cache = CalculationCache()
+        cache.put(('military', 1, 'x'), 'a')
+        cache.put(('ratios', 1, 'x'), 'b')
+        cache.put(('military', 2, 'x'), 'c')
+        cache.evict_dominion(1)
+        self.assertEqual(1, len(cache))
+
+
+
+class CacheKeyTestCase(unittest.TestCase):
+    def test_new_history_gives_new_key(self):
+        session = create_db_session()
+        init_db(session)
+        dom = session.get(Dominion, 1)
+        facade = ODInfoFacade(None)
+        key = facade._cache_key('military', dom)
+        self.assertEqual(key, facade._cache_key('military', dom))
+        dom.history.append(DominionHistory(timestamp=datetime.now(), land=200, networth=20000))
+        session.commit()
+        self.assertNotEqual(key, facade._cache_key('military', dom))
+        key = facade._cache_key('military', dom)
+        dom.realm = 11
+        self.assertNotEqual(key, facade._cache_key('military', dom))
+
+    def test_list_key_from_aggregates(self):
+        session = create_db_session()
+        init_db(session)
+        facade = ODInfoFacade(FakeDB(session))
+        key = facade._list_cache_key('projection', None, 24)
+        self.assertEqual(key, facade._list_cache_key('projection', None, 24))
+        session.add(DominionHistory(dominion_id=1, timestamp=datetime.now(), land=200, networth=20000))
+        session.commit()
+        self.assertNotEqual(key, facade._list_cache_key('projection', None, 24))
+        key = facade._list_cache_key('projection', None, 24)
+        session.get(Dominion, 1).realm = 11
+        session.commit()
+        self.assertNotEqual(key, facade._list_cache_key('projection', None, 24))
+        self.assertNotEqual(key, facade._list_cache_key('projection', [2], 24))
+
+    def test_hit_matrix_follows_history_and_tick(self):
+        session = create_db_session()
+        init_db(session)
+        facade = ODInfoFacade(FakeDB(session))
+        no_army = {'has_army': False}
+        with patch('facade.odinfo.current_player_id', 1), patch.object(facade, 'military_summary', return_value=no_army):
+            report = facade.hit_matrix()
+            self.assertIs(report, facade.hit_matrix())
+            session.add(DominionHistory(dominion_id=1, timestamp=datetime.now(), land=200, networth=20000))
+            session.commit()
+            self.assertIsNot(report, facade.hit_matrix())
+            report = facade.hit_matrix()
+            with patch('facade.odinfo.current_od_tick', return_value=datetime(2030, 1, 1)):
+                self.assertIsNot(report, facade.hit_matrix())
+
+
+if __name__ == '__main__':
+    unittest.main()
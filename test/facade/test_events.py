@@ -0,0 +1,25 @@
+import unittest
+
+from facade.events import EventBroker, format_event
+
+
+class EventBrokerTestCase(unittest.TestCase):
+    def test_stream(self):
+        broker = EventBroker()
+        stream = broker.stream(keepalive=0.01)
+        self.assertTrue(next(stream).startswith('retry:'))
+        self.assertEqual(1, len(broker))
+        broker.publish('dominion', {'code': 12})
+        self.assertEqual('event: dominion\ndata: {"code": 12}\n\n', next(stream))
+        self.assertEqual(': keepalive\n\n', next(stream))
+        stream.close()
+        self.assertEqual(0, len(broker))
+
+    def test_slow_subscriber_misses_messages(self):
+        broker = EventBroker(max_queued=2)
+        queue = broker.subscribe()
+        for code in range(3):
+            broker.publish('dominion', {'code': code})
+        self.assertEqual([format_event('dominion', {'code': code}) for code in range(2)],
+                         [queue.get_nowait(), queue.get_nowait()])
+        self.assertTrue(queue.empty())
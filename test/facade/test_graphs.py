@@ -0,0 +1,27 @@
+import unittest
+from datetime import datetime, timedelta
+
+from facade.graphs import lttb_indices, downsample
+
+
+class LTTBTestCase(unittest.TestCase):
+    def test_short_series_untouched(self):
+        self.assertEqual([0, 1, 2], list(lttb_indices([0, 1, 2], [5, 6, 7], 10)))
+
+    def test_keeps_ends_and_spike(self):
+        y = [10] * 100
+        y[37] = 500
+        keep = lttb_indices(range(100), y, 10)
+        self.assertEqual(10, len(keep))
+        self.assertEqual(0, keep[0])
+        self.assertEqual(99, keep[-1])
+        self.assertIn(37, keep)
+        self.assertEqual(sorted(keep), list(keep))
+
+    def test_downsample_timestamps(self):
+        start = datetime(2023, 8, 1)
+        timestamps = [start + timedelta(hours=i) for i in range(1000)]
+        x, y = downsample(timestamps, list(range(1000)), 50)
+        self.assertEqual(50, len(x))
+        self.assertEqual((timestamps[0], timestamps[-1]), (x[0], x[-1]))
+        self.assertEqual(y, [timestamps.index(ts) for ts in x])
@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from threading import Event
+
+from sqlalchemy import create_engine
+
+from domain.models import Base, Job
+from facade.jobs import JobQueue, job_status
+
+
+class JobQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        handle, self.filename = tempfile.mkstemp(suffix='.sqlite')
+        os.close(handle)
+        self.engine = create_engine(f'sqlite:///{self.filename}')
+        Base.metadata.create_all(self.engine)
+        self.queue = JobQueue()
+        self.queue.init(self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+        os.remove(self.filename)
+
+    def wait_for(self, job_id):
+        for _ in range(100):
+            status = self.queue.status(job_id)
+            if status['status'] not in ('queued', 'running'):
+                return status
+            Event().wait(0.02)
+        self.fail(f"Job {job_id} didn't finish")
+
+    def test_progress_and_dedup(self):
+        release = Event()
+
+        def work(progress):
+            progress.start(3)
+            progress.advance()
+            release.wait(5)
+            progress.advance(error='Dominion 2: no ops')
+            progress.advance()
+
+        job_id = self.queue.submit('town_crier', work)
+        self.assertEqual(job_id, self.queue.submit('town_crier', work))
+        release.set()
+        status = self.wait_for(job_id)
+        self.assertEqual(('done', 3, 3, 1, 'Dominion 2: no ops'),
+                         (status['status'], status['total'], status['done'], status['errors'], status['message']))
+        self.assertNotEqual(job_id, self.queue.submit('town_crier', lambda progress: None))
+
+    def test_failed_job(self):
+        def work(progress):
+            raise RuntimeError('Login failed')
+
+        status = self.wait_for(self.queue.submit('dom_index', work))
+        self.assertEqual(('failed', 'Login failed'), (status['status'], status['message']))
+
+    def test_eta(self):
+        started = datetime(2023, 8, 10, 12)
+        job = Job(id=1, kind='update_all', status='running', total=40, done=10, errors=0, started=started)
+        self.assertEqual(90, job_status(job, started + timedelta(seconds=30))['eta_seconds'])
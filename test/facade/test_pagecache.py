@@ -0,0 +1,21 @@
+import unittest
+
+from facade.pagecache import page_key, page_etag, bypasses_cache, buffered
+
+
+class PageCacheTestCase(unittest.TestCase):
+    def test_etag_follows_data_version(self):
+        key = page_key('/military', [('top', '100')], '1', 7)
+        self.assertEqual(page_etag(key), page_etag(page_key('/military', [('top', '100')], '1', 7)))
+        self.assertNotEqual(page_etag(key), page_etag(page_key('/military', [('top', '100')], '2', 7)))
+        self.assertNotEqual(page_etag(key), page_etag(page_key('/military', [('top', '100')], '1', 8)))
+
+    def test_bypass(self):
+        self.assertFalse(bypasses_cache('GET', [], {'versus_op': 0}))
+        self.assertFalse(bypasses_cache('GET', [], {'send': None}))
+        self.assertTrue(bypasses_cache('GET', [('update', '1')], {}))
+        self.assertTrue(bypasses_cache('GET', [], {'send': 'send'}))
+        self.assertTrue(bypasses_cache('POST', [], {}))
+
+    def test_buffered(self):
+        self.assertEqual(['abc', 'de'], list(buffered(['a', 'b', 'c', 'd', 'e'], size=3)))
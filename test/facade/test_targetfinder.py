@@ -0,0 +1,51 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from calculators.military import land_gain
+from facade.odinfo import ODInfoFacade
+from facade.targetfinder import TargetIndex, TargetEntry
+
+
+class TargetIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.index = TargetIndex()
+        self.index.rebuild([
+            TargetEntry(700, 1, 'Too small', 2, 10000, 1),
+            TargetEntry(750, 2, 'Just in range', 2, 10000, 1),
+            TargetEntry(1200, 3, 'Big', 3, 20000, 1),
+            TargetEntry(1500, 4, 'Too strong', 3, 90000, 1),
+            TargetEntry(1300, 5, 'Realmie', 1, 10000, 1),
+        ])
+
+    def test_in_range(self):
+        self.assertEqual([2, 3, 5, 4], [entry.code for entry in self.index.in_range(1000)])
+
+    def test_targets_ordered_by_land_gain(self):
+        targets = self.index.targets(1000, 50000, my_realm=1)
+        self.assertEqual([3, 2], [target['code'] for target in targets])
+        self.assertEqual(75.0, targets[1]['range'])
+
+    def test_incremental_update(self):
+        self.index.update(TargetEntry(1600, 1, 'Grown', 2, 10000, 0))
+        self.index.remove(3)
+        targets = self.index.targets(1000, 50000, my_realm=1)
+        self.assertEqual([1, 2], [target['code'] for target in targets])
+        self.assertEqual(4, len(self.index))
+
+    def test_land_gain(self):
+        self.assertEqual([36, 60, 89], land_gain(1000, [750, 1000, 1300]).tolist())
+
+
+class FindTargetsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.facade = ODInfoFacade(None)
+
+    def test_without_my_dominion(self):
+        with patch.object(self.facade, 'dominion', return_value=None):
+            self.assertEqual(([], 0, 0), self.facade.find_targets())
+
+    def test_without_ops_on_my_army(self):
+        me = SimpleNamespace(military=None, current_land=1000, realm=1)
+        with patch.object(self.facade, 'dominion', return_value=me):
+            self.assertEqual(([], 0, 1000), self.facade.find_targets())
@@ -0,0 +1,64 @@
+import unittest
+from unittest.mock import patch
+
+from domain.models import Dominion
+from facade.odinfo import ODInfoFacade
+from facade.threatmonitor import ThreatMonitor, threat_message, threat_monitor
+from test.fixtures import create_db_session, init_db, FakeDB
+
+
+def summary(code, realm, land, op, dp, has_army=True):
+    return {'code': code, 'name': f'Dom {code}', 'realm': realm, 'land': land,
+            'five_over_four_op': op, 'dp': dp, 'has_army': has_army}
+
+
+class ThreatMonitorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.monitor = ThreatMonitor()
+        self.monitor.load([
+            summary(1, 1, 1000, 30000, 40000),
+            summary(2, 1, 800, 20000, 15000),
+            summary(10, 2, 1000, 50000, 30000),
+            summary(11, 2, 2000, 90000, 60000),
+            summary(12, 3, 900, 10000, 20000, has_army=False),
+        ], my_realm=1)
+
+    def test_load(self):
+        pairs = [(threat.attacker, threat.defender) for threat in self.monitor.threats()]
+        self.assertEqual([(10, 1), (10, 2)], pairs)
+
+    def test_attacker_update(self):
+        changed, gone = self.monitor.update(summary(11, 2, 1200, 90000, 60000))
+        self.assertEqual([(11, 1)], [(threat.attacker, threat.defender) for threat in changed])
+        self.assertEqual([], gone)
+        self.assertEqual(3, len(self.monitor.threats()))
+
+    def test_defender_update(self):
+        changed, gone = self.monitor.update(summary(1, 1, 1000, 30000, 60000))
+        self.assertEqual([], changed)
+        self.assertEqual([(10, 1)], [(threat.attacker, threat.defender) for threat in gone])
+        self.assertIn('can no longer hit Dom 1', threat_message(changed, gone))
+
+    def test_unchanged_threat_not_reported(self):
+        changed, gone = self.monitor.update(summary(10, 2, 1000, 50000, 35000))
+        self.assertEqual(([], []), (changed, gone))
+
+
+class FacadeThreatsTestCase(unittest.TestCase):
+    def setUp(self):
+        session = create_db_session()
+        init_db(session)
+        self.dom = session.get(Dominion, 1)
+        self.facade = ODInfoFacade(FakeDB(session))
+        threat_monitor.invalidate()
+
+    def tearDown(self):
+        threat_monitor.invalidate()
+
+    def test_loaded_on_first_ingest(self):
+        army = summary(1, 10, 1000, 30000, 40000)
+        with patch('facade.odinfo.current_player_id', 1), \
+                patch.object(self.facade, 'military_summary', return_value=army):
+            self.facade.refresh_threats(self.dom)
+        self.assertTrue(threat_monitor.loaded)
+        self.assertEqual(10, threat_monitor.my_realm)
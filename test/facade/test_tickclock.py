@@ -0,0 +1,20 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from facade.tickclock import TickClock
+
+
+class TickClockTestCase(unittest.TestCase):
+    def test_scrapes_once_per_tick(self):
+        scrapes = list()
+
+        def read_tick_time():
+            scrapes.append(1)
+            return len(scrapes)
+
+        clock = TickClock(read_tick_time)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            ticks = list(executor.map(lambda _: clock.current_tick, range(50)))
+        self.assertEqual([1] * 50, ticks)
+        clock.invalidate()
+        self.assertEqual(2, clock.current_tick)
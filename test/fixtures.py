@@ -1,12 +1,21 @@
 from datetime import datetime, timedelta
 import json
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, select
 from sqlalchemy.orm import Session
 
 from domain.models import (Base, Dominion, DominionHistory, ClearSight,
                            BarracksSpy, CastleSpy, LandSpy, Revelation,
                            SurveyDominion, Vision, TownCrier)
+from domain.dataaccesslayer import add_ops_queues
+
+
+class FakeDB(object):
+    """The parts of the Flask-SQLAlchemy db object that the data access functions use."""
+    select = staticmethod(select)
+
+    def __init__(self, session: Session):
+        self.session = session
 
 
 def create_db_session() -> Session:
@@ -164,4 +173,11 @@ def init_db(session: Session) -> None:
             timestamp=timestamp
         ))
 
+        session.flush()
+        db = FakeDB(session)
+        bs = dom.barracks_spy[0]
+        add_ops_queues(db, bs, training=bs.training, returning=bs.returning)
+        add_ops_queues(db, dom.land_spy[0], incoming=dom.land_spy[0].incoming)
+        add_ops_queues(db, dom.survey_dominion[0], constructing=dom.survey_dominion[0].constructing)
+
         session.commit()